@@ -1,9 +1,16 @@
 from django.contrib import admin, messages
+from django.db.models import Q
 from django.http import HttpResponse
+from django.utils import timezone
 from django.utils.html import format_html
 import csv
 
-from .models import Profesor, Asistencia, JustificacionAsistencia, LoginEvidencia, DiaEspecial
+from . import archivos, busqueda, diaria
+from .models import (
+    Profesor, Asistencia, JustificacionAsistencia, LoginEvidencia, DiaEspecial, SubidaJustificacion,
+)
+from .calendario import invalidar_calendario
+from .roster import invalidar_roster
 
 # Opcional: ocultar modelos técnicos de axes del panel principal
 try:
@@ -52,11 +59,34 @@ class ExportCsvMixin:
         raise NotImplementedError("Debes implementar get_csv_rows().")
 
 
+# =========================================================
+# MIXIN BÚSQUEDA DE PROFESOR (sin tildes, índice trigram)
+# =========================================================
+class BusquedaProfesorMixin:
+    """
+    Además de search_fields, busca el término normalizado en Profesor.busqueda
+    (dni/código/apellidos/nombres): "nuñez" encuentra "NUNEZ" y usa el índice.
+    Cada palabra se busca por separado (AND), como el admin de Django:
+    "garcia ana" encuentra "GARCIA LOPEZ, ANA".
+    """
+    campo_busqueda_profesor = "profesor__busqueda"
+
+    def get_search_results(self, request, queryset, search_term):
+        base = queryset
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        condicion = Q()
+        for palabra in search_term.split():
+            condicion &= busqueda.filtro(palabra, campo=self.campo_busqueda_profesor)
+        if condicion:
+            queryset |= base.filter(condicion)
+        return queryset, may_have_duplicates
+
+
 # =========================================================
 # PROFESOR
 # =========================================================
 @admin.register(Profesor)
-class ProfesorAdmin(admin.ModelAdmin):
+class ProfesorAdmin(BusquedaProfesorMixin, admin.ModelAdmin):
     list_display = (
         "dni",
         "codigo",
@@ -68,7 +98,8 @@ class ProfesorAdmin(admin.ModelAdmin):
         "activo_badge",
         "email",
     )
-    search_fields = ("dni", "apellidos", "nombres", "email", "codigo")
+    campo_busqueda_profesor = "busqueda"
+    search_fields = ("email",)  # dni/código/apellidos/nombres: BusquedaProfesorMixin
     list_filter = ("sexo", "condicion", "tipo_jornada", "activo")
     ordering = ("apellidos", "nombres")
     list_per_page = 20
@@ -107,6 +138,7 @@ class ProfesorAdmin(admin.ModelAdmin):
     @admin.action(description="✅ Activar profesores seleccionados")
     def activar_profesores(self, request, queryset):
         actualizados = queryset.update(activo=True)
+        invalidar_roster()  # update() no dispara post_save
         self.message_user(
             request,
             f"Se activaron {actualizados} profesor(es).",
@@ -116,6 +148,7 @@ class ProfesorAdmin(admin.ModelAdmin):
     @admin.action(description="⛔ Desactivar profesores seleccionados")
     def desactivar_profesores(self, request, queryset):
         actualizados = queryset.update(activo=False)
+        invalidar_roster()  # update() no dispara post_save
         self.message_user(
             request,
             f"Se desactivaron {actualizados} profesor(es).",
@@ -227,7 +260,7 @@ class ProfesorAdmin(admin.ModelAdmin):
 # ASISTENCIA
 # =========================================================
 @admin.register(Asistencia)
-class AsistenciaAdmin(ExportCsvMixin, admin.ModelAdmin):
+class AsistenciaAdmin(BusquedaProfesorMixin, ExportCsvMixin, admin.ModelAdmin):
     list_display = (
         "profesor",
         "fecha",
@@ -237,9 +270,6 @@ class AsistenciaAdmin(ExportCsvMixin, admin.ModelAdmin):
         "ip",
     )
     search_fields = (
-        "profesor__dni",
-        "profesor__apellidos",
-        "profesor__nombres",
         "registrado_por__username",
         "ip",
     )
@@ -319,7 +349,7 @@ class AsistenciaAdmin(ExportCsvMixin, admin.ModelAdmin):
 # JUSTIFICACIÓN
 # =========================================================
 @admin.register(JustificacionAsistencia)
-class JustificacionAsistenciaAdmin(ExportCsvMixin, admin.ModelAdmin):
+class JustificacionAsistenciaAdmin(BusquedaProfesorMixin, ExportCsvMixin, admin.ModelAdmin):
     list_display = (
         "fecha",
         "profesor",
@@ -333,13 +363,7 @@ class JustificacionAsistenciaAdmin(ExportCsvMixin, admin.ModelAdmin):
         ("fecha", admin.DateFieldListFilter),
         ("tipo", admin.ChoicesFieldListFilter),
     )
-    search_fields = (
-        "profesor__apellidos",
-        "profesor__nombres",
-        "profesor__dni",
-        "profesor__codigo",
-        "detalle",
-    )
+    search_fields = ("detalle",)
     readonly_fields = ("ver_pdf",)
     list_select_related = ("profesor", "creado_por", "actualizado_por")
     autocomplete_fields = ("profesor", "creado_por", "actualizado_por")
@@ -368,6 +392,12 @@ class JustificacionAsistenciaAdmin(ExportCsvMixin, admin.ModelAdmin):
             "profesor", "creado_por", "actualizado_por"
         )
 
+    def get_changelist_instance(self, request):
+        # ✅ URLs de PDF resueltas una vez para la página visible (ver archivos.py)
+        cl = super().get_changelist_instance(request)
+        archivos.precargar(cl.result_list)
+        return cl
+
     @admin.display(description="Tipo", ordering="tipo")
     def tipo_badge(self, obj):
         tipo = (obj.tipo or "").strip()
@@ -414,14 +444,19 @@ class JustificacionAsistenciaAdmin(ExportCsvMixin, admin.ModelAdmin):
 
     @admin.display(description="PDF")
     def ver_pdf(self, obj):
-        if obj.archivo:
+        url = obj.archivo_url
+        if url:
             return format_html(
                 '<a href="{}" target="_blank" rel="noopener" '
                 'style="display:inline-block;padding:6px 12px;border-radius:10px;'
                 'background:linear-gradient(135deg,#7b1e2b,#9a2534);color:#fff;'
                 'text-decoration:none;font-weight:700;">📄 Ver PDF</a>',
-                obj.archivo.url,
+                url,
             )
+        if obj.archivo_estado == JustificacionAsistencia.ARCHIVO_PENDIENTE:
+            return "⏳ Subiendo"
+        if obj.archivo_estado == JustificacionAsistencia.ARCHIVO_ERROR:
+            return "⚠️ Error al subir"
         return "—"
 
     def get_csv_rows(self, queryset):
@@ -432,12 +467,54 @@ class JustificacionAsistenciaAdmin(ExportCsvMixin, admin.ModelAdmin):
                 str(obj.profesor),
                 obj.tipo,
                 obj.detalle,
-                obj.archivo.url if obj.archivo else "",
+                obj.archivo_url,
                 str(obj.creado_por) if obj.creado_por else "",
                 obj.creado_en,
             ]
 
 
+# =========================================================
+# SUBIDAS DE PDF PENDIENTES (ver subidas.py)
+# =========================================================
+@admin.register(SubidaJustificacion)
+class SubidaJustificacionAdmin(admin.ModelAdmin):
+    list_display = ("creado_en", "nombre", "intentos", "siguiente_intento", "error")
+    readonly_fields = ("justificaciones", "nombre", "intentos", "siguiente_intento", "error", "creado_en")
+    exclude = ("contenido",)
+    ordering = ("id",)
+    list_per_page = 20
+    actions = ["reintentar"]
+    show_full_result_count = False
+    empty_value_display = "—"
+
+    class Media:
+        css = {
+            "all": (
+                "admin/css/manhattan_admin_dark.css",
+            )
+        }
+
+    def get_queryset(self, request):
+        # El PDF puede pesar 10 MB: la lista no lo lee
+        return super().get_queryset(request).defer("contenido")
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="🔁 Reintentar subidas seleccionadas")
+    def reintentar(self, request, queryset):
+        ids = list(queryset.values_list("justificaciones", flat=True))
+        actualizados = queryset.update(intentos=0, error="", siguiente_intento=timezone.now())
+        JustificacionAsistencia.objects.filter(id__in=ids).update(
+            archivo_estado=JustificacionAsistencia.ARCHIVO_PENDIENTE
+        )
+        self.message_user(
+            request,
+            f"Se reencolaron {actualizados} subida(s).",
+            level=messages.SUCCESS,
+        )
+
+
 # =========================================================
 # DÍAS ESPECIALES
 # =========================================================
@@ -487,7 +564,11 @@ class DiaEspecialAdmin(admin.ModelAdmin):
 
     @admin.action(description="✅ Activar días especiales seleccionados")
     def activar_dias(self, request, queryset):
+        fechas = list(queryset.values_list("fecha", flat=True))
         actualizados = queryset.update(activo=True)
+        invalidar_calendario()  # update() no dispara post_save
+        for fecha in fechas:
+            diaria.reclasificar_fecha(fecha, especial=True)
         self.message_user(
             request,
             f"Se activaron {actualizados} día(s) especial(es).",
@@ -496,7 +577,11 @@ class DiaEspecialAdmin(admin.ModelAdmin):
 
     @admin.action(description="⛔ Desactivar días especiales seleccionados")
     def desactivar_dias(self, request, queryset):
+        fechas = list(queryset.values_list("fecha", flat=True))
         actualizados = queryset.update(activo=False)
+        invalidar_calendario()  # update() no dispara post_save
+        for fecha in fechas:
+            diaria.reclasificar_fecha(fecha, especial=False)
         self.message_user(
             request,
             f"Se desactivaron {actualizados} día(s) especial(es).",
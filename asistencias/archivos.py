@@ -0,0 +1,31 @@
+"""
+URLs de los PDF de justificación, resueltas por página.
+
+El storage memoiza nombre -> URL (storage_backends.py). Para una lista
+(panel de justificaciones, changelist del admin) se resuelve una vez por
+nombre distinto y el resultado queda en cada objeto: archivo_url y las
+columnas del admin no vuelven a pasar por el storage fila por fila.
+"""
+
+
+def url_publica(url) -> str:
+    """Absoluta (http/https) o con "/" inicial (media/... -> /media/...)."""
+    url = str(url or "").strip()
+    if not url or url.startswith(("http://", "https://", "/")):
+        return url
+    return f"/{url.lstrip('/')}"
+
+
+def precargar(justificaciones):
+    """Deja `archivo_url` resuelta en cada JustificacionAsistencia. Devuelve la lista."""
+    justificaciones = list(justificaciones)
+    urls = {}
+    for j in justificaciones:
+        nombre = j.archivo.name if j.archivo else ""
+        if nombre not in urls:
+            try:
+                urls[nombre] = url_publica(j.archivo.url) if nombre else ""
+            except Exception:
+                urls[nombre] = ""
+        j._archivo_url = urls[nombre]
+    return justificaciones
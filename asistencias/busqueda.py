@@ -0,0 +1,34 @@
+"""
+Búsqueda de profesores sin tildes ni mayúsculas ("Nuñez" encuentra "NUNEZ").
+
+Profesor.busqueda guarda dni, código, apellidos y nombres normalizados con
+text-unidecode (signals.py lo recalcula en cada save). En PostgreSQL la
+columna tiene un índice GIN pg_trgm (migración 0018): `busqueda LIKE '%TERM%'`
+no recorre la tabla. En SQLite es el mismo LIKE, sin índice.
+
+El padrón en memoria (roster.py) normaliza igual, así que ambos caminos
+encuentran lo mismo.
+"""
+import re
+
+from django.db.models import Q
+from text_unidecode import unidecode
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar(texto) -> str:
+    return _ESPACIOS.sub(" ", unidecode(texto or "")).strip().upper()
+
+
+def texto_profesor(dni, codigo, apellidos, nombres) -> str:
+    """Valor de Profesor.busqueda ("APELLIDOS NOMBRES" también coincide)."""
+    return normalizar(" ".join(x or "" for x in (dni, codigo, apellidos, nombres)))
+
+
+def filtro(q, campo="busqueda") -> Q:
+    """Q sobre la columna normalizada (`campo` admite "profesor__busqueda")."""
+    termino = normalizar(q)
+    if not termino:
+        return Q()
+    return Q(**{f"{campo}__contains": termino})
@@ -0,0 +1,203 @@
+"""
+Calendario institucional: días especiales (DiaEspecial) y días hábiles.
+
+Los DiaEspecial activos se cargan una vez por año y por proceso (1 consulta)
+y se invalidan entre workers con la versión "calendario", que incrementan
+los signals de DiaEspecial. Las preguntas "¿es día especial? / ¿cuál?" se
+responden con un dict en O(1) y los rangos de días hábiles se calculan con
+numpy.busday (lunes a viernes + máscara de días especiales).
+"""
+import threading
+from datetime import timedelta
+
+import numpy as np
+from asgiref.sync import sync_to_async
+
+from .models import DiaEspecial
+from .versiones import aget_version, bump_version, get_version
+
+VERSION_KEY = "calendario"
+
+WEEKMASK = "1111100"  # lunes a viernes
+
+_TIPOS = dict(DiaEspecial.TIPO_CHOICES)
+
+_SIN_FERIADOS = np.array([], dtype="datetime64[D]")
+
+
+class DiaEspecialInfo:
+    """
+    Día especial activo, compatible con el uso que hacen vistas y templates
+    de DiaEspecial (tipo, descripcion, get_tipo_display).
+    """
+    __slots__ = ("fecha", "tipo", "descripcion", "tipo_display", "label")
+
+    activo = True
+
+    def __init__(self, fecha, tipo, descripcion):
+        self.fecha = fecha
+        self.tipo = tipo
+        self.descripcion = (descripcion or "").strip()
+        self.tipo_display = _TIPOS.get(tipo) or (tipo or "").replace("_", " ").title()
+        self.label = (
+            f"{self.tipo_display} - {self.descripcion}" if self.descripcion else self.tipo_display
+        )
+
+    def get_tipo_display(self):
+        return self.tipo_display
+
+    def __str__(self):
+        base = f"{self.fecha} - {self.tipo_display}"
+        if self.descripcion:
+            base += f" - {self.descripcion}"
+        return base
+
+
+class _Anio:
+    __slots__ = ("especiales", "holidays")
+
+    def __init__(self, especiales):
+        self.especiales = especiales
+        self.holidays = np.array(sorted(especiales), dtype="datetime64[D]")
+
+
+_lock = threading.Lock()
+_estado = {"version": None, "anios": {}}
+
+
+def _anios():
+    """Devuelve el dict año -> _Anio vigente para esta versión."""
+    version = get_version(VERSION_KEY)
+    if _estado["version"] != version:
+        with _lock:
+            if _estado["version"] != version:
+                _estado["anios"] = {}
+                _estado["version"] = version
+    return _estado["anios"]
+
+
+def _anio(year: int) -> _Anio:
+    anios = _anios()
+    actual = anios.get(year)
+    if actual is not None:
+        return actual
+
+    filas = (
+        DiaEspecial.objects
+        .filter(activo=True, fecha__year=year)
+        .values_list("fecha", "tipo", "descripcion")
+    )
+    actual = _Anio({f: DiaEspecialInfo(f, t, d) for f, t, d in filas})
+    anios[year] = actual
+    return actual
+
+
+def invalidar_calendario():
+    with _lock:
+        _estado["anios"] = {}
+        _estado["version"] = None
+    bump_version(VERSION_KEY)
+
+
+# =========================================================
+# CONSULTAS PUNTUALES (O(1))
+# =========================================================
+def dia_especial(fecha):
+    """DiaEspecialInfo activo para la fecha, o None."""
+    return _anio(fecha.year).especiales.get(fecha)
+
+
+async def adia_especial(fecha):
+    """Versión async de dia_especial(): solo va a BD (en un hilo) si el año no está cargado."""
+    version = await aget_version(VERSION_KEY)
+    if _estado["version"] == version:
+        actual = _estado["anios"].get(fecha.year)
+        if actual is not None:
+            return actual.especiales.get(fecha)
+    return await sync_to_async(dia_especial)(fecha)
+
+
+def es_dia_especial(fecha) -> bool:
+    return fecha in _anio(fecha.year).especiales
+
+
+def es_fin_de_semana(fecha) -> bool:
+    return fecha.weekday() >= 5
+
+
+# =========================================================
+# RANGOS
+# =========================================================
+def especiales_en_rango(desde, hasta) -> dict:
+    """{fecha: DiaEspecialInfo} de los días especiales activos del rango."""
+    out = {}
+    for year in range(desde.year, hasta.year + 1):
+        for fecha, info in _anio(year).especiales.items():
+            if desde <= fecha <= hasta:
+                out[fecha] = info
+    return out
+
+
+def _holidays(desde, hasta):
+    partes = [_anio(year).holidays for year in range(desde.year, hasta.year + 1)]
+    if not partes:
+        return _SIN_FERIADOS
+    return np.concatenate(partes)
+
+
+def rango_np(desde, hasta):
+    """Todos los días del rango (inclusive) como datetime64[D]."""
+    return np.arange(
+        np.datetime64(desde, "D"),
+        np.datetime64(hasta, "D") + 1,
+        dtype="datetime64[D]",
+    )
+
+
+def mascara_habil(dias, excluir_especiales=True):
+    """
+    Máscara booleana (numpy) de días hábiles para un array datetime64[D]:
+    lunes a viernes y, opcionalmente, sin días especiales.
+    """
+    if len(dias) == 0:
+        return np.zeros(0, dtype=bool)
+
+    holidays = _SIN_FERIADOS
+    if excluir_especiales:
+        desde = dias.min().astype(object)
+        hasta = dias.max().astype(object)
+        holidays = _holidays(desde, hasta)
+
+    return np.is_busday(dias, weekmask=WEEKMASK, holidays=holidays)
+
+
+def dias_habiles_np(desde, hasta, excluir_especiales=False):
+    dias = rango_np(desde, hasta)
+    return dias[mascara_habil(dias, excluir_especiales=excluir_especiales)]
+
+
+def contar_dias_habiles(desde, hasta, excluir_especiales=False) -> int:
+    if desde > hasta:
+        return 0
+    holidays = _holidays(desde, hasta) if excluir_especiales else _SIN_FERIADOS
+    return int(
+        np.busday_count(
+            np.datetime64(desde, "D"),
+            np.datetime64(hasta + timedelta(days=1), "D"),
+            weekmask=WEEKMASK,
+            holidays=holidays,
+        )
+    )
+
+
+def a_fechas(dias) -> list:
+    """datetime64[D] -> list[date]."""
+    return dias.astype(object).tolist()
+
+
+def dias_rango(desde, hasta) -> list:
+    return a_fechas(rango_np(desde, hasta))
+
+
+def dias_habiles(desde, hasta, excluir_especiales=False) -> list:
+    return a_fechas(dias_habiles_np(desde, hasta, excluir_especiales=excluir_especiales))
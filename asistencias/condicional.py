@@ -0,0 +1,134 @@
+"""
+GET condicional (ETag) y cache de páginas para días cerrados.
+
+Un día anterior a hoy casi no cambia: el historial y el panel de
+justificaciones de esa fecha se renderizan igual en cada visita. Para esas
+fechas cada respuesta lleva un ETag que resume:
+
+- la versión de datos del día: conteo, último id y máximos de fecha_hora /
+  actualizado_en de Asistencia, JustificacionAsistencia y AsistenciaDiaria
+  (3 aggregates sobre el índice por fecha; los conteos delatan borrados);
+- las versiones "calendario" y "roster" (DiaEspecial y padrón, ver versiones.py);
+- la vista, los filtros y lo que cambia por usuario (grupos, sesión, secreto
+  CSRF de los formularios).
+
+Con If-None-Match igual se responde 304 sin consultar nada más. Si no, la
+página ya renderizada sale del cache compartido (TTL y tamaño acotados; el
+cache de archivos además poda por MAX_ENTRIES). Hoy y fechas futuras siguen
+por el camino normal: el escaneo las cambia a cada rato.
+
+No se emite Last-Modified: un borrado no mueve ningún máximo y el cliente
+recibiría un 304 con datos viejos.
+"""
+import hashlib
+import os
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import calendario, roster
+from .grupos import grupos_de
+from .models import Asistencia, AsistenciaDiaria, JustificacionAsistencia
+from .versiones import get_version
+
+TTL = 60 * 60 * 6
+MAX_BYTES = 1024 * 1024
+
+# Un deploy cambia plantillas: sus páginas no deben salir del cache anterior
+_DESPLIEGUE = os.environ.get("RENDER_GIT_COMMIT", "")
+
+
+def _clave(etag):
+    return "asistencias:pagina:" + etag.strip('"')
+
+
+def version_dia(fecha):
+    """Huella de los datos de `fecha` (None para hoy o después: no se cachea)."""
+    if fecha >= timezone.localdate():
+        return None
+
+    partes = [
+        Asistencia.objects.filter(fecha=fecha).aggregate(
+            n=Count("id"), ultimo=Max("id"), cambio=Max("fecha_hora")
+        ),
+        JustificacionAsistencia.objects.filter(fecha=fecha).aggregate(
+            n=Count("id"), ultimo=Max("id"), cambio=Max("actualizado_en")
+        ),
+        AsistenciaDiaria.objects.filter(fecha=fecha).aggregate(
+            n=Count("id"), cambio=Max("actualizado_en")
+        ),
+    ]
+    return repr(
+        [sorted(p.items()) for p in partes]
+        + [get_version(calendario.VERSION_KEY), get_version(roster.VERSION_KEY)]
+    )
+
+
+def _etag(request, version, partes):
+    user = request.user
+    huella = repr(
+        [
+            _DESPLIEGUE,
+            version,
+            partes,
+            user.pk,
+            user.is_superuser,
+            sorted(grupos_de(user)),
+            request.META["CSRF_COOKIE"],
+        ]
+    )
+    return '"%s"' % hashlib.sha256(huella.encode("utf-8")).hexdigest()[:32]
+
+
+def _con_cabeceras(response, etag):
+    response["ETag"] = etag
+    # Privado (depende del usuario) y siempre revalidado: el 304 es lo barato
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def responder(request, fecha, partes, construir):
+    """
+    `construir()` solo corre si no hay 304 ni página en cache. `partes` son los
+    filtros, datos de sesión y el tipo de respuesta (página o fragmento HTMX)
+    que cambian el HTML; deben ser repr-estables.
+    """
+    # Con mensajes pendientes la página lleva toasts: render normal, sin guardar.
+    # Sin cookie CSRF el token de los formularios sería de un secreto nuevo.
+    if (
+        request.method != "GET"
+        or not request.META.get("CSRF_COOKIE")
+        or len(messages.get_messages(request))
+    ):
+        return construir()
+
+    version = version_dia(fecha)
+    if version is None:
+        return construir()
+
+    etag = _etag(request, version, partes)
+
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return _con_cabeceras(no_modificado, etag)
+
+    guardada = cache.get(_clave(etag))
+    if guardada is not None:
+        contenido, content_type, vary = guardada
+        response = HttpResponse(contenido, content_type=content_type)
+        if vary:
+            response["Vary"] = vary
+        return _con_cabeceras(response, etag)
+
+    response = construir()
+    if response.status_code == 200 and not response.streaming and len(response.content) <= MAX_BYTES:
+        cache.set(
+            _clave(etag),
+            (response.content, response["Content-Type"], response.get("Vary", "")),
+            timeout=TTL,
+        )
+    return _con_cabeceras(response, etag)
@@ -0,0 +1,175 @@
+"""
+Estado diario materializado (AsistenciaDiaria).
+
+Una fila por (profesor, fecha) con ENTRADA o justificación (JustificacionAsistencia
+o Asistencia tipo "J"); sin fila = FALTÓ, o el día especial que diga calendario.
+Prioridad única para todos los reportes: DIA_ESPECIAL > ASISTIO > JUSTIFICADO.
+
+Se mantiene al confirmar cada escritura (signals.py y los caminos sin post_save:
+entradas.py, journal.py y el escaneo por lotes). `recalcular_asistencia_diaria`
+reconstruye rangos (backfill o tras cargas masivas).
+
+Un reporte de rango lee 1 consulta sobre (fecha, estado) en lugar de tres
+consultas más el cruce profesor x día en Python.
+"""
+from django.db import transaction
+from django.db.models import Case, Min, Value, When
+from django.utils import timezone
+
+from . import calendario
+from .models import Asistencia, AsistenciaDiaria, JustificacionAsistencia
+
+LOTE = 1000
+
+_CAMPOS = ["estado", "primera_entrada", "motivo", "detalle", "justificacion_oficial", "actualizado_en"]
+_CAMPOS_ENTRADA = ["estado", "primera_entrada", "actualizado_en"]
+
+MOTIVOS = dict(Asistencia.MOTIVOS)
+
+
+def etiqueta_justificacion(motivo, detalle=""):
+    """ "JUSTIFICADO (Descanso médico) - detalle", como en el Excel de siempre."""
+    motivo = (motivo or "").strip()
+    detalle = (detalle or "").strip()
+    label = MOTIVOS.get(motivo, motivo or "Justificación")
+    return f"JUSTIFICADO ({label})" + (f" - {detalle}" if detalle else "")
+
+
+def _guardar(filas, campos):
+    if filas:
+        AsistenciaDiaria.objects.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=["profesor", "fecha"],
+            update_fields=campos,
+            batch_size=LOTE,
+        )
+
+
+def _fila(profesor_id, fecha, especial, entrada, just, asist_j):
+    origen = just or asist_j or ("", "")
+    if especial:
+        estado = "DIA_ESPECIAL"
+    elif entrada is not None:
+        estado = "ASISTIO"
+    else:
+        estado = "JUSTIFICADO"
+
+    return AsistenciaDiaria(
+        profesor_id=profesor_id,
+        fecha=fecha,
+        estado=estado,
+        primera_entrada=entrada,
+        motivo=(origen[0] or "").strip(),
+        detalle=(origen[1] or "").strip(),
+        justificacion_oficial=just is not None,
+    )
+
+
+# =========================================================
+# ESCRITURA
+# =========================================================
+def anotar_entradas(entradas):
+    """
+    ENTRADAS recién creadas (Asistencia o EntradaDia): 1 upsert para todas.
+    Conserva motivo/detalle si el día ya estaba justificado.
+    """
+    _guardar(
+        [
+            AsistenciaDiaria(
+                profesor_id=e.profesor_id,
+                fecha=e.fecha,
+                estado="DIA_ESPECIAL" if calendario.es_dia_especial(e.fecha) else "ASISTIO",
+                primera_entrada=e.fecha_hora,
+            )
+            for e in entradas
+        ],
+        _CAMPOS_ENTRADA,
+    )
+
+
+def recalcular(desde, hasta, profesor_ids=None):
+    """
+    Reconstruye las filas del rango desde Asistencia y JustificacionAsistencia
+    (opcionalmente solo para `profesor_ids`). Devuelve (guardadas, borradas).
+    """
+    def _del_rango(qs):
+        qs = qs.filter(fecha__range=(desde, hasta))
+        if profesor_ids is not None:
+            qs = qs.filter(profesor_id__in=profesor_ids)
+        return qs
+
+    entradas = {
+        (p, f): fh
+        for p, f, fh in (
+            _del_rango(Asistencia.objects.filter(tipo="E"))
+            .order_by()
+            .values("profesor_id", "fecha")
+            .annotate(fh=Min("fecha_hora"))
+            .values_list("profesor_id", "fecha", "fh")
+        )
+    }
+    asist_j = {
+        (p, f): (m, d)
+        for p, f, m, d in (
+            _del_rango(Asistencia.objects.filter(tipo="J"))
+            .values_list("profesor_id", "fecha", "motivo", "detalle")
+        )
+    }
+    justs = {
+        (p, f): (t, d)
+        for p, f, t, d in (
+            _del_rango(JustificacionAsistencia.objects.all())
+            .values_list("profesor_id", "fecha", "tipo", "detalle")
+        )
+    }
+    especiales = calendario.especiales_en_rango(desde, hasta)
+
+    claves = entradas.keys() | asist_j.keys() | justs.keys()
+    filas = [
+        _fila(p, f, f in especiales, entradas.get((p, f)), justs.get((p, f)), asist_j.get((p, f)))
+        for p, f in claves
+    ]
+
+    with transaction.atomic():
+        sobran = [
+            i
+            for i, p, f in _del_rango(AsistenciaDiaria.objects.all()).values_list("id", "profesor_id", "fecha")
+            if (p, f) not in claves
+        ]
+        borradas = 0
+        for i in range(0, len(sobran), LOTE):
+            borradas += AsistenciaDiaria.objects.filter(id__in=sobran[i:i + LOTE]).delete()[0]
+        _guardar(filas, _CAMPOS)
+
+    return len(filas), borradas
+
+
+def recalcular_par(profesor_id, fecha):
+    return recalcular(fecha, fecha, [profesor_id])
+
+
+def reclasificar_fecha(fecha, especial):
+    """Cambió el DiaEspecial de `fecha`: 1 UPDATE sobre las filas de ese día."""
+    if especial:
+        estado = Value("DIA_ESPECIAL")
+    else:
+        estado = Case(
+            When(primera_entrada__isnull=False, then=Value("ASISTIO")),
+            default=Value("JUSTIFICADO"),
+        )
+    return AsistenciaDiaria.objects.filter(fecha=fecha).update(estado=estado, actualizado_en=timezone.now())
+
+
+# =========================================================
+# LECTURA
+# =========================================================
+def del_rango(desde, hasta, profesor_ids=None):
+    """
+    {(profesor_id, fecha): AsistenciaDiaria} del rango en 1 consulta.
+    profesor_ids=None lee todo el rango (sin IN gigante cuando no hay filtros).
+    """
+    qs = AsistenciaDiaria.objects.filter(fecha__range=(desde, hasta))
+    if profesor_ids is not None:
+        qs = qs.filter(profesor_id__in=profesor_ids)
+    return {(d.profesor_id, d.fecha): d for d in qs}
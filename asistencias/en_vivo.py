@@ -0,0 +1,253 @@
+"""
+Feed en vivo del historial del día (Server-Sent Events).
+
+Cada ENTRADA o justificación se publica como un evento JSON pequeño:
+- en el mismo proceso, por un canal en memoria que despierta a todos los
+  streams abiertos (sync o async) apenas se confirma el registro;
+- entre workers, cada stream consulta además Asistencia con id > cursor -
+  VENTANA_IDS cada HISTORIAL_EN_VIVO_POLL segundos (1 consulta por fecha, sin
+  recorrer el padrón).
+
+Los ids se asignan en el INSERT pero las filas se confirman en otro orden: una
+con id menor puede hacerse visible después de que el cursor la pasó. Por eso
+cada sondeo vuelve a mirar los últimos VENTANA_IDS ids. El `id:` de cada
+evento es el de su Asistencia; al reconectar, EventSource lo devuelve en
+Last-Event-ID y la ventana cubre lo que se confirmó tarde. Lo que llega por
+ambos caminos (o dos veces por la ventana) se envía una sola vez por stream;
+entre conexiones el navegador aplica cada evento de forma idempotente.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Asistencia
+
+MAX_CANAL = 512
+LOTE_BD = 500
+VENTANA_IDS = 200  # ids bajo el cursor que se vuelven a mirar (commits fuera de orden)
+RETRY_MS = 3000
+
+_MOTIVOS = dict(Asistencia.MOTIVOS)
+
+
+def activo() -> bool:
+    return bool(getattr(settings, "HISTORIAL_EN_VIVO", False))
+
+
+def evento(profesor_id, fecha, fecha_hora, tipo="E", id=None, motivo="", detalle=""):
+    """Lo que el historial necesita para actualizar la fila y los contadores."""
+    local = timezone.localtime(fecha_hora) if fecha_hora else None
+
+    if tipo == "J":
+        estado_key = "JUSTIFICADO"
+        estado = f"JUSTIFICADO ({_MOTIVOS.get(motivo) or 'Justificación'})"
+        detalle = (detalle or "").strip() or "Inasistencia justificada"
+    else:
+        estado_key = "ASISTIO"
+        estado = "ASISTIÓ"
+        detalle = "Asistencia registrada"
+
+    return {
+        "id": id,
+        "profesor_id": profesor_id,
+        "fecha": str(fecha),
+        "tipo": tipo,
+        "estado_key": estado_key,
+        "estado": estado,
+        "detalle": detalle,
+        "fecha_hora": local.isoformat() if local else "",
+        "hora": local.strftime("%d/%m/%Y %H:%M") if local else "",
+    }
+
+
+def evento_de(asistencia):
+    """Evento a partir de una Asistencia (o EntradaDia del journal)."""
+    return evento(
+        asistencia.profesor_id,
+        asistencia.fecha,
+        asistencia.fecha_hora,
+        tipo=getattr(asistencia, "tipo", "E"),
+        id=asistencia.id,
+        motivo=getattr(asistencia, "motivo", ""),
+        detalle=getattr(asistencia, "detalle", ""),
+    )
+
+
+# =========================================================
+# CANAL EN MEMORIA (por proceso)
+# =========================================================
+class _Canal:
+    """Últimos eventos del proceso con número de secuencia; despierta a los streams."""
+
+    def __init__(self, maximo):
+        self._eventos = deque(maxlen=maximo)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._esperas_async = set()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publicar(self, ev):
+        with self._cond:
+            self._seq += 1
+            self._eventos.append((self._seq, ev))
+            self._cond.notify_all()
+            esperas = list(self._esperas_async)
+        for loop, listo in esperas:
+            try:
+                loop.call_soon_threadsafe(listo.set)
+            except RuntimeError:
+                pass  # loop ya cerrado
+
+    def desde(self, seq):
+        # Si un stream se atrasa más de `maximo` eventos, el sondeo a BD los recupera
+        with self._cond:
+            return [(s, ev) for s, ev in self._eventos if s > seq]
+
+    def esperar(self, seq, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > seq, timeout=timeout)
+
+    async def aesperar(self, seq, timeout):
+        espera = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            if self._seq > seq:
+                return
+            self._esperas_async.add(espera)
+        try:
+            await asyncio.wait_for(espera[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._esperas_async.discard(espera)
+
+
+_canal = _Canal(MAX_CANAL)
+
+
+def publicar(asistencia):
+    """Publica la ENTRADA/justificación a los streams abiertos en este proceso."""
+    _canal.publicar(evento_de(asistencia))
+
+
+# =========================================================
+# STREAM
+# =========================================================
+def _tiempos(duracion, poll):
+    if duracion is None:
+        duracion = float(getattr(settings, "HISTORIAL_EN_VIVO_DURACION", 25))
+    if poll is None:
+        poll = float(getattr(settings, "HISTORIAL_EN_VIVO_POLL", 3))
+    return duracion, poll
+
+
+class _Stream:
+    """Cursor de BD, secuencia del canal y eventos ya enviados de una conexión."""
+
+    def __init__(self, fecha, cursor):
+        self.fecha = fecha
+        self.fecha_str = str(fecha)
+        self.cursor = cursor
+        self.seq = _canal.seq
+        self.enviados = set()
+
+    def _sse(self, ev):
+        clave = (ev["profesor_id"], ev["tipo"])
+        if clave in self.enviados:
+            return ""
+        self.enviados.add(clave)
+        data = json.dumps(ev, ensure_ascii=False, separators=(",", ":"))
+        # Sin id (ENTRADA aún en el journal): EventSource conserva el último recibido
+        id_linea = f"id: {ev['id']}\n" if ev["id"] else ""
+        return f"{id_linea}event: asistencia\ndata: {data}\n\n"
+
+    def del_canal(self):
+        nuevos = _canal.desde(self.seq)
+        if not nuevos:
+            return ""
+        self.seq = nuevos[-1][0]
+        return "".join(self._sse(ev) for _, ev in nuevos if ev["fecha"] == self.fecha_str)
+
+    def de_bd(self):
+        filas = (
+            Asistencia.objects
+            .filter(fecha=self.fecha, id__gt=max(0, self.cursor - VENTANA_IDS))
+            .order_by("id")
+            .values_list("id", "profesor_id", "tipo", "fecha_hora", "motivo", "detalle")
+            [:LOTE_BD]
+        )
+        partes = []
+        for asistencia_id, profesor_id, tipo, fecha_hora, motivo, detalle in filas:
+            self.cursor = max(self.cursor, asistencia_id)
+            partes.append(
+                self._sse(
+                    evento(
+                        profesor_id,
+                        self.fecha,
+                        fecha_hora,
+                        tipo=tipo,
+                        id=asistencia_id,
+                        motivo=motivo,
+                        detalle=detalle,
+                    )
+                )
+            )
+        return "".join(partes)
+
+
+def stream(fecha, cursor=0, duracion=None, poll=None):
+    """
+    Generador SSE (WSGI). Termina a los `duracion` segundos: en un worker sync
+    la conexión lo ocupa entero, así que el navegador reconecta (retry) con
+    Last-Event-ID en lugar de mantenerla abierta indefinidamente.
+    """
+    duracion, poll = _tiempos(duracion, poll)
+    s = _Stream(fecha, cursor)
+    limite = time.monotonic() + duracion
+    proximo_sondeo = 0.0
+
+    yield f"retry: {RETRY_MS}\n\n"
+    while True:
+        datos = s.del_canal()
+        if time.monotonic() >= proximo_sondeo:
+            datos += s.de_bd() or ": ping\n\n"
+            proximo_sondeo = time.monotonic() + poll
+        if datos:
+            yield datos
+
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            return
+        _canal.esperar(s.seq, min(restante, max(0.0, proximo_sondeo - time.monotonic())))
+
+
+async def astream(fecha, cursor=0, duracion=None, poll=None):
+    """Versión async (ASGI): la espera no ocupa hilo; solo el sondeo va a BD en un hilo."""
+    duracion, poll = _tiempos(duracion, poll)
+    s = _Stream(fecha, cursor)
+    de_bd = sync_to_async(s.de_bd)
+    limite = time.monotonic() + duracion
+    proximo_sondeo = 0.0
+
+    yield f"retry: {RETRY_MS}\n\n"
+    while True:
+        datos = s.del_canal()
+        if time.monotonic() >= proximo_sondeo:
+            datos += await de_bd() or ": ping\n\n"
+            proximo_sondeo = time.monotonic() + poll
+        if datos:
+            yield datos
+
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            return
+        await _canal.aesperar(s.seq, min(restante, max(0.0, proximo_sondeo - time.monotonic())))
@@ -0,0 +1,193 @@
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connections, router, transaction
+
+from . import diaria, en_vivo
+from .models import Asistencia
+
+# SQLite solo admite un escritor a la vez: en el fallback serializamos
+# dentro del proceso para no chocar con "database table is locked".
+_sqlite_lock = threading.Lock()
+
+_COLUMNAS_INSERT = (
+    "profesor_id",
+    "fecha",
+    "fecha_hora",
+    "tipo",
+    "motivo",
+    "detalle",
+    "registrado_por_id",
+    "ip",
+    "user_agent",
+)
+
+_CAMPOS_RETORNO = ["id", "profesor_id", "fecha", "fecha_hora", "tipo"]
+
+
+def _desde_fila(using, profesor_id, fecha, row):
+    asistencia_id, fecha_hora = row[0], row[1]
+    return Asistencia.from_db(
+        using,
+        _CAMPOS_RETORNO,
+        (asistencia_id, profesor_id, fecha, fecha_hora, "E"),
+    )
+
+
+def _entrada_existente(using, profesor_id, fecha):
+    return (
+        Asistencia.objects.using(using)
+        .only(*_CAMPOS_RETORNO)
+        .filter(profesor_id=profesor_id, fecha=fecha, tipo="E")
+        .order_by("fecha_hora")
+        .first()
+    )
+
+
+def _insertar_postgres(using, profesor_id, fecha, valores):
+    """
+    ✅ 1 sola sentencia:
+    INSERT ... ON CONFLICT (profesor_id, fecha, tipo) DO NOTHING RETURNING
+    y, si hubo conflicto, devuelve la fila existente en la misma consulta.
+    """
+    tabla = Asistencia._meta.db_table
+    qn = connections[using].ops.quote_name
+    columnas = ", ".join(qn(c) for c in _COLUMNAS_INSERT)
+    marcadores = ", ".join(["%s"] * len(_COLUMNAS_INSERT))
+
+    sql = (
+        f"WITH ins AS ("
+        f"  INSERT INTO {qn(tabla)} ({columnas}) VALUES ({marcadores})"
+        f"  ON CONFLICT (profesor_id, fecha, tipo) DO NOTHING"
+        f"  RETURNING id, fecha_hora"
+        f") "
+        f"SELECT id, fecha_hora, TRUE FROM ins "
+        f"UNION ALL "
+        f"SELECT id, fecha_hora, FALSE FROM {qn(tabla)} "
+        f"WHERE profesor_id = %s AND fecha = %s AND tipo = 'E' "
+        f"AND NOT EXISTS (SELECT 1 FROM ins) "
+        f"LIMIT 1"
+    )
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [*valores, profesor_id, fecha])
+        row = cursor.fetchone()
+
+    if row is None:
+        # La fila en conflicto se confirmó después del snapshot de la sentencia:
+        # ya es visible para una lectura nueva.
+        return _entrada_existente(using, profesor_id, fecha), False
+
+    asistencia, creada = _desde_fila(using, profesor_id, fecha, row), bool(row[2])
+    if creada:
+        # SQL directo: no dispara post_save (signals.en_vivo_asistencia_creada / diaria_*)
+        transaction.on_commit(lambda: diaria.anotar_entradas([asistencia]), using=using)
+        transaction.on_commit(lambda: en_vivo.publicar(asistencia), using=using)
+    return asistencia, creada
+
+
+def _insertar_portable(using, profesor_id, fecha, valores):
+    kwargs = dict(zip(_COLUMNAS_INSERT, valores))
+
+    with _sqlite_lock:
+        try:
+            with transaction.atomic(using=using):
+                asistencia = Asistencia.objects.using(using).create(**kwargs)
+            return asistencia, True
+        except IntegrityError:
+            existente = _entrada_existente(using, profesor_id, fecha)
+            if existente is None:
+                raise  # no fue el choque con uniq_profesor_fecha_tipo (p. ej. FK)
+            return existente, False
+
+
+def insertar_entrada(profesor_id, fecha, fecha_hora, registrado_por_id=None, ip=None, user_agent=""):
+    """
+    Registra la ENTRADA (tipo="E") del docente para `fecha` apoyándose en
+    uniq_profesor_fecha_tipo, sin select_for_update ni exists() previo.
+
+    Devuelve (asistencia, creada). Si ya existía, `asistencia` es la fila
+    existente (con id y fecha_hora) y `creada` es False.
+    """
+    using = router.db_for_write(Asistencia)
+    valores = [
+        profesor_id,
+        fecha,
+        fecha_hora,
+        "E",
+        "",
+        "",
+        registrado_por_id,
+        ip or None,
+        (user_agent or "")[:255],
+    ]
+
+    if connections[using].vendor == "postgresql":
+        return _insertar_postgres(using, profesor_id, fecha, valores)
+
+    return _insertar_portable(using, profesor_id, fecha, valores)
+
+
+def _insertar_postgres_lote(using, fecha, filas):
+    """
+    ✅ 1 INSERT multi-fila ... ON CONFLICT DO NOTHING RETURNING: lo devuelto es
+    exactamente lo que insertó esta sentencia.
+    """
+    tabla = Asistencia._meta.db_table
+    qn = connections[using].ops.quote_name
+    columnas = ", ".join(qn(c) for c in _COLUMNAS_INSERT)
+    marcadores = "(" + ", ".join(["%s"] * len(_COLUMNAS_INSERT)) + ")"
+
+    sql = (
+        f"INSERT INTO {qn(tabla)} ({columnas}) VALUES {', '.join([marcadores] * len(filas))} "
+        f"ON CONFLICT (profesor_id, fecha, tipo) DO NOTHING "
+        f"RETURNING id, fecha_hora, profesor_id"
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [v for valores in filas for v in valores])
+        creadas = {row[2]: _desde_fila(using, row[2], fecha, row) for row in cursor.fetchall()}
+
+    if creadas:
+        lista = list(creadas.values())
+        transaction.on_commit(lambda: diaria.anotar_entradas(lista), using=using)
+        transaction.on_commit(lambda: [en_vivo.publicar(a) for a in lista], using=using)
+    return creadas
+
+
+def insertar_entradas(fecha, horas, registrado_por_id=None, ip=None, user_agent=""):
+    """
+    Versión por lote de insertar_entrada(): `horas` es {profesor_id: fecha_hora}.
+    Devuelve {profesor_id: (asistencia, creada)} con la misma semántica.
+    """
+    using = router.db_for_write(Asistencia)
+    resultado = {}
+
+    if horas and connections[using].vendor == "postgresql":
+        filas = [
+            [profesor_id, fecha, fecha_hora, "E", "", "", registrado_por_id, ip or None, (user_agent or "")[:255]]
+            for profesor_id, fecha_hora in horas.items()
+        ]
+        for profesor_id, asistencia in _insertar_postgres_lote(using, fecha, filas).items():
+            resultado[profesor_id] = (asistencia, True)
+
+        # Las que chocaron: 1 consulta por la fila que ya existía
+        for asistencia in (
+            Asistencia.objects.using(using)
+            .only(*_CAMPOS_RETORNO)
+            .filter(profesor_id__in=set(horas) - set(resultado), fecha=fecha, tipo="E")
+            .order_by("fecha_hora")
+        ):
+            resultado.setdefault(asistencia.profesor_id, (asistencia, False))
+
+    # Portable, o la fila en conflicto desapareció entre ambas sentencias
+    for profesor_id, fecha_hora in horas.items():
+        if profesor_id not in resultado:
+            resultado[profesor_id] = insertar_entrada(
+                profesor_id, fecha, fecha_hora, registrado_por_id=registrado_por_id, ip=ip, user_agent=user_agent
+            )
+    return resultado
+
+
+# La sentencia única no tiene equivalente en el ORM async: se ejecuta en el
+# hilo de BD del request (thread_sensitive) sin bloquear el event loop.
+ainsertar_entrada = sync_to_async(insertar_entrada)
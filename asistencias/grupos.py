@@ -0,0 +1,79 @@
+"""
+Grupos (nombres) de cada usuario, para los chequeos de rol de las vistas.
+
+Se guardan en el propio request.user (dura lo que el request) y en el cache
+compartido con un TTL corto. m2m_changed sobre User.groups borra la entrada
+del usuario afectado; renombrar o borrar un Group incrementa la versión
+"grupos" (ver versiones.py) y deja obsoletas todas las entradas.
+
+Tras el primer request, un kiosko del escáner no consulta auth_user_groups.
+"""
+from django.core.cache import cache
+
+from .versiones import aget_version, bump_version, get_version
+
+VERSION_KEY = "grupos"
+TTL = 60
+
+_ATRIBUTO = "_asistencias_grupos"
+
+
+def _clave(version, user_id):
+    return f"asistencias:grupos:{version}:{user_id}"
+
+
+def grupos_de(user) -> frozenset:
+    """frozenset con los nombres de grupo del usuario (vacío si es anónimo)."""
+    if not user.is_authenticated:
+        return frozenset()
+
+    grupos = getattr(user, _ATRIBUTO, None)
+    if grupos is None:
+        clave = _clave(get_version(VERSION_KEY), user.pk)
+        grupos = cache.get(clave)
+        if grupos is None:
+            grupos = frozenset(user.groups.values_list("name", flat=True))
+            cache.set(clave, grupos, timeout=TTL)
+        setattr(user, _ATRIBUTO, grupos)
+    return grupos
+
+
+async def agrupos_de(user) -> frozenset:
+    if not user.is_authenticated:
+        return frozenset()
+
+    grupos = getattr(user, _ATRIBUTO, None)
+    if grupos is None:
+        clave = _clave(await aget_version(VERSION_KEY), user.pk)
+        grupos = await cache.aget(clave)
+        if grupos is None:
+            grupos = frozenset([n async for n in user.groups.values_list("name", flat=True)])
+            await cache.aset(clave, grupos, timeout=TTL)
+        setattr(user, _ATRIBUTO, grupos)
+    return grupos
+
+
+def en_grupo(user, *nombres) -> bool:
+    """Superusuario o miembro de alguno de `nombres`."""
+    return user.is_authenticated and (
+        user.is_superuser or not grupos_de(user).isdisjoint(nombres)
+    )
+
+
+async def aen_grupo(user, *nombres) -> bool:
+    if not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    return not (await agrupos_de(user)).isdisjoint(nombres)
+
+
+def invalidar_usuarios(user_ids):
+    user_ids = [i for i in user_ids if i is not None]
+    if user_ids:
+        version = get_version(VERSION_KEY)
+        cache.delete_many([_clave(version, i) for i in user_ids])
+
+
+def invalidar_grupos():
+    bump_version(VERSION_KEY)
@@ -0,0 +1,227 @@
+"""
+Idempotency-Key para los reintentos del escáner y del registro manual.
+
+La primera respuesta a (usuario, ruta, clave) se guarda unos segundos en un
+LRU acotado del proceso y en el cache compartido (el reintento puede caer en
+otro worker). Un reintento con la misma clave recibe esa misma respuesta sin
+volver a ejecutar la vista ni tocar la BD. Si la primera petición aún está en
+curso, el reintento espera un poco su resultado y, si no llega, responde 409.
+
+Ese "en curso" necesita un lock atómico entre workers: con Redis es `cache.add`
+(SET NX); con FileBasedCache `add` no es atómico, así que el lock es una fila
+IdempotenciaEnCurso y la restricción UNIQUE decide quién ejecuta la vista.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotenciaEnCurso
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+CAMPO = "idempotency_key"
+
+TTL = 120
+LOCK_TTL = 30
+ESPERA_EN_CURSO = 5.0
+MAX_LOCAL = 2048
+
+_CLAVE_RE = re.compile(r"^[A-Za-z0-9_.:\-]{8,128}$")
+_CABECERAS = ("Content-Type", "Location")
+
+
+class _LRUConTTL:
+    """Dict acotado (LRU) con vencimiento por entrada; seguro entre hilos."""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return None
+            vence, valor = item
+            if vence < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, ttl):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+
+_local = _LRUConTTL(MAX_LOCAL)
+
+
+def _leer_clave(request):
+    clave = (request.META.get(HEADER) or request.POST.get(CAMPO) or "").strip()
+    return clave if _CLAVE_RE.match(clave) else ""
+
+
+def _clave_cache(user_id, path, clave):
+    digest = hashlib.sha256(f"{user_id}:{path}:{clave}".encode()).hexdigest()
+    return f"asistencias:idem:{digest}"
+
+
+def _serializar(response):
+    return (
+        response.status_code,
+        bytes(response.content),
+        [(h, response[h]) for h in _CABECERAS if response.has_header(h)],
+    )
+
+
+def _reconstruir(guardada):
+    status, contenido, cabeceras = guardada
+    response = HttpResponse(contenido, status=status)
+    for nombre, valor in cabeceras:
+        response[nombre] = valor
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _lock_en_cache():
+    return "redis" in settings.CACHES["default"]["BACKEND"].lower()
+
+
+def _tomar_lock(clave):
+    if _lock_en_cache():
+        return cache.add(f"{clave}:lock", 1, timeout=LOCK_TTL)
+
+    ahora = timezone.now()
+    # Locks huérfanos (worker caído a media vista): vencen solos
+    IdempotenciaEnCurso.objects.filter(vence__lt=ahora).delete()
+    try:
+        with transaction.atomic():
+            IdempotenciaEnCurso.objects.create(clave=clave, vence=ahora + timedelta(seconds=LOCK_TTL))
+    except IntegrityError:
+        return False
+    return True
+
+
+def _soltar_lock(clave):
+    if _lock_en_cache():
+        cache.delete(f"{clave}:lock")
+    else:
+        IdempotenciaEnCurso.objects.filter(clave=clave).delete()
+
+
+def _guardable(response):
+    return response.status_code < 500 and not getattr(response, "streaming", False)
+
+
+def _en_curso():
+    return JsonResponse(
+        {
+            "ok": False,
+            "estado": "EN_PROCESO",
+            "tipo_evento": "EN_PROCESO",
+            "msg": "La solicitud anterior aún se está procesando. Reintenta en un momento.",
+        },
+        status=409,
+        headers={"Retry-After": "1"},
+    )
+
+
+def idempotente(solo_si=None):
+    """
+    Decorador para vistas POST (sync o async). Aplicarlo por dentro de
+    user_passes_test: la clave se aísla por usuario.
+    `solo_si(request)` limita a ciertas acciones (ej. registro_manual "aceptar").
+    """
+    def decorator(view_func):
+        def _clave_de(request, user_id):
+            if request.method != "POST" or (solo_si and not solo_si(request)):
+                return None
+            clave = _leer_clave(request)
+            return _clave_cache(user_id, request.path, clave) if clave else None
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _view_wrapper(request, *args, **kwargs):
+                user = await request.auser()
+                clave = _clave_de(request, user.pk)
+                if clave is None:
+                    return await view_func(request, *args, **kwargs)
+
+                guardada = _local.get(clave) or await cache.aget(clave)
+                if guardada is not None:
+                    return _reconstruir(guardada)
+
+                if not await sync_to_async(_tomar_lock)(clave):
+                    limite = time.monotonic() + ESPERA_EN_CURSO
+                    while time.monotonic() < limite:
+                        await asyncio.sleep(0.1)
+                        guardada = await cache.aget(clave)
+                        if guardada is not None:
+                            return _reconstruir(guardada)
+                    return _en_curso()
+
+                try:
+                    response = await view_func(request, *args, **kwargs)
+                    if _guardable(response):
+                        guardada = _serializar(response)
+                        _local.set(clave, guardada, TTL)
+                        await cache.aset(clave, guardada, timeout=TTL)
+                    return response
+                finally:
+                    await sync_to_async(_soltar_lock)(clave)
+
+            return _view_wrapper
+
+        @wraps(view_func)
+        def _view_wrapper(request, *args, **kwargs):
+            clave = _clave_de(request, request.user.pk)
+            if clave is None:
+                return view_func(request, *args, **kwargs)
+
+            guardada = _local.get(clave) or cache.get(clave)
+            if guardada is not None:
+                return _reconstruir(guardada)
+
+            if not _tomar_lock(clave):
+                limite = time.monotonic() + ESPERA_EN_CURSO
+                while time.monotonic() < limite:
+                    time.sleep(0.1)
+                    guardada = _local.get(clave) or cache.get(clave)
+                    if guardada is not None:
+                        return _reconstruir(guardada)
+                return _en_curso()
+
+            try:
+                response = view_func(request, *args, **kwargs)
+                if _guardable(response):
+                    guardada = _serializar(response)
+                    _local.set(clave, guardada, TTL)
+                    cache.set(clave, guardada, timeout=TTL)
+                return response
+            finally:
+                _soltar_lock(clave)
+
+        return _view_wrapper
+
+    return decorator
@@ -0,0 +1,370 @@
+"""
+Journal local de escaneos (modo write-behind, opcional: SCAN_JOURNAL=1).
+
+api_scan_asistencia deja la ENTRADA en un SQLite local (WAL, synchronous=FULL)
+y responde sin esperar a PostgreSQL. Un flusher (hilo del worker o el comando
+`vaciar_journal_scan`) vuelca lo pendiente a Asistencia por lotes.
+
+- "¿Ya escaneó hoy?" se responde con registro_dia (memoria); si no está, el
+  INSERT OR IGNORE del journal decide.
+- UNIQUE(profesor_id, fecha) en el journal deduplica entre workers del mismo host.
+- Tras una caída, lo pendiente sigue en disco: el flusher lo reprocesa al
+  arrancar. El volcado es idempotente (ignore_conflicts + conciliación).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+
+from . import diaria, en_vivo, registro_dia
+from .models import Asistencia, Profesor
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 0
+VOLCADO = 1
+CONFLICTO = 2  # ya había otra ENTRADA en BD (registro manual, otro host) o el profesor no existe
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    profesor_id INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    fecha_hora TEXT NOT NULL,
+    registrado_por_id INTEGER,
+    ip TEXT,
+    user_agent TEXT NOT NULL DEFAULT '',
+    estado INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (profesor_id, fecha)
+);
+CREATE INDEX IF NOT EXISTS entradas_estado ON entradas (estado, id);
+CREATE TABLE IF NOT EXISTS lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    duenio TEXT NOT NULL,
+    hasta REAL NOT NULL
+);
+INSERT OR IGNORE INTO lease (id, duenio, hasta) VALUES (1, '', 0);
+"""
+
+_local = threading.local()
+
+
+def activo() -> bool:
+    return bool(getattr(settings, "SCAN_JOURNAL", False))
+
+
+def ruta() -> str:
+    return str(settings.SCAN_JOURNAL_PATH)
+
+
+def _conexion():
+    """Conexión SQLite por hilo (autocommit); se recrea si cambia la ruta."""
+    archivo = ruta()
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.ruta == archivo:
+        return conn
+
+    carpeta = os.path.dirname(archivo)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+
+    conn = sqlite3.connect(archivo, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")  # la fila sobrevive a un corte antes de responder
+    conn.executescript(_SCHEMA)
+    _local.conn = conn
+    _local.ruta = archivo
+    return conn
+
+
+def _insertar(conn, profesor_id, fecha, fecha_hora, registrado_por_id, ip, user_agent):
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO entradas "
+        "(profesor_id, fecha, fecha_hora, registrado_por_id, ip, user_agent) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            profesor_id,
+            fecha.isoformat(),
+            fecha_hora.isoformat(),
+            registrado_por_id,
+            ip or None,
+            (user_agent or "")[:255],
+        ),
+    )
+    return cur.rowcount == 1
+
+
+def _resolver(conn, profesor_id, fecha, fecha_hora, creada):
+    if creada:
+        entrada = registro_dia.anotar(registro_dia.EntradaDia(profesor_id, fecha, fecha_hora))
+        en_vivo.publicar(entrada)
+        return entrada, True
+
+    # Ya estaba en el journal: otro worker del mismo host o pendiente de antes de una caída
+    (fh,) = conn.execute(
+        "SELECT fecha_hora FROM entradas WHERE profesor_id = ? AND fecha = ?",
+        (profesor_id, fecha.isoformat()),
+    ).fetchone()
+    entrada = registro_dia.EntradaDia(profesor_id, fecha, datetime.fromisoformat(fh))
+    return registro_dia.anotar(entrada), False
+
+
+def registrar(profesor_id, fecha, fecha_hora, registrado_por_id=None, ip=None, user_agent=""):
+    """
+    Igual que entradas.insertar_entrada() pero contra el journal local.
+    Devuelve (EntradaDia, creada).
+    """
+    existente = registro_dia.entrada(profesor_id, fecha)
+    if existente is not None:
+        return existente, False
+
+    conn = _conexion()
+    creada = _insertar(conn, profesor_id, fecha, fecha_hora, registrado_por_id, ip, user_agent)
+    return _resolver(conn, profesor_id, fecha, fecha_hora, creada)
+
+
+def registrar_lote(fecha, horas, registrado_por_id=None, ip=None, user_agent=""):
+    """
+    registrar() para un lote del escáner: `horas` es {profesor_id: fecha_hora}.
+    ✅ Una sola transacción (un fsync) para todo el lote.
+    Devuelve {profesor_id: (EntradaDia, creada)}.
+    """
+    resultado = {}
+    pendientes = {}
+    for profesor_id, fecha_hora in horas.items():
+        existente = registro_dia.entrada(profesor_id, fecha)
+        if existente is not None:
+            resultado[profesor_id] = (existente, False)
+        else:
+            pendientes[profesor_id] = fecha_hora
+
+    if not pendientes:
+        return resultado
+
+    conn = _conexion()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        creadas = {
+            profesor_id: _insertar(conn, profesor_id, fecha, fecha_hora, registrado_por_id, ip, user_agent)
+            for profesor_id, fecha_hora in pendientes.items()
+        }
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    for profesor_id, fecha_hora in pendientes.items():
+        resultado[profesor_id] = _resolver(conn, profesor_id, fecha, fecha_hora, creadas[profesor_id])
+    return resultado
+
+
+def pendientes(fecha):
+    """
+    ENTRADAS de `fecha` aún sin volcar a BD: [(profesor_id, fecha_hora)].
+    registro_dia las suma a su siembra (tras un reinicio siguen siendo DUPLICADO).
+    """
+    filas = _conexion().execute(
+        "SELECT profesor_id, fecha_hora FROM entradas WHERE fecha = ? AND estado = ?",
+        (fecha.isoformat(), PENDIENTE),
+    ).fetchall()
+    return [(profesor_id, datetime.fromisoformat(fh)) for profesor_id, fh in filas]
+
+
+def olvidar_entrada(profesor_id, fecha):
+    """Quita la fila del journal (la ENTRADA se borró en BD y puede volver a registrarse)."""
+    _conexion().execute(
+        "DELETE FROM entradas WHERE profesor_id = ? AND fecha = ?",
+        (profesor_id, fecha.isoformat()),
+    )
+
+
+# =========================================================
+# VOLCADO A BD
+# =========================================================
+def _tomar_lease(duenio, segundos):
+    """Un solo flusher activo por journal (entre workers del mismo host)."""
+    ahora = time.time()
+    cur = _conexion().execute(
+        "UPDATE lease SET duenio = ?, hasta = ? WHERE id = 1 AND (hasta < ? OR duenio = ?)",
+        (duenio, ahora + segundos, ahora, duenio),
+    )
+    return cur.rowcount == 1
+
+
+def vaciar(lote=500):
+    """
+    Vuelca hasta `lote` entradas pendientes. Devuelve
+    {"volcadas": n, "conflictos": n, "pendientes": n}.
+    """
+    conn = _conexion()
+    filas = conn.execute(
+        "SELECT id, profesor_id, fecha, fecha_hora, registrado_por_id, ip, user_agent "
+        "FROM entradas WHERE estado = ? ORDER BY id LIMIT ?",
+        (PENDIENTE, lote),
+    ).fetchall()
+
+    resultado = {"volcadas": 0, "conflictos": 0, "pendientes": 0}
+    if not filas:
+        return resultado
+
+    profesores = set(
+        Profesor.objects.filter(id__in={f[1] for f in filas}).values_list("id", flat=True)
+    )
+    usuarios = set(
+        get_user_model().objects
+        .filter(id__in={f[4] for f in filas if f[4]})
+        .values_list("id", flat=True)
+    )
+
+    objs = []
+    for _, profesor_id, fecha, fecha_hora, registrado_por_id, ip, user_agent in filas:
+        if profesor_id not in profesores:
+            continue
+        objs.append(
+            Asistencia(
+                profesor_id=profesor_id,
+                fecha=date.fromisoformat(fecha),
+                fecha_hora=datetime.fromisoformat(fecha_hora),
+                tipo="E",
+                registrado_por_id=registrado_por_id if registrado_por_id in usuarios else None,
+                ip=ip,
+                user_agent=user_agent,
+            )
+        )
+
+    # ✅ 1 INSERT por lote; los choques con (profesor, fecha, tipo) se ignoran
+    Asistencia.objects.bulk_create(objs, ignore_conflicts=True, batch_size=lote)
+
+    # Conciliación: es "nuestra" si la fila en BD tiene la misma fecha_hora
+    en_bd = {
+        (profesor_id, fecha): fecha_hora
+        for profesor_id, fecha, fecha_hora in (
+            Asistencia.objects
+            .filter(
+                tipo="E",
+                profesor_id__in={o.profesor_id for o in objs},
+                fecha__in={o.fecha for o in objs},
+            )
+            .values_list("profesor_id", "fecha", "fecha_hora")
+        )
+    }
+
+    volcadas, conflictos, entradas = [], [], []
+    for journal_id, profesor_id, fecha, fecha_hora, *_ in filas:
+        entrada = registro_dia.EntradaDia(
+            profesor_id, date.fromisoformat(fecha), datetime.fromisoformat(fecha_hora)
+        )
+        actual = en_bd.get((entrada.profesor_id, entrada.fecha))
+        if actual is not None and actual == entrada.fecha_hora:
+            volcadas.append(journal_id)
+            entradas.append(entrada)
+        else:
+            conflictos.append(journal_id)
+
+    # bulk_create no dispara post_save; si esto falla, la próxima pasada lo repite
+    diaria.anotar_entradas(entradas)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("UPDATE entradas SET estado = ? WHERE id = ?", [(VOLCADO, i) for i in volcadas])
+        conn.executemany("UPDATE entradas SET estado = ? WHERE id = ?", [(CONFLICTO, i) for i in conflictos])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    if conflictos:
+        logger.warning("Journal scan: %s entradas en conflicto (ya existían en BD)", len(conflictos))
+
+    (pendientes,) = conn.execute(
+        "SELECT COUNT(*) FROM entradas WHERE estado = ?", (PENDIENTE,)
+    ).fetchone()
+    resultado.update(volcadas=len(volcadas), conflictos=len(conflictos), pendientes=pendientes)
+    return resultado
+
+
+def _soltar_lease(duenio):
+    _conexion().execute("UPDATE lease SET hasta = 0 WHERE id = 1 AND duenio = ?", (duenio,))
+
+
+def vaciar_todo(lote=500, duenio=None, lease_segundos=30, soltar=False):
+    """
+    Vuelca hasta dejar el journal sin pendientes (si se obtiene el lease).
+    soltar=True libera el lease al terminar (ejecuciones de una sola pasada).
+    """
+    duenio = duenio or uuid.uuid4().hex
+    total = {"volcadas": 0, "conflictos": 0, "pendientes": 0}
+    try:
+        while _tomar_lease(duenio, lease_segundos):
+            parcial = vaciar(lote=lote)
+            total["volcadas"] += parcial["volcadas"]
+            total["conflictos"] += parcial["conflictos"]
+            total["pendientes"] = parcial["pendientes"]
+            if not parcial["pendientes"] or not (parcial["volcadas"] or parcial["conflictos"]):
+                break
+    finally:
+        if soltar:
+            _soltar_lease(duenio)
+    return total
+
+
+def purgar(dias=7):
+    """Borra del journal lo ya volcado/conciliado con más de `dias` días."""
+    cur = _conexion().execute(
+        "DELETE FROM entradas WHERE estado != ? AND fecha < date('now', ?)",
+        (PENDIENTE, f"-{int(dias)} days"),
+    )
+    return cur.rowcount
+
+
+# =========================================================
+# FLUSHER EN HILO (SCAN_JOURNAL_FLUSHER="thread")
+# =========================================================
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _bucle(intervalo, lote):
+    duenio = uuid.uuid4().hex
+    ultima_purga = 0.0
+    while True:
+        try:
+            vaciar_todo(lote=lote, duenio=duenio, lease_segundos=max(30, intervalo * 5))
+            if time.monotonic() - ultima_purga > 3600:
+                purgar()
+                ultima_purga = time.monotonic()
+        except Exception:
+            logger.exception("Journal scan: error volcando a BD")
+        finally:
+            close_old_connections()
+        time.sleep(intervalo)
+
+
+def iniciar_flusher():
+    """
+    Arranca el hilo de volcado (1 por proceso). La primera pasada es inmediata:
+    reprocesa lo que quedó pendiente si el proceso anterior cayó.
+    """
+    global _flusher
+    if not activo() or getattr(settings, "SCAN_JOURNAL_FLUSHER", "thread") != "thread":
+        return None
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(
+                target=_bucle,
+                args=(
+                    float(getattr(settings, "SCAN_JOURNAL_INTERVALO", 2)),
+                    int(getattr(settings, "SCAN_JOURNAL_LOTE", 500)),
+                ),
+                name="scan-journal-flusher",
+                daemon=True,
+            )
+            _flusher.start()
+    return _flusher
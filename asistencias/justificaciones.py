@@ -0,0 +1,239 @@
+"""
+Justificaciones en bloque: rango de fechas de un docente, o varios docentes
+en una fecha (comisión oficial de un grupo).
+
+Un descanso médico de dos semanas ya no son diez envíos, ni una comisión de
+veinte docentes veinte envíos: se valida con UNA consulta por tabla (ENTRADAS
+y justificaciones), se descartan fines de semana, días especiales y días con
+ENTRADA, y lo que queda se inserta en una transacción con
+bulk_create(ignore_conflicts=True) contra uniq_justificacion_profesor_fecha y
+uniq_profesor_fecha_tipo. Si otro request ganó alguna fila entre la
+validación y el INSERT, esa fila sale como CONFLICTO. Cuáles insertó ESTA
+llamada lo dice el propio INSERT (... ON CONFLICT DO NOTHING RETURNING, como
+entradas.py), no una consulta posterior por usuario y hora: un doble envío no
+se atribuye las filas del otro. La Asistencia(tipo="J") se escribe con upsert
+(como el update_or_create de set_justificacion): una J antigua sin
+justificación toma el motivo y detalle nuevos.
+
+Todas las filas comparten un solo PDF: el nombre ya subido directo al
+storage (subida_directa.py) o una sola entrada en la cola de subidas.py.
+bulk_create no dispara signals: AsistenciaDiaria se recalcula para lo
+insertado al confirmar.
+"""
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+
+from . import calendario, diaria, subidas
+from .models import Asistencia, JustificacionAsistencia, Profesor
+
+LOTE = 500
+MAX_DIAS_RANGO = 62
+MAX_DOCENTES = 500
+
+# Resultado por fecha
+CREADA = "CREADA"
+ASISTIO = "ASISTIO"
+YA_JUSTIFICADA = "YA_JUSTIFICADA"
+DIA_ESPECIAL = "DIA_ESPECIAL"
+CONFLICTO = "CONFLICTO"
+NO_ENCONTRADO = "NO_ENCONTRADO"
+
+ETIQUETAS = {
+    CREADA: "justificada",
+    ASISTIO: "tiene asistencia",
+    YA_JUSTIFICADA: "ya estaba justificada",
+    DIA_ESPECIAL: "día especial",
+    CONFLICTO: "registrada por otro usuario",
+    NO_ENCONTRADO: "docente no encontrado",
+}
+
+
+def _insertar_postgres(using, objs):
+    meta = JustificacionAsistencia._meta
+    conn = connections[using]
+    qn = conn.ops.quote_name
+    campos = [f for f in meta.concrete_fields if not f.primary_key]
+    columnas = ", ".join(qn(f.column) for f in campos)
+    marcadores = "(" + ", ".join(["%s"] * len(campos)) + ")"
+
+    nuevas = {}
+    with conn.cursor() as cursor:
+        for inicio in range(0, len(objs), LOTE):
+            lote = objs[inicio:inicio + LOTE]
+            cursor.execute(
+                f"INSERT INTO {qn(meta.db_table)} ({columnas}) "
+                f"VALUES {', '.join([marcadores] * len(lote))} "
+                f"ON CONFLICT (profesor_id, fecha) DO NOTHING "
+                f"RETURNING id, profesor_id, fecha",
+                [f.get_db_prep_save(f.pre_save(o, True), conn) for o in lote for f in campos],
+            )
+            nuevas.update({(p, f): pk for pk, p, f in cursor.fetchall()})
+    return nuevas
+
+
+def _insertar_portable(using, objs):
+    nuevas = {}
+    for obj in objs:
+        try:
+            with transaction.atomic(using=using):
+                JustificacionAsistencia.objects.using(using).bulk_create([obj])
+        except IntegrityError:
+            continue
+        nuevas[(obj.profesor_id, obj.fecha)] = obj.pk
+    return nuevas
+
+
+def _insertar(objs):
+    """
+    ✅ INSERT ... ON CONFLICT (profesor_id, fecha) DO NOTHING RETURNING.
+    Devuelve {(profesor_id, fecha): id} solo de lo que insertó esta llamada.
+    """
+    using = router.db_for_write(JustificacionAsistencia)
+    if connections[using].vendor == "postgresql":
+        return _insertar_postgres(using, objs)
+    return _insertar_portable(using, objs)
+
+
+def _aplicar(pares, *, tipo, detalle, usuario, ip=None, user_agent="", archivo=None, archivo_nombre=""):
+    """
+    Inserta justificación + Asistencia(tipo="J") para cada (profesor_id, fecha)
+    de `pares` en una transacción. Devuelve {par: CREADA | CONFLICTO}.
+    """
+    if not pares:
+        return {}
+
+    if archivo_nombre:
+        archivo_estado = JustificacionAsistencia.ARCHIVO_LISTO
+    elif archivo:
+        archivo_estado = JustificacionAsistencia.ARCHIVO_PENDIENTE
+    else:
+        archivo_estado = ""
+
+    pares = set(pares)
+
+    with transaction.atomic():
+        nuestras = _insertar([
+            JustificacionAsistencia(
+                profesor_id=p,
+                fecha=f,
+                tipo=tipo,
+                detalle=detalle,
+                archivo=archivo_nombre or None,
+                archivo_estado=archivo_estado,
+                creado_por=usuario,
+                actualizado_por=usuario,
+            )
+            for p, f in sorted(pares)
+        ])
+        if not nuestras:
+            return {par: CONFLICTO for par in pares}
+
+        ahora = timezone.now()
+        Asistencia.objects.bulk_create(
+            [
+                Asistencia(
+                    profesor_id=p,
+                    fecha=f,
+                    fecha_hora=ahora,
+                    tipo="J",
+                    motivo=tipo,
+                    detalle=detalle,
+                    registrado_por=usuario,
+                    ip=ip,
+                    user_agent=(user_agent or "")[:255],
+                )
+                for p, f in nuestras
+            ],
+            update_conflicts=True,
+            unique_fields=["profesor", "fecha", "tipo"],
+            update_fields=["fecha_hora", "motivo", "detalle", "registrado_por", "ip", "user_agent"],
+            batch_size=LOTE,
+        )
+
+        if archivo and not archivo_nombre:
+            subidas.encolar(list(nuestras.values()), archivo)
+
+        desde, hasta = min(f for _, f in nuestras), max(f for _, f in nuestras)
+        ids = sorted({p for p, _ in nuestras})
+        transaction.on_commit(lambda: diaria.recalcular(desde, hasta, profesor_ids=ids))
+
+    return {par: CREADA if par in nuestras else CONFLICTO for par in pares}
+
+
+def justificar_rango(profesor, desde, hasta, **kwargs):
+    """
+    Justifica los días hábiles de desde..hasta para `profesor`. `kwargs` van a
+    _aplicar (tipo, detalle, usuario, ip, user_agent, archivo, archivo_nombre).
+    Devuelve [(fecha, resultado)] en orden.
+    """
+    dias = calendario.dias_habiles(desde, hasta)
+    especiales = calendario.especiales_en_rango(desde, hasta)
+
+    # ✅ 1 consulta por tabla para todo el rango
+    con_entrada = set(
+        Asistencia.objects
+        .filter(profesor=profesor, tipo="E", fecha__range=(desde, hasta))
+        .values_list("fecha", flat=True)
+    )
+    justificadas = set(
+        JustificacionAsistencia.objects
+        .filter(profesor=profesor, fecha__range=(desde, hasta))
+        .values_list("fecha", flat=True)
+    )
+
+    reporte = {}
+    pares = []
+    for dia in dias:
+        if dia in especiales:
+            reporte[dia] = DIA_ESPECIAL
+        elif dia in con_entrada:
+            reporte[dia] = ASISTIO
+        elif dia in justificadas:
+            reporte[dia] = YA_JUSTIFICADA
+        else:
+            pares.append((profesor.id, dia))
+
+    for (_, dia), resultado in _aplicar(pares, **kwargs).items():
+        reporte[dia] = resultado
+
+    return [(dia, reporte[dia]) for dia in dias]
+
+
+def justificar_varios(profesor_ids, fecha, **kwargs):
+    """
+    Justifica `fecha` para varios docentes. `kwargs` como en justificar_rango.
+    Devuelve {profesor_id: resultado}.
+    """
+    profesor_ids = list(dict.fromkeys(profesor_ids))
+    if calendario.es_dia_especial(fecha):
+        return {p: DIA_ESPECIAL for p in profesor_ids}
+
+    # ✅ 1 consulta por tabla para todos los docentes
+    existentes = set(Profesor.objects.filter(id__in=profesor_ids).values_list("id", flat=True))
+    con_entrada = set(
+        Asistencia.objects
+        .filter(fecha=fecha, tipo="E", profesor_id__in=existentes)
+        .values_list("profesor_id", flat=True)
+    )
+    justificados = set(
+        JustificacionAsistencia.objects
+        .filter(fecha=fecha, profesor_id__in=existentes)
+        .values_list("profesor_id", flat=True)
+    )
+
+    reporte = {}
+    pares = []
+    for p in profesor_ids:
+        if p not in existentes:
+            reporte[p] = NO_ENCONTRADO
+        elif p in con_entrada:
+            reporte[p] = ASISTIO
+        elif p in justificados:
+            reporte[p] = YA_JUSTIFICADA
+        else:
+            pares.append((p, fecha))
+
+    for (p, _), resultado in _aplicar(pares, **kwargs).items():
+        reporte[p] = resultado
+
+    return reporte
@@ -0,0 +1,38 @@
+"""
+Logging no bloqueante para las vistas async.
+
+El handler solo encola el registro (O(1), sin I/O); un QueueListener en un
+hilo aparte es quien escribe en stderr. Así un logger.info() dentro del
+event loop no espera a la consola ni al colector de logs de la plataforma.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+
+_lock = threading.Lock()
+_listener = None
+_cola = queue.SimpleQueue()
+
+
+def _iniciar_listener():
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        destino = logging.StreamHandler()
+        destino.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+        _listener = logging.handlers.QueueListener(_cola, destino, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+class ColaHandler(logging.handlers.QueueHandler):
+    """Handler para LOGGING: {"class": "asistencias.logcola.ColaHandler"}."""
+
+    def __init__(self):
+        super().__init__(_cola)
+        _iniciar_listener()
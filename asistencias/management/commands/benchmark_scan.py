@@ -0,0 +1,293 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from asistencias.models import Asistencia, Profesor
+from asistencias.roster import invalidar_roster
+
+DNI_PREFIJO = "99"
+USUARIO_BENCH = "__benchmark_scan__"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput de /api/scan/ en modo WSGI (vista sync, N workers) y "
+        "ASGI (vista async, 1 event loop) con K escáneres concurrentes. "
+        "Crea datos temporales (DNI 99xxxxxx) y los borra al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scanners", type=int, default=50, help="Escáneres concurrentes (default 50).")
+        parser.add_argument("--scans", type=int, default=10, help="Escaneos por escáner (default 10).")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Workers sync de gunicorn a simular en modo WSGI (default 4).",
+        )
+        parser.add_argument(
+            "--latencia-ms",
+            type=float,
+            default=0.0,
+            help="Latencia de red simulada por consulta SQL (ej: 5 para una BD remota).",
+        )
+        parser.add_argument(
+            "--modo",
+            choices=["ambos", "sync", "async"],
+            default="ambos",
+        )
+
+    # =========================================================
+    # DATOS TEMPORALES
+    # =========================================================
+    def _preparar(self, total):
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(username=USUARIO_BENCH)
+        user.set_unusable_password()
+        user.save()
+        grupo, grupo_creado = Group.objects.get_or_create(name="SCANNER")
+        user.groups.add(grupo)
+
+        # Solo DNIs libres: un docente real con el mismo prefijo nunca entra al benchmark
+        existentes = set(
+            Profesor.objects.filter(dni__startswith=DNI_PREFIJO).values_list("dni", flat=True)
+        )
+        libres = (f"{DNI_PREFIJO}{i:06d}" for i in range(10 ** 6))
+        dnis = list(islice((dni for dni in libres if dni not in existentes), total))
+        Profesor.objects.bulk_create(
+            [Profesor(dni=dni, apellidos="BENCHMARK", nombres=f"Scan {dni}", condicion="N") for dni in dnis]
+        )
+        invalidar_roster()  # bulk_create no dispara post_save
+        return user, dnis, grupo if grupo_creado else None
+
+    def _limpiar_asistencias(self, dnis):
+        # `dnis` son solo los profesores que creó este comando
+        Asistencia.objects.filter(profesor__dni__in=dnis, fecha=timezone.localdate()).delete()
+
+    def _limpiar(self, user, dnis, grupo):
+        self._limpiar_asistencias(dnis)
+        Profesor.objects.filter(dni__in=dnis).delete()
+        user.delete()
+        if grupo is not None:
+            grupo.delete()
+
+    def _credenciales(self, user):
+        client = Client()
+        client.force_login(user)
+        csrf = get_random_string(32)
+        return {
+            "sessionid": client.cookies["sessionid"].value,
+            "csrftoken": csrf,
+        }
+
+    # =========================================================
+    # LATENCIA SIMULADA
+    # =========================================================
+    def _instalar_latencia(self, latencia_ms):
+        if latencia_ms <= 0:
+            return None
+        segundos = latencia_ms / 1000.0
+
+        def wrapper(execute, sql, params, many, context):
+            time.sleep(segundos)  # libera el GIL como una espera de red
+            return execute(sql, params, many, context)
+
+        def on_created(sender, connection, **kwargs):
+            # El mismo DatabaseWrapper se reconecta en cada request del hilo
+            if wrapper not in connection.execute_wrappers:
+                connection.execute_wrappers.append(wrapper)
+
+        connection_created.connect(on_created, weak=False)
+        return on_created
+
+    # =========================================================
+    # MODOS
+    # =========================================================
+    def _correr_sync(self, cred, lotes, workers):
+        """K escáneres comparten `workers` hilos: igual que gunicorn sync con N workers."""
+        url = reverse("api_scan_asistencia_sync")
+        latencias = []
+        estados = {}
+        lock = threading.Lock()
+        local = threading.local()
+
+        def escanear(dni):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = Client(HTTP_HOST="localhost")
+                client.cookies["sessionid"] = cred["sessionid"]
+                client.cookies["csrftoken"] = cred["csrftoken"]
+                local.client = client
+            resp = client.post(
+                url,
+                data=json.dumps({"code": dni}),
+                content_type="application/json",
+                HTTP_X_CSRFTOKEN=cred["csrftoken"],
+            )
+            connections.close_all()
+            return resp.status_code
+
+        def escaner(dnis):
+            # Cada escáner espera su respuesta antes del siguiente código;
+            # la latencia incluye la espera por un worker libre.
+            for dni in dnis:
+                t0 = time.perf_counter()
+                code = pool.submit(escanear, dni).result()
+                dt = time.perf_counter() - t0
+                with lock:
+                    latencias.append(dt)
+                    estados[code] = estados.get(code, 0) + 1
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hilos = [threading.Thread(target=escaner, args=(dnis,)) for dnis in lotes]
+            for h in hilos:
+                h.start()
+            for h in hilos:
+                h.join()
+        return time.perf_counter() - inicio, latencias, estados
+
+    def _correr_async(self, cred, lotes):
+        """K escáneres como tareas en 1 event loop sobre el handler ASGI real."""
+        app = get_asgi_application()
+        url = reverse("api_scan_asistencia_async")
+        latencias = []
+        estados = {}
+        cookie = f"sessionid={cred['sessionid']}; csrftoken={cred['csrftoken']}".encode()
+
+        async def escanear(dni):
+            body = json.dumps({"code": dni}).encode()
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": url,
+                "raw_path": url.encode(),
+                "root_path": "",
+                "query_string": b"",
+                "server": ("localhost", 80),
+                "client": ("127.0.0.1", 50000),
+                "headers": [
+                    (b"host", b"localhost"),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"cookie", cookie),
+                    (b"x-csrftoken", cred["csrftoken"].encode()),
+                ],
+            }
+            enviado = False
+            status = {}
+
+            async def receive():
+                nonlocal enviado
+                if enviado:
+                    await asyncio.sleep(3600)
+                    return {"type": "http.disconnect"}
+                enviado = True
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+
+            t0 = time.perf_counter()
+            await app(scope, receive, send)
+            latencias.append(time.perf_counter() - t0)
+            code = status.get("code", 0)
+            estados[code] = estados.get(code, 0) + 1
+
+        async def escaner(dnis):
+            for dni in dnis:
+                await escanear(dni)
+
+        async def main():
+            inicio = time.perf_counter()
+            await asyncio.gather(*(escaner(dnis) for dnis in lotes))
+            return time.perf_counter() - inicio
+
+        total = asyncio.run(main())
+        return total, latencias, estados
+
+    # =========================================================
+    # REPORTE
+    # =========================================================
+    def _reportar(self, nombre, total, latencias, estados):
+        n = len(latencias)
+        ordenadas = sorted(latencias)
+        p95 = ordenadas[max(0, int(n * 0.95) - 1)] if n else 0.0
+        self.stdout.write(
+            f"{nombre:<28} {n:>6} req  {n / total if total else 0:>8.1f} req/s  "
+            f"p50 {statistics.median(ordenadas) * 1000 if n else 0:>7.1f} ms  "
+            f"p95 {p95 * 1000:>7.1f} ms  estados={dict(sorted(estados.items()))}"
+        )
+
+    def handle(self, *args, **options):
+        scanners = max(1, options["scanners"])
+        scans = max(1, options["scans"])
+        workers = max(1, options["workers"])
+        modo = options["modo"]
+
+        if connection.vendor != "postgresql":
+            self.stdout.write(self.style.WARNING(
+                "La BD no es PostgreSQL: los INSERT se serializan y los números no son representativos."
+            ))
+        if timezone.localdate().weekday() >= 5:
+            self.stdout.write(self.style.WARNING(
+                "Hoy es fin de semana: el escáner responde 400 sin escribir en BD."
+            ))
+
+        total = scanners * scans
+        user, dnis, grupo = self._preparar(total)
+        lotes = [dnis[i::scanners] for i in range(scanners)]
+        receptor = self._instalar_latencia(options["latencia_ms"])
+
+        self.stdout.write(
+            f"{scanners} escáneres x {scans} escaneos | latencia SQL simulada "
+            f"{options['latencia_ms']} ms | BD {connection.vendor}"
+        )
+
+        # Igual que SERVER_MODE=asgi: sin conexiones persistentes (cada request
+        # async corre en su propio hilo y dejaría la conexión abierta).
+        for alias in connections:
+            connections.settings[alias]["CONN_MAX_AGE"] = 0
+
+        try:
+            with override_settings(ALLOWED_HOSTS=["*"], DEBUG=False):
+                connections.close_all()
+                cred = self._credenciales(user)
+
+                if modo in ("ambos", "sync"):
+                    self._limpiar_asistencias(dnis)
+                    connections.close_all()
+                    resultado = self._correr_sync(cred, lotes, workers)
+                    self._reportar(f"WSGI sync ({workers} workers)", *resultado)
+
+                if modo in ("ambos", "async"):
+                    self._limpiar_asistencias(dnis)
+                    connections.close_all()
+                    resultado = self._correr_async(cred, lotes)
+                    self._reportar("ASGI async (1 worker)", *resultado)
+        finally:
+            if receptor is not None:
+                connection_created.disconnect(receptor)
+            connections.close_all()
+            self._limpiar(user, dnis, grupo)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark terminado (datos temporales eliminados)."))
@@ -1,5 +1,6 @@
 from datetime import timedelta
 import requests
+import numpy as np
 import html
 import base64
 import os
@@ -11,7 +12,8 @@ from django.conf import settings
 from django.contrib.staticfiles import finders
 from django.templatetags.static import static
 
-from asistencias.models import Profesor, Asistencia, JustificacionAsistencia, DiaEspecial
+from asistencias import calendario, diaria, matriz
+from asistencias.models import Profesor
 
 
 class Command(BaseCommand):
@@ -159,9 +161,6 @@ class Command(BaseCommand):
             'font-size:12px;font-weight:700;">REGISTRO</span>'
         )
 
-    def _obtener_dia_especial(self, fecha_date):
-        return DiaEspecial.objects.filter(fecha=fecha_date, activo=True).first()
-
     def _estado_dia_especial(self, dia_especial):
         tipo_raw = (dia_especial.tipo or "").strip()
         tipo = self._normalize_text(tipo_raw)
@@ -222,7 +221,7 @@ class Command(BaseCommand):
             "es_evaluable": False,
         }
 
-    def _estado_diario_profesional(self, prof, lunes, viernes_fin):
+    def _estado_diario_profesional(self, prof, lunes, viernes_fin, estados=None):
         """
         Evalúa los 5 días (Lun-Vie) y devuelve estado por día:
         - FERIADO / HUELGA / PARO / SUSPENSIÓN / REMOTO / NO LABORABLE (si existe DíaEspecial activo)
@@ -231,42 +230,20 @@ class Command(BaseCommand):
         - FALTA (si no hay E, ni justificación oficial, ni día especial)
 
         IMPORTANTE:
-        - Usa Asistencia.fecha para ubicar cada registro en su día real
-        - NO usa fecha_hora.date() para clasificar
+        - Lee AsistenciaDiaria (estado por Asistencia.fecha, no por fecha_hora.date())
         - Los días especiales NO cuentan como falta
         - Los días especiales NO se consideran días evaluables
         - El cumplimiento se calcula sobre días evaluables reales
         - Asistencia(tipo="J") ya NO convierte una falta en justificación
-        """
-
-        qs_entradas = (
-            Asistencia.objects.filter(
-                profesor=prof,
-                fecha__gte=lunes.date(),
-                fecha__lte=viernes_fin.date(),
-                tipo="E",
-            )
-            .order_by("fecha", "fecha_hora", "id")
-        )
 
-        por_fecha_entradas = {}
-        for a in qs_entradas:
-            key = a.fecha
-            dt_local = timezone.localtime(a.fecha_hora) if a.fecha_hora else None
-            por_fecha_entradas.setdefault(key, []).append((a, dt_local))
-
-        justis_qs = (
-            JustificacionAsistencia.objects.filter(
-                profesor=prof,
-                fecha__gte=lunes.date(),
-                fecha__lte=viernes_fin.date(),
-            )
-            .order_by("fecha", "creado_en", "id")
-        )
-
-        justis_por_fecha = {}
-        for j in justis_qs:
-            justis_por_fecha.setdefault(j.fecha, []).append(j)
+        estados: matriz.Matriz de la semana ya leída para todos (handle);
+        si no viene, se consulta solo para este profesor.
+        """
+        if estados is None or estados.fila(prof.id) is None:
+            estados = matriz.construir([prof.id], lunes.date(), viernes_fin.date())
+        i = estados.fila(prof.id)
+        entradas = estados.entrada[i]
+        oficiales = estados.oficial[i]
 
         dias = self._dias_lun_vie(lunes)
         dias_eval = []
@@ -281,9 +258,7 @@ class Command(BaseCommand):
 
         for idx, d in enumerate(dias):
             fecha_date = d.date()
-            regs_e = por_fecha_entradas.get(fecha_date, [])
-            justis = justis_por_fecha.get(fecha_date, [])
-            dia_especial = self._obtener_dia_especial(fecha_date)
+            dia_especial = calendario.dia_especial(fecha_date)
 
             estado = "FALTA"
             observacion = "No se registró asistencia ni justificación en la fecha evaluada."
@@ -299,26 +274,21 @@ class Command(BaseCommand):
                 dias_especiales += 1
             else:
                 dias_evaluables += 1
-                primer_e = regs_e[0] if regs_e else None
 
-                if primer_e:
-                    _, dt_local = primer_e
+                if entradas[idx] != matriz.SIN_ENTRADA:
                     estado = "ASISTIÓ"
                     asistio += 1
-                    hora_registrada = dt_local.strftime("%H:%M") if dt_local else "-"
+                    hora_registrada = estados.hora(i, idx)
                     observacion = "Se registró asistencia en la fecha evaluada."
 
-                elif justis:
-                    j = justis[0]
+                elif oficiales[idx]:
                     estado = "JUSTIFICACIÓN"
                     justificaciones += 1
                     hora_registrada = "-"
-                    try:
-                        motivo = j.get_tipo_display()
-                    except Exception:
-                        motivo = (getattr(j, "tipo", "") or "").strip() or "Sin motivo"
+                    codigo, detalle = estados.motivos.get((i, idx), ("", ""))
+                    motivo = diaria.MOTIVOS.get(codigo) or codigo or "Sin motivo"
 
-                    detalle = (getattr(j, "detalle", "") or "").strip()
+                    detalle = (detalle or "").strip()
                     observacion = f"Justificación registrada ({motivo})."
                     if detalle:
                         observacion = f"Justificación registrada ({motivo}): {detalle}"
@@ -343,8 +313,8 @@ class Command(BaseCommand):
         cumplimiento_base = asistio + justificaciones
         cumplimiento = round(cumplimiento_base * 100 / total_dias, 1) if total_dias else 0
 
-        total_registros_eyj = qs_entradas.count()
-        total_justificaciones_ext = justis_qs.count()
+        total_registros_eyj = int(np.count_nonzero(entradas != matriz.SIN_ENTRADA))
+        total_justificaciones_ext = int(np.count_nonzero(oficiales))
         total_registros_relevantes = total_registros_eyj + total_justificaciones_ext
 
         return {
@@ -478,6 +448,9 @@ class Command(BaseCommand):
 
         profesores = Profesor.objects.all().order_by("apellidos", "nombres")
 
+        # ✅ 1 consulta para toda la semana: matriz profesor x día (matriz.py)
+        estados = matriz.construir([p.id for p in profesores], desde.date(), hasta.date(), todos=True)
+
         enviados = 0
         errores = 0
         saltados_sin_email = 0
@@ -497,7 +470,9 @@ class Command(BaseCommand):
                 saltados_sin_email += 1
                 continue
 
-            resultado = self._estado_diario_profesional(prof, desde, hasta)
+            resultado = self._estado_diario_profesional(
+                prof, desde, hasta, estados=estados
+            )
 
             dias_eval = resultado["dias_eval"]
             asistio = resultado["asistio"]
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from asistencias import diaria
+from asistencias.models import Asistencia, JustificacionAsistencia, Profesor
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye AsistenciaDiaria desde Asistencia y JustificacionAsistencia "
+        "(backfill inicial o tras cargas masivas). Procesa por tramos de --dias días."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--desde",
+            default="",
+            help="YYYY-MM-DD (default: primer registro en BD).",
+        )
+        parser.add_argument(
+            "--hasta",
+            default="",
+            help="YYYY-MM-DD (default: hoy).",
+        )
+        parser.add_argument(
+            "--dni",
+            action="append",
+            default=[],
+            help="Solo estos docentes (se puede repetir).",
+        )
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=31,
+            help="Días por tramo (default 31): acota la memoria en rangos largos.",
+        )
+
+    def _fecha(self, valor, nombre):
+        fecha = parse_date(valor)
+        if not fecha:
+            raise CommandError(f"--{nombre} inválida: {valor!r} (usa YYYY-MM-DD)")
+        return fecha
+
+    def _primer_registro(self):
+        fechas = [
+            Asistencia.objects.aggregate(m=Min("fecha"))["m"],
+            JustificacionAsistencia.objects.aggregate(m=Min("fecha"))["m"],
+        ]
+        fechas = [f for f in fechas if f]
+        return min(fechas) if fechas else None
+
+    def handle(self, *args, **options):
+        hasta = self._fecha(options["hasta"], "hasta") if options["hasta"] else timezone.localdate()
+        if options["desde"]:
+            desde = self._fecha(options["desde"], "desde")
+        else:
+            desde = self._primer_registro()
+            if desde is None:
+                self.stdout.write("Sin registros: nada que recalcular.")
+                return
+
+        if desde > hasta:
+            desde, hasta = hasta, desde
+
+        profesor_ids = None
+        if options["dni"]:
+            profesor_ids = list(Profesor.objects.filter(dni__in=options["dni"]).values_list("id", flat=True))
+            if not profesor_ids:
+                raise CommandError("Ningún docente con esos DNI.")
+
+        paso = max(1, options["dias"])
+        total_guardadas = 0
+        total_borradas = 0
+
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(hasta, inicio + timedelta(days=paso - 1))
+            guardadas, borradas = diaria.recalcular(inicio, fin, profesor_ids=profesor_ids)
+            total_guardadas += guardadas
+            total_borradas += borradas
+            self.stdout.write(f"{inicio:%Y-%m-%d} a {fin:%Y-%m-%d}: guardadas={guardadas} borradas={borradas}")
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"AsistenciaDiaria recalculada: guardadas={total_guardadas} borradas={total_borradas}"
+            )
+        )
@@ -0,0 +1,402 @@
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from asistencias import calendario, journal
+from asistencias.models import Asistencia, Profesor
+from asistencias.roster import invalidar_roster
+
+DNI_PREFIJO = "97"
+DNI_DESCONOCIDO = "96"  # se filtra contra el padrón al planificar
+USUARIO_PREFIJO = "__sim_scan_"
+
+JSON_MALFORMADO = b'{"code": "'
+
+
+def _percentil(ordenadas, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not ordenadas:
+        return 0.0
+    rango = math.ceil(p / 100 * len(ordenadas))
+    return ordenadas[max(0, min(len(ordenadas), rango) - 1)]
+
+
+class _MuestreoLocks(threading.Thread):
+    """Cuenta backends esperando un lock (pg_stat_activity) cada `intervalo` segundos."""
+
+    SQL = (
+        "SELECT count(*) FROM pg_stat_activity "
+        "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+    )
+
+    def __init__(self, intervalo=0.05):
+        super().__init__(name="sim-scan-locks", daemon=True)
+        self.intervalo = intervalo
+        self.detener = threading.Event()
+        self.muestras = 0
+        self.con_espera = 0
+        self.esperas = 0
+        self.maximo = 0
+
+    def run(self):
+        try:
+            with connections["default"].cursor() as cur:
+                while not self.detener.is_set():
+                    cur.execute(self.SQL)
+                    (n,) = cur.fetchone()
+                    self.muestras += 1
+                    self.esperas += n
+                    self.maximo = max(self.maximo, n)
+                    if n:
+                        self.con_espera += 1
+                    self.detener.wait(self.intervalo)
+        finally:
+            connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula la hora pico del escáner contra /api/scan/ (vista sync, N workers): "
+        "usuarios SCANNER con sesión propia, llegadas según una curva y una mezcla de "
+        "DNI válidos, desconocidos, duplicados rápidos y JSON malformado. Reporta "
+        "throughput, p50/p95/p99 por tipo_evento, esperas por lock e invariantes de filas. "
+        "Crea datos temporales (DNI 97xxxxxx) y los borra al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scanners", type=int, default=8, help="Usuarios SCANNER (kioskos) (default 8).")
+        parser.add_argument("--llegadas", type=int, default=600, help="Total de requests (default 600).")
+        parser.add_argument(
+            "--duracion",
+            type=float,
+            default=60.0,
+            help="Segundos en que se comprimen las llegadas (default 60).",
+        )
+        parser.add_argument(
+            "--curva",
+            choices=["pico", "rampa", "uniforme"],
+            default="pico",
+            help="pico: campana centrada al 40%% de la ventana (llegada de las 7am).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Workers sync de gunicorn a simular (default 4).",
+        )
+        parser.add_argument("--duplicados", type=float, default=0.12, help="Fracción de re-escaneos rápidos.")
+        parser.add_argument("--desconocidos", type=float, default=0.08, help="Fracción de DNI fuera del padrón.")
+        parser.add_argument("--malformados", type=float, default=0.05, help="Fracción de JSON malformado.")
+        parser.add_argument("--semilla", type=int, default=7)
+
+    # =========================================================
+    # DATOS TEMPORALES
+    # =========================================================
+    def _preparar(self, scanners, total):
+        User = get_user_model()
+        grupo, grupo_creado = Group.objects.get_or_create(name="SCANNER")
+        usuarios = []
+        for i in range(scanners):
+            user, _ = User.objects.get_or_create(username=f"{USUARIO_PREFIJO}{i:03d}__")
+            user.set_unusable_password()
+            user.save()
+            user.groups.add(grupo)
+            usuarios.append(user)
+
+        # Solo DNIs libres: un docente real con el mismo prefijo nunca entra a la simulación
+        existentes = set(
+            Profesor.objects.filter(dni__startswith=DNI_PREFIJO).values_list("dni", flat=True)
+        )
+        libres = (f"{DNI_PREFIJO}{i:06d}" for i in range(10 ** 6))
+        dnis = list(islice((dni for dni in libres if dni not in existentes), total))
+        Profesor.objects.bulk_create(
+            [Profesor(dni=dni, apellidos="SIMULACION", nombres=f"Scan {dni}", condicion="N") for dni in dnis]
+        )
+        invalidar_roster()  # bulk_create no dispara post_save
+        return usuarios, dnis, grupo if grupo_creado else None
+
+    def _limpiar_asistencias(self, dnis):
+        # `dnis` son solo los profesores que creó este comando
+        Asistencia.objects.filter(profesor__dni__in=dnis, fecha=timezone.localdate()).delete()
+
+    def _limpiar(self, usuarios, dnis, grupo):
+        self._limpiar_asistencias(dnis)
+        Profesor.objects.filter(dni__in=dnis).delete()
+        for user in usuarios:
+            user.delete()
+        if grupo is not None:
+            grupo.delete()
+
+    def _credenciales(self, user):
+        client = Client()
+        client.force_login(user)
+        return {
+            "sessionid": client.cookies["sessionid"].value,
+            "csrftoken": get_random_string(32),
+        }
+
+    # =========================================================
+    # PLAN DE LLEGADAS
+    # =========================================================
+    def _instante(self, rnd, curva):
+        """Posición relativa (0..1) de una llegada en la ventana."""
+        if curva == "rampa":
+            return rnd.random() ** 0.5  # densidad creciente
+        if curva == "uniforme":
+            return rnd.random()
+        while True:
+            x = rnd.gauss(0.4, 0.15)
+            if 0.0 <= x <= 1.0:
+                return x
+
+    def _planificar(self, rnd, dnis, opciones):
+        """Lista ordenada de (segundo, categoría, body, dni, índice de escáner)."""
+        # El prefijo 96 no está reservado: se descartan los DNI que sí existen en el padrón
+        ocupados = set(
+            Profesor.objects.filter(dni__startswith=DNI_DESCONOCIDO).values_list("dni", flat=True)
+        )
+        instantes = sorted(
+            self._instante(rnd, opciones["curva"]) * opciones["duracion"]
+            for _ in range(opciones["llegadas"])
+        )
+        pendientes = list(dnis)
+        rnd.shuffle(pendientes)
+        recientes = deque(maxlen=20)
+
+        p_mal = opciones["malformados"]
+        p_desc = p_mal + opciones["desconocidos"]
+        p_dup = p_desc + opciones["duplicados"]
+
+        plan = []
+        for t in instantes:
+            r = rnd.random()
+            if r < p_mal:
+                categoria, dni, body = "malformado", "", JSON_MALFORMADO
+            elif r < p_desc:
+                categoria, dni = "desconocido", f"{DNI_DESCONOCIDO}{rnd.randrange(10 ** 6):06d}"
+                while dni in ocupados:
+                    dni = f"{DNI_DESCONOCIDO}{rnd.randrange(10 ** 6):06d}"
+                body = json.dumps({"code": dni}).encode()
+            elif (r < p_dup or not pendientes) and recientes:
+                # El docente vuelve a pasar su DNI segundos después
+                categoria, dni = "duplicado", rnd.choice(recientes)
+                body = json.dumps({"code": dni}).encode()
+            else:
+                categoria, dni = "valido", pendientes.pop()
+                recientes.append(dni)
+                body = json.dumps({"code": dni}).encode()
+            plan.append((t, categoria, body, dni, rnd.randrange(opciones["scanners"])))
+        return plan
+
+    # =========================================================
+    # EJECUCIÓN (lazo abierto: las llegadas no esperan a las respuestas)
+    # =========================================================
+    def _tipo_evento(self, resp):
+        try:
+            data = json.loads(resp.content)
+        except ValueError:
+            return f"HTTP_{resp.status_code}"
+        return data.get("tipo_evento") or data.get("estado") or f"HTTP_{resp.status_code}"
+
+    def _correr(self, plan, creds, workers):
+        url = reverse("api_scan_asistencia_sync")
+        resultados = []
+        lock = threading.Lock()
+
+        def enviar(item, programado):
+            _, categoria, body, dni, idx = item
+            cred = creds[idx]
+            client = Client(HTTP_HOST="localhost")
+            client.cookies["sessionid"] = cred["sessionid"]
+            client.cookies["csrftoken"] = cred["csrftoken"]
+            try:
+                resp = client.post(
+                    url,
+                    data=body,
+                    content_type="application/json",
+                    HTTP_X_CSRFTOKEN=cred["csrftoken"],
+                )
+                tipo = self._tipo_evento(resp)
+            except Exception as e:
+                tipo = f"EXCEPCION_{type(e).__name__}"
+            finally:
+                connections.close_all()
+            # Desde la llegada programada: incluye la cola por un worker libre
+            latencia = time.perf_counter() - programado
+            with lock:
+                resultados.append((categoria, dni, tipo, latencia))
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for item in plan:
+                programado = inicio + item[0]
+                espera = programado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                pool.submit(enviar, item, programado)
+        return time.perf_counter() - inicio, resultados
+
+    # =========================================================
+    # REPORTE
+    # =========================================================
+    def _reportar(self, total, resultados):
+        n = len(resultados)
+        self.stdout.write(
+            f"\n{n} requests en {total:.1f} s  ->  {n / total if total else 0:.1f} req/s"
+        )
+
+        por_tipo = {}
+        for _, _, tipo, latencia in resultados:
+            por_tipo.setdefault(tipo, []).append(latencia)
+        por_tipo["TOTAL"] = [r[3] for r in resultados]
+
+        self.stdout.write(f"{'tipo_evento':<28} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+        for tipo, latencias in sorted(por_tipo.items(), key=lambda x: (x[0] == "TOTAL", x[0])):
+            ordenadas = sorted(latencias)
+            self.stdout.write(
+                f"{tipo:<28} {len(ordenadas):>6} "
+                f"{_percentil(ordenadas, 50) * 1000:>9.1f} "
+                f"{_percentil(ordenadas, 95) * 1000:>9.1f} "
+                f"{_percentil(ordenadas, 99) * 1000:>9.1f} "
+                f"{ordenadas[-1] * 1000 if ordenadas else 0:>9.1f}"
+            )
+
+    def _reportar_locks(self, muestreo, deadlocks):
+        if muestreo is None:
+            self.stdout.write("Esperas por lock: n/d (solo PostgreSQL)")
+            return
+        self.stdout.write(
+            f"Esperas por lock: {muestreo.con_espera}/{muestreo.muestras} muestras con espera, "
+            f"{muestreo.esperas} backend-muestras en espera, máx simultáneas {muestreo.maximo}, "
+            f"deadlocks {deadlocks}"
+        )
+
+    def _invariantes(self, resultados, dnis, escribe):
+        """[(descripción, ok)] sobre las filas que quedaron en BD."""
+        hoy = timezone.localdate()
+        filas = Asistencia.objects.filter(profesor__dni__in=dnis, fecha=hoy, tipo="E")
+        n_filas = filas.count()
+        repetidas = (
+            filas.values("profesor_id").annotate(n=Count("id")).filter(n__gt=1).count()
+        )
+
+        validos = {dni for categoria, dni, _, _ in resultados if categoria == "valido"}
+        registradas = sum(1 for r in resultados if r[2] == "ASISTENCIA_REGISTRADA")
+        malformados = [r[2] for r in resultados if r[0] == "malformado"]
+        desconocidos = [r[2] for r in resultados if r[0] == "desconocido"]
+        errores = sum(1 for r in resultados if r[2].startswith(("HTTP_5", "EXCEPCION_")))
+
+        esperadas = len(validos) if escribe else 0
+        return [
+            (f"1 fila por DNI válido escaneado ({n_filas} == {esperadas})", n_filas == esperadas),
+            (f"ASISTENCIA_REGISTRADA == filas ({registradas} == {n_filas})", registradas == n_filas),
+            (f"ningún docente con 2 ENTRADAS ({repetidas})", repetidas == 0),
+            (
+                "DNI desconocidos -> PROFESOR_NO_ENCONTRADO",
+                all(t == "PROFESOR_NO_ENCONTRADO" for t in desconocidos),
+            ),
+            ("JSON malformado -> JSON_INVALIDO", all(t == "JSON_INVALIDO" for t in malformados)),
+            (f"sin errores 5xx/excepciones ({errores})", errores == 0),
+        ]
+
+    def handle(self, *args, **options):
+        options["scanners"] = max(1, options["scanners"])
+        options["llegadas"] = max(1, options["llegadas"])
+        options["duracion"] = max(0.0, options["duracion"])
+        workers = max(1, options["workers"])
+        rnd = random.Random(options["semilla"])
+
+        es_postgres = connection.vendor == "postgresql"
+        if not es_postgres:
+            self.stdout.write(self.style.WARNING(
+                "La BD no es PostgreSQL: los INSERT se serializan y los números no son representativos."
+            ))
+
+        hoy = timezone.localdate()
+        escribe = hoy.weekday() < 5 and not calendario.es_dia_especial(hoy)
+        if not escribe:
+            self.stdout.write(self.style.WARNING(
+                "Hoy es fin de semana o día especial: el escáner responde 400 sin escribir en BD."
+            ))
+
+        usuarios, dnis, grupo = self._preparar(options["scanners"], options["llegadas"])
+        plan = self._planificar(rnd, dnis, options)
+
+        mezcla = {}
+        for _, categoria, *_ in plan:
+            mezcla[categoria] = mezcla.get(categoria, 0) + 1
+        self.stdout.write(
+            f"{options['scanners']} escáneres | {len(plan)} llegadas en {options['duracion']:.0f} s "
+            f"(curva {options['curva']}) | {workers} workers | BD {connection.vendor} | mezcla {mezcla}"
+        )
+
+        for alias in connections:
+            connections.settings[alias]["CONN_MAX_AGE"] = 0
+
+        muestreo = None
+        fallas = []
+        try:
+            with override_settings(ALLOWED_HOSTS=["*"], DEBUG=False):
+                self._limpiar_asistencias(dnis)
+                creds = [self._credenciales(u) for u in usuarios]
+
+                deadlocks_sql = (
+                    "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+                )
+                deadlocks_antes = 0
+                if es_postgres:
+                    with connection.cursor() as cur:
+                        cur.execute(deadlocks_sql)
+                        (deadlocks_antes,) = cur.fetchone()
+                    muestreo = _MuestreoLocks()
+                    muestreo.start()
+                connections.close_all()
+
+                try:
+                    total, resultados = self._correr(plan, creds, workers)
+                finally:
+                    if muestreo is not None:
+                        muestreo.detener.set()
+                        muestreo.join()
+
+                if journal.activo():
+                    journal.vaciar_todo(soltar=True)
+
+                deadlocks = 0
+                if es_postgres:
+                    with connection.cursor() as cur:
+                        cur.execute(deadlocks_sql)
+                        (deadlocks_despues,) = cur.fetchone()
+                    deadlocks = deadlocks_despues - deadlocks_antes
+
+                self._reportar(total, resultados)
+                self._reportar_locks(muestreo, deadlocks)
+
+                self.stdout.write("\nInvariantes:")
+                for descripcion, ok in self._invariantes(resultados, dnis, escribe):
+                    marca = self.style.SUCCESS("OK   ") if ok else self.style.ERROR("FALLA")
+                    self.stdout.write(f"  {marca} {descripcion}")
+                    if not ok:
+                        fallas.append(descripcion)
+        finally:
+            connections.close_all()
+            self._limpiar(usuarios, dnis, grupo)
+
+        if fallas:
+            raise CommandError(f"{len(fallas)} invariante(s) no se cumplen (datos temporales eliminados).")
+        self.stdout.write(self.style.SUCCESS("Simulación terminada (datos temporales eliminados)."))
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from asistencias import subidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Sube al storage los PDF de justificación en cola (SubidaJustificacion). "
+        "Sin --una-vez queda en bucle como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Procesa lo pendiente y termina.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=None,
+            help="Segundos entre pasadas con la cola vacía (default SUBIDAS_INTERVALO).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=None,
+            help="Subidas por pasada (default SUBIDAS_LOTE).",
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options["intervalo"] or float(getattr(settings, "SUBIDAS_INTERVALO", 3))
+        lote = options["lote"] or int(getattr(settings, "SUBIDAS_LOTE", 20))
+
+        while True:
+            r = subidas.procesar(lote=lote)
+            if r["subidas"] or r["errores"] or options["una_vez"]:
+                self.stdout.write(
+                    f"subidas={r['subidas']} errores={r['errores']} pendientes={r['pendientes']}"
+                )
+
+            if options["una_vez"] and (not r["pendientes"] or not (r["subidas"] or r["errores"])):
+                break
+
+            close_old_connections()
+            if not options["una_vez"] and r["subidas"] + r["errores"] < lote:
+                time.sleep(intervalo)
+
+        self.stdout.write(self.style.SUCCESS("Cola de subidas procesada."))
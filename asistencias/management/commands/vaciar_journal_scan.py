@@ -0,0 +1,71 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from asistencias import journal
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelca a Asistencia las entradas pendientes del journal de escaneos "
+        "(SCAN_JOURNAL=1). Sin --una-vez queda en bucle como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Vacía lo pendiente y termina (ej: al arrancar, para reprocesar tras una caída).",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=None,
+            help="Segundos entre pasadas (default SCAN_JOURNAL_INTERVALO).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=None,
+            help="Entradas por INSERT (default SCAN_JOURNAL_LOTE).",
+        )
+        parser.add_argument(
+            "--purgar-dias",
+            type=int,
+            default=7,
+            help="Borra del journal lo ya volcado con más de N días (default 7).",
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options["intervalo"] or float(getattr(settings, "SCAN_JOURNAL_INTERVALO", 2))
+        lote = options["lote"] or int(getattr(settings, "SCAN_JOURNAL_LOTE", 500))
+
+        duenio = uuid.uuid4().hex
+
+        self.stdout.write(f"Journal: {journal.ruta()}")
+
+        while True:
+            r = journal.vaciar_todo(
+                lote=lote,
+                duenio=duenio,
+                lease_segundos=max(30, intervalo * 5),
+                soltar=options["una_vez"],
+            )
+            if r["volcadas"] or r["conflictos"] or options["una_vez"]:
+                self.stdout.write(
+                    f"volcadas={r['volcadas']} conflictos={r['conflictos']} pendientes={r['pendientes']}"
+                )
+
+            if options["una_vez"]:
+                purgadas = journal.purgar(options["purgar_dias"])
+                if purgadas:
+                    self.stdout.write(f"purgadas={purgadas}")
+                break
+
+            close_old_connections()
+            time.sleep(intervalo)
+
+        self.stdout.write(self.style.SUCCESS("Journal vaciado."))
@@ -0,0 +1,147 @@
+"""
+Matriz de asistencia profesor x día (NumPy).
+
+Un rango se lee una sola vez: AsistenciaDiaria (ENTRADAS y justificaciones ya
+clasificadas, ver diaria.py) en 1 consulta y los días especiales desde
+calendario (memoria). Con eso se arman matrices paralelas de forma
+(profesores, días):
+
+- estado:  uint8 con FALTO / ASISTIO / JUSTIFICADO / ESPECIAL
+- entrada: int16, minuto local de la primera ENTRADA (SIN_ENTRADA si no hay)
+- oficial: bool, hay JustificacionAsistencia (el correo semanal solo cuenta esas)
+
+Los totales, porcentajes y conteos por día salen de reducciones sobre ejes;
+un semestre del padrón completo son unos pocos arrays, no un dict por celda.
+Excel, estadísticas privadas y el correo semanal leen de aquí.
+"""
+import numpy as np
+from django.utils import timezone
+
+from . import calendario
+from .models import AsistenciaDiaria
+
+FALTO = 0
+ASISTIO = 1
+JUSTIFICADO = 2
+ESPECIAL = 3
+
+SIN_ENTRADA = -1
+
+ESTADOS = {"ASISTIO": ASISTIO, "JUSTIFICADO": JUSTIFICADO, "DIA_ESPECIAL": ESPECIAL}
+
+# "HH:MM" de cada minuto del día: formatear la matriz es indexar
+HORAS = [f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)]
+
+
+class Matriz:
+    __slots__ = ("profesor_ids", "dias", "estado", "entrada", "oficial", "motivos", "_filas", "_columnas")
+
+    def __init__(self, profesor_ids, dias):
+        self.profesor_ids = np.asarray(profesor_ids, dtype=np.int64)
+        self.dias = list(dias)
+        forma = (len(self.profesor_ids), len(self.dias))
+        self.estado = np.full(forma, FALTO, dtype=np.uint8)
+        self.entrada = np.full(forma, SIN_ENTRADA, dtype=np.int16)
+        self.oficial = np.zeros(forma, dtype=bool)
+        # (fila, columna) -> (motivo, detalle), solo celdas justificadas
+        self.motivos = {}
+        self._filas = {int(p): i for i, p in enumerate(self.profesor_ids)}
+        self._columnas = {d: j for j, d in enumerate(self.dias)}
+
+    def fila(self, profesor_id):
+        return self._filas.get(profesor_id)
+
+    # =========================================================
+    # REDUCCIONES
+    # =========================================================
+    def por_profesor(self, estado):
+        """Cantidad de días con `estado` por profesor (array de len(profesores))."""
+        return np.count_nonzero(self.estado == estado, axis=1)
+
+    def por_dia(self, estado):
+        """Cantidad de profesores con `estado` por día (array de len(dias))."""
+        return np.count_nonzero(self.estado == estado, axis=0)
+
+    def totales(self):
+        """{"asistio", "justifico", "falto", "especial"}: arrays por profesor."""
+        return {
+            "asistio": self.por_profesor(ASISTIO),
+            "justifico": self.por_profesor(JUSTIFICADO),
+            "falto": self.por_profesor(FALTO),
+            "especial": self.por_profesor(ESPECIAL),
+        }
+
+    def evaluables(self):
+        """Días evaluables por profesor (todo menos ESPECIAL)."""
+        return len(self.dias) - self.por_profesor(ESPECIAL)
+
+    @staticmethod
+    def porcentaje(parte, base, decimales=2):
+        """parte / base * 100 redondeado, 0 donde base es 0 (arrays o escalares)."""
+        parte = np.asarray(parte, dtype=np.float64)
+        base = np.asarray(base, dtype=np.float64)
+        pct = np.zeros(np.broadcast(parte, base).shape)
+        np.divide(parte * 100, base, out=pct, where=base > 0)
+        return np.round(pct, decimales)
+
+    def hora(self, i, j):
+        minuto = int(self.entrada[i, j])
+        return HORAS[minuto] if minuto != SIN_ENTRADA else None
+
+
+def construir(profesor_ids, desde, hasta, dias=None, todos=False):
+    """
+    Matriz para `profesor_ids` (en ese orden) sobre `dias` (por defecto todo el
+    rango desde..hasta). todos=True lee el rango completo sin IN de ids (el
+    padrón entero): las filas de profesores fuera de la lista se descartan.
+    """
+    if dias is None:
+        dias = calendario.dias_rango(desde, hasta)
+    matriz = Matriz(profesor_ids, dias)
+    if not matriz.dias or not len(matriz.profesor_ids):
+        return matriz
+
+    qs = AsistenciaDiaria.objects.filter(fecha__range=(min(matriz.dias), max(matriz.dias)))
+    if not todos:
+        qs = qs.filter(profesor_id__in=[int(p) for p in matriz.profesor_ids])
+    if len(matriz.dias) != (max(matriz.dias) - min(matriz.dias)).days + 1:
+        qs = qs.filter(fecha__in=matriz.dias)
+
+    filas, columnas, estados, minutos = [], [], [], []
+    oficiales_f, oficiales_c = [], []
+    zona = timezone.get_current_timezone()
+
+    for profesor_id, fecha, estado, primera, motivo, detalle, oficial in qs.values_list(
+        "profesor_id", "fecha", "estado", "primera_entrada", "motivo", "detalle", "justificacion_oficial"
+    ):
+        i = matriz._filas.get(profesor_id)
+        j = matriz._columnas.get(fecha)
+        if i is None or j is None:
+            continue
+
+        filas.append(i)
+        columnas.append(j)
+        estados.append(ESTADOS.get(estado, FALTO))
+        if primera is not None:
+            local = timezone.localtime(primera, zona)
+            minutos.append(local.hour * 60 + local.minute)
+        else:
+            minutos.append(SIN_ENTRADA)
+        if oficial:
+            oficiales_f.append(i)
+            oficiales_c.append(j)
+        if estado == "JUSTIFICADO":
+            matriz.motivos[(i, j)] = (motivo, detalle)
+
+    if filas:
+        matriz.estado[filas, columnas] = estados
+        matriz.entrada[filas, columnas] = minutos
+        matriz.oficial[oficiales_f, oficiales_c] = True
+
+    # Día especial pisa toda la columna (aunque AsistenciaDiaria no tenga fila)
+    especiales = calendario.especiales_en_rango(min(matriz.dias), max(matriz.dias))
+    columnas_especiales = [j for d, j in matriz._columnas.items() if d in especiales]
+    if columnas_especiales:
+        matriz.estado[:, columnas_especiales] = ESPECIAL
+
+    return matriz
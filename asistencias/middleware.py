@@ -1,5 +1,6 @@
 from datetime import timedelta
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
@@ -31,11 +32,21 @@ class ClearAxesUnlockAtMiddleware:
     Limpia request.session['axes_unlock_at'] automáticamente cuando:
     - ya expiró el tiempo, o
     - ya no hay registros de Axes (ej: después de python manage.py axes_reset)
+
+    ✅ sync y async: bajo ASGI no obliga a pasar cada request por un hilo.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         unlock_at_str = request.session.get("axes_unlock_at")
 
         if unlock_at_str:
@@ -55,3 +66,19 @@ class ClearAxesUnlockAtMiddleware:
                         request.session.modified = True
 
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        unlock_at_str = await request.session.aget("axes_unlock_at")
+
+        if unlock_at_str:
+            dt = parse_datetime(unlock_at_str)
+            if dt and dt <= timezone.now():
+                await request.session.apop("axes_unlock_at", None)
+                request.session.modified = True
+            elif AccessAttempt is not None:
+                ip = _get_client_ip(request)
+                if ip and not await AccessAttempt.objects.filter(ip_address=ip).aexists():
+                    await request.session.apop("axes_unlock_at", None)
+                    request.session.modified = True
+
+        return await self.get_response(request)
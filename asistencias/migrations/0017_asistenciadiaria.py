@@ -0,0 +1,122 @@
+# Generated by Django 5.2.10 on 2026-10-16 10:00
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+DIAS_POR_TRAMO = 31
+LOTE = 1000
+
+
+def _recalcular(apps, desde, hasta):
+    # Copia congelada de diaria.recalcular al momento de esta migración (tabla vacía: solo inserta)
+    Asistencia = apps.get_model("asistencias", "Asistencia")
+    AsistenciaDiaria = apps.get_model("asistencias", "AsistenciaDiaria")
+    DiaEspecial = apps.get_model("asistencias", "DiaEspecial")
+    JustificacionAsistencia = apps.get_model("asistencias", "JustificacionAsistencia")
+
+    rango = {"fecha__range": (desde, hasta)}
+    entradas = {
+        (p, f): fh
+        for p, f, fh in (
+            Asistencia.objects.filter(tipo="E", **rango)
+            .order_by()
+            .values("profesor_id", "fecha")
+            .annotate(fh=Min("fecha_hora"))
+            .values_list("profesor_id", "fecha", "fh")
+        )
+    }
+    asist_j = {
+        (p, f): (m, d)
+        for p, f, m, d in (
+            Asistencia.objects.filter(tipo="J", **rango)
+            .values_list("profesor_id", "fecha", "motivo", "detalle")
+        )
+    }
+    justs = {
+        (p, f): (t, d)
+        for p, f, t, d in (
+            JustificacionAsistencia.objects.filter(**rango)
+            .values_list("profesor_id", "fecha", "tipo", "detalle")
+        )
+    }
+    especiales = set(DiaEspecial.objects.filter(activo=True, **rango).values_list("fecha", flat=True))
+
+    filas = []
+    for p, f in entradas.keys() | asist_j.keys() | justs.keys():
+        entrada = entradas.get((p, f))
+        just = justs.get((p, f))
+        origen = just or asist_j.get((p, f)) or ("", "")
+        if f in especiales:
+            estado = "DIA_ESPECIAL"
+        elif entrada is not None:
+            estado = "ASISTIO"
+        else:
+            estado = "JUSTIFICADO"
+        filas.append(
+            AsistenciaDiaria(
+                profesor_id=p,
+                fecha=f,
+                estado=estado,
+                primera_entrada=entrada,
+                motivo=(origen[0] or "").strip(),
+                detalle=(origen[1] or "").strip(),
+                justificacion_oficial=just is not None,
+            )
+        )
+    AsistenciaDiaria.objects.bulk_create(filas, batch_size=LOTE)
+
+
+def llenar_diaria(apps, schema_editor):
+    Asistencia = apps.get_model("asistencias", "Asistencia")
+    JustificacionAsistencia = apps.get_model("asistencias", "JustificacionAsistencia")
+
+    extremos = [
+        Asistencia.objects.aggregate(desde=Min("fecha"), hasta=Max("fecha")),
+        JustificacionAsistencia.objects.aggregate(desde=Min("fecha"), hasta=Max("fecha")),
+    ]
+    desdes = [e["desde"] for e in extremos if e["desde"]]
+    if not desdes:
+        return
+    desde = min(desdes)
+    hasta = max(e["hasta"] for e in extremos if e["hasta"])
+
+    # Por tramos de días: acota la memoria con años de historia
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(hasta, inicio + timedelta(days=DIAS_POR_TRAMO - 1))
+        _recalcular(apps, inicio, fin)
+        inicio = fin + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0016_profesor_sexo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsistenciaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('estado', models.CharField(choices=[('ASISTIO', 'Asistió'), ('JUSTIFICADO', 'Justificado'), ('DIA_ESPECIAL', 'Día especial')], max_length=12, verbose_name='Estado')),
+                ('primera_entrada', models.DateTimeField(blank=True, null=True, verbose_name='Primera entrada')),
+                ('motivo', models.CharField(blank=True, choices=[('DM', 'Descanso médico'), ('C', 'Comisión / Encargo'), ('P', 'Permiso'), ('O', 'Otro')], default='', max_length=2, verbose_name='Motivo')),
+                ('detalle', models.CharField(blank=True, default='', max_length=255, verbose_name='Detalle')),
+                ('justificacion_oficial', models.BooleanField(default=False, verbose_name='Justificación oficial')),
+                ('actualizado_en', models.DateTimeField(auto_now=True, verbose_name='Actualizado en')),
+                ('profesor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dias', to='asistencias.profesor', verbose_name='Profesor')),
+            ],
+            options={
+                'verbose_name': 'Asistencia diaria',
+                'verbose_name_plural': 'Asistencias diarias',
+                'indexes': [models.Index(fields=['fecha', 'estado'], name='asistencias_fecha_37d0e5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('profesor', 'fecha'), name='uniq_asistencia_diaria_profesor_fecha')],
+            },
+        ),
+        migrations.RunPython(llenar_diaria, migrations.RunPython.noop),
+    ]
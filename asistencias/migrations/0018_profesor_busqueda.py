@@ -0,0 +1,58 @@
+# Generated by Django 5.2.10 on 2026-10-16 11:00
+
+import re
+
+from django.db import migrations, models
+from text_unidecode import unidecode
+
+INDICE = "asistencias_profesor_busqueda_trgm"
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def texto_profesor(dni, codigo, apellidos, nombres):
+    # Copia congelada de busqueda.texto_profesor al momento de esta migración
+    texto = " ".join(x or "" for x in (dni, codigo, apellidos, nombres))
+    return _ESPACIOS.sub(" ", unidecode(texto)).strip().upper()
+
+
+def llenar_busqueda(apps, schema_editor):
+    Profesor = apps.get_model("asistencias", "Profesor")
+    profesores = list(Profesor.objects.only("id", "dni", "codigo", "apellidos", "nombres"))
+    for p in profesores:
+        p.busqueda = texto_profesor(p.dni, p.codigo, p.apellidos, p.nombres)
+    Profesor.objects.bulk_update(profesores, ["busqueda"], batch_size=500)
+
+
+def crear_indice_trgm(apps, schema_editor):
+    # SQLite (desarrollo) no tiene pg_trgm: la búsqueda usa el mismo LIKE sin índice
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDICE} "
+        f"ON asistencias_profesor USING gin (busqueda gin_trgm_ops)"
+    )
+
+
+def borrar_indice_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDICE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0017_asistenciadiaria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profesor',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Búsqueda'),
+        ),
+        migrations.RunPython(llenar_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_trgm, borrar_indice_trgm),
+    ]
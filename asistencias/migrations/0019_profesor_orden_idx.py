@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0018_profesor_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profesor',
+            index=models.Index(fields=['apellidos', 'nombres', 'id'], name='asistencias_apellid_cd58ba_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.10 on 2026-10-16 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0019_profesor_orden_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='justificacionasistencia',
+            name='archivo_estado',
+            field=models.CharField(blank=True, choices=[('', 'Sin subida'), ('PENDIENTE', 'Subiendo'), ('LISTO', 'Subido'), ('ERROR', 'Error al subir')], default='', max_length=10, verbose_name='Estado del archivo'),
+        ),
+        migrations.CreateModel(
+            name='SubidaJustificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, verbose_name='Nombre original')),
+                ('contenido', models.BinaryField(verbose_name='Contenido')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('error', models.CharField(blank=True, default='', max_length=255, verbose_name='Último error')),
+                ('creado_en', models.DateTimeField(auto_now_add=True, verbose_name='Creado en')),
+                ('justificacion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='subida', to='asistencias.justificacionasistencia', verbose_name='Justificación')),
+            ],
+            options={
+                'verbose_name': 'Subida pendiente',
+                'verbose_name_plural': 'Subidas pendientes',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+def copiar_justificacion(apps, schema_editor):
+    SubidaJustificacion = apps.get_model("asistencias", "SubidaJustificacion")
+    for subida in SubidaJustificacion.objects.only("id", "justificacion_id"):
+        subida.justificaciones.add(subida.justificacion_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0020_subida_justificacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subidajustificacion',
+            name='justificaciones',
+            field=models.ManyToManyField(related_name='subidas', to='asistencias.justificacionasistencia', verbose_name='Justificaciones'),
+        ),
+        migrations.RunPython(copiar_justificacion, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='subidajustificacion',
+            name='justificacion',
+        ),
+    ]
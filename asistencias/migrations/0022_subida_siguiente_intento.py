@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-16 13:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0021_subida_varias_justificaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subidajustificacion',
+            name='siguiente_intento',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Siguiente intento'),
+        ),
+    ]
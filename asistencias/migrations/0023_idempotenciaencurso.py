@@ -0,0 +1,25 @@
+# Generated by Django 5.2.10 on 2026-10-16 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0022_subida_siguiente_intento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotenciaEnCurso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100, unique=True, verbose_name='Clave')),
+                ('vence', models.DateTimeField(db_index=True, verbose_name='Vence')),
+            ],
+            options={
+                'verbose_name': 'Idempotency-Key en curso',
+                'verbose_name_plural': 'Idempotency-Keys en curso',
+            },
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.utils import timezone
 from django.conf import settings
 import unicodedata
 
+from .archivos import url_publica
+
+
 class Profesor(models.Model):
     TIPO_JORNADA_CHOICES = [
         ("TC", "Tiempo completo"),
@@ -39,6 +42,10 @@ class Profesor(models.Model):
     activo = models.BooleanField("Activo", default=True)
     email = models.EmailField("Correo", blank=True, null=True)
 
+    # ✅ dni/código/apellidos/nombres sin tildes y en mayúsculas (busqueda.py)
+    # Índice GIN pg_trgm solo en PostgreSQL: lo crea la migración 0018
+    busqueda = models.TextField("Búsqueda", blank=True, default="", editable=False)
+
     @property
     def nombre_completo(self):
         ap = (self.apellidos or "").strip()
@@ -61,6 +68,10 @@ class Profesor(models.Model):
         verbose_name = "Profesor"
         verbose_name_plural = "Profesores"
         ordering = ["apellidos", "nombres"]
+        indexes = [
+            # ✅ Orden del historial: keyset (api_historial) y LIMIT/OFFSET sin ordenar la tabla
+            models.Index(fields=["apellidos", "nombres", "id"]),
+        ]
 
 class Asistencia(models.Model):
     TIPOS = (
@@ -191,6 +202,20 @@ class JustificacionAsistencia(models.Model):
         max_length=500,  # ✅ importante (evita varchar(100) cuando la ruta es larga)
     )
 
+    # ✅ El PDF se sube en segundo plano (ver subidas.py)
+    ARCHIVO_PENDIENTE = "PENDIENTE"
+    ARCHIVO_LISTO = "LISTO"
+    ARCHIVO_ERROR = "ERROR"
+    ARCHIVO_ESTADOS = [
+        ("", "Sin subida"),
+        (ARCHIVO_PENDIENTE, "Subiendo"),
+        (ARCHIVO_LISTO, "Subido"),
+        (ARCHIVO_ERROR, "Error al subir"),
+    ]
+    archivo_estado = models.CharField(
+        "Estado del archivo", max_length=10, choices=ARCHIVO_ESTADOS, blank=True, default=""
+    )
+
     creado_por = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         null=True,
@@ -239,43 +264,20 @@ class JustificacionAsistencia(models.Model):
     def archivo_url(self) -> str:
         """
         Devuelve una URL utilizable del archivo de justificación (PDF), soportando:
-        - Cloudinary raw/upload
-        - Cloudinary image/upload (corrige a raw/upload si el archivo es PDF)
+        - Cloudinary (el storage ya corrige a raw/upload los PDF RAW, ver storage_backends.py)
         - URLs locales /media/...
         - URLs absolutas http(s)
+
+        archivos.precargar() la deja resuelta para toda una página de objetos.
         """
+        precargada = self.__dict__.get("_archivo_url")
+        if precargada is not None:
+            return precargada
+
         try:
             if not self.archivo:
                 return ""
-
-            # nombre guardado en DB (ej: justificaciones/2026/02/archivo.pdf)
-            nombre = str(getattr(self.archivo, "name", "") or "").strip()
-            nombre_lower = nombre.lower()
-
-            # url que genera el storage
-            url = str(getattr(self.archivo, "url", "") or "").strip()
-            if not url:
-                return ""
-
-            # 1) Si ya es URL absoluta http/https, la usamos (con corrección Cloudinary si aplica)
-            if url.startswith("http://") or url.startswith("https://"):
-                if (
-                    nombre_lower.endswith(".pdf")
-                    and "res.cloudinary.com" in url
-                    and "/image/upload/" in url
-                ):
-                    url = url.replace("/image/upload/", "/raw/upload/")
-                return url
-
-            # 2) Si es local (/media/...) o ruta relativa, devolver tal cual
-            #    Django normalmente resuelve self.archivo.url como /media/...
-            if url.startswith("/"):
-                return url
-
-            # 3) Si por alguna razón vino una ruta relativa sin slash, la normalizamos
-            #    (ej: media/justificaciones/... -> /media/justificaciones/...)
-            return f"/{url.lstrip('/')}"
-
+            return url_publica(self.archivo.url)
         except Exception:
             return ""
 
@@ -358,4 +360,95 @@ class DiaEspecial(models.Model):
         base = f"{self.fecha} - {self.get_tipo_display()}"
         if self.descripcion:
             base += f" - {self.descripcion}"
-        return base
\ No newline at end of file
+        return base
+
+# =========================================================
+# ✅ ESTADO DIARIO MATERIALIZADO (ver diaria.py)
+# Una fila por día con ENTRADA o justificación; sin fila = FALTÓ
+# =========================================================
+class AsistenciaDiaria(models.Model):
+    ESTADOS = [
+        ("ASISTIO", "Asistió"),
+        ("JUSTIFICADO", "Justificado"),
+        ("DIA_ESPECIAL", "Día especial"),
+    ]
+
+    profesor = models.ForeignKey(
+        "Profesor",
+        on_delete=models.CASCADE,
+        related_name="dias",
+        verbose_name="Profesor"
+    )
+    fecha = models.DateField("Fecha")
+    estado = models.CharField("Estado", max_length=12, choices=ESTADOS)
+
+    primera_entrada = models.DateTimeField("Primera entrada", null=True, blank=True)
+
+    # ✅ JustificacionAsistencia si existe; si no, la Asistencia tipo "J"
+    motivo = models.CharField("Motivo", max_length=2, choices=Asistencia.MOTIVOS, blank=True, default="")
+    detalle = models.CharField("Detalle", max_length=255, blank=True, default="")
+    justificacion_oficial = models.BooleanField("Justificación oficial", default=False)
+
+    actualizado_en = models.DateTimeField("Actualizado en", auto_now=True)
+
+    class Meta:
+        verbose_name = "Asistencia diaria"
+        verbose_name_plural = "Asistencias diarias"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profesor", "fecha"],
+                name="uniq_asistencia_diaria_profesor_fecha"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["fecha", "estado"]),
+        ]
+
+    def __str__(self):
+        return f"{self.profesor} - {self.fecha} ({self.estado})"
+
+
+# =========================================================
+# ✅ COLA DE SUBIDAS DE PDF (ver subidas.py)
+# El PDF espera aquí hasta que `subir_justificaciones` lo guarda en el storage
+# (un mismo PDF puede sustentar varias justificaciones: rango de fechas)
+# =========================================================
+class SubidaJustificacion(models.Model):
+    justificaciones = models.ManyToManyField(
+        "JustificacionAsistencia",
+        related_name="subidas",
+        verbose_name="Justificaciones"
+    )
+    nombre = models.CharField("Nombre original", max_length=255)
+    contenido = models.BinaryField("Contenido")
+
+    intentos = models.PositiveSmallIntegerField("Intentos", default=0)
+    error = models.CharField("Último error", max_length=255, blank=True, default="")
+    # Backoff tras un fallo y lease mientras un worker sube el PDF (ver subidas.py)
+    siguiente_intento = models.DateTimeField("Siguiente intento", default=timezone.now, db_index=True)
+    creado_en = models.DateTimeField("Creado en", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Subida pendiente"
+        verbose_name_plural = "Subidas pendientes"
+        ordering = ["id"]
+
+    def __str__(self):
+        return self.nombre
+
+
+# =========================================================
+# ✅ IDEMPOTENCY-KEY EN CURSO (ver idempotencia.py)
+# Lock atómico por clave cuando el cache compartido no es Redis:
+# la restricción UNIQUE decide qué petición ejecuta la vista
+# =========================================================
+class IdempotenciaEnCurso(models.Model):
+    clave = models.CharField("Clave", max_length=100, unique=True)
+    vence = models.DateTimeField("Vence", db_index=True)
+
+    class Meta:
+        verbose_name = "Idempotency-Key en curso"
+        verbose_name_plural = "Idempotency-Keys en curso"
+
+    def __str__(self):
+        return self.clave
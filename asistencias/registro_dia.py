@@ -0,0 +1,101 @@
+"""
+ENTRADAS (tipo="E") ya registradas en el día, en memoria (por proceso).
+
+Se siembra con 1 consulta en el primer escaneo del día, más lo que el journal
+local aún no volcó (SCAN_JOURNAL=1), y se completa con cada registro exitoso. Solo afirma presencia: si el profesor está, la respuesta es
+DUPLICADO sin abrir una transacción de escritura; si no está, se sigue al
+INSERT (que igual deduplica con uniq_profesor_fecha_tipo).
+
+Borrar o editar una ENTRADA (admin) incrementa la versión "registro_dia"
+(ver versiones.py) y todos los workers vuelven a sembrar.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+
+from . import journal
+from .models import Asistencia
+from .versiones import aget_version, bump_version, get_version
+
+VERSION_KEY = "registro_dia"
+
+
+class EntradaDia:
+    """Lo mínimo que usa _payload_asistencia (id es None si aún está en el journal)."""
+    __slots__ = ("id", "profesor_id", "fecha", "fecha_hora")
+
+    tipo = "E"
+
+    def __init__(self, profesor_id, fecha, fecha_hora, id=None):
+        self.id = id
+        self.profesor_id = profesor_id
+        self.fecha = fecha
+        self.fecha_hora = fecha_hora
+
+
+_lock = threading.Lock()
+_estado = {"version": None, "fecha": None, "entradas": {}}
+
+
+def _sembrar(fecha):
+    entradas = {
+        profesor_id: EntradaDia(profesor_id, fecha, fecha_hora, id=asistencia_id)
+        for asistencia_id, profesor_id, fecha_hora in (
+            Asistencia.objects
+            .filter(fecha=fecha, tipo="E")
+            .values_list("id", "profesor_id", "fecha_hora")
+        )
+    }
+    if journal.activo():
+        # Pendientes de volcado: tras un reinicio el re-escaneo es DUPLICADO sin escribir al journal
+        for profesor_id, fecha_hora in journal.pendientes(fecha):
+            entradas.setdefault(profesor_id, EntradaDia(profesor_id, fecha, fecha_hora))
+    return entradas
+
+
+def _entradas(fecha):
+    version = get_version(VERSION_KEY)
+    if _estado["version"] != version or _estado["fecha"] != fecha:
+        with _lock:
+            if _estado["version"] != version or _estado["fecha"] != fecha:
+                _estado["entradas"] = _sembrar(fecha)
+                _estado["fecha"] = fecha
+                _estado["version"] = version
+    return _estado["entradas"]
+
+
+def entrada(profesor_id, fecha):
+    """EntradaDia si el profesor ya registró ENTRADA en `fecha`, o None."""
+    return _entradas(fecha).get(profesor_id)
+
+
+async def aentrada(profesor_id, fecha):
+    version = await aget_version(VERSION_KEY)
+    if _estado["version"] == version and _estado["fecha"] == fecha:
+        return _estado["entradas"].get(profesor_id)
+    return await sync_to_async(entrada)(profesor_id, fecha)
+
+
+def anotar(asistencia):
+    """
+    Agrega una ENTRADA recién registrada (o encontrada) al día en memoria.
+    Devuelve la EntradaDia vigente para ese profesor.
+    """
+    nueva = EntradaDia(
+        asistencia.profesor_id,
+        asistencia.fecha,
+        asistencia.fecha_hora,
+        id=asistencia.id,
+    )
+    with _lock:
+        if _estado["fecha"] != asistencia.fecha:
+            return nueva
+        return _estado["entradas"].setdefault(asistencia.profesor_id, nueva)
+
+
+def invalidar_registro_dia():
+    with _lock:
+        _estado["version"] = None
+        _estado["fecha"] = None
+        _estado["entradas"] = {}
+    bump_version(VERSION_KEY)
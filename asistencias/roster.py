@@ -0,0 +1,181 @@
+"""
+Padrón de profesores en memoria (por proceso).
+
+Se reconstruye de forma perezosa con 1 consulta y se invalida entre workers
+mediante la versión "roster" (ver versiones.py), que los signals de
+Profesor incrementan.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+
+from . import busqueda
+from .models import Profesor
+from .versiones import aget_version, bump_version, get_version
+
+VERSION_KEY = "roster"
+
+_CAMPOS = (
+    "id",
+    "dni",
+    "codigo",
+    "apellidos",
+    "nombres",
+    "condicion",
+    "tipo_jornada",
+    "sexo",
+    "activo",
+    "email",
+)
+
+
+class ProfesorRecord:
+    """
+    Registro compacto e inmutable de un profesor.
+    Expone los mismos atributos/propiedades que usan las vistas y templates.
+    """
+    __slots__ = _CAMPOS + ("busqueda",)
+
+    def __init__(self, id, dni, codigo, apellidos, nombres, condicion, tipo_jornada, sexo, activo, email):
+        self.id = id
+        self.dni = dni
+        self.codigo = codigo
+        self.apellidos = apellidos
+        self.nombres = nombres
+        self.condicion = condicion
+        self.tipo_jornada = tipo_jornada
+        self.sexo = sexo
+        self.activo = activo
+        self.email = email
+        self.busqueda = busqueda.texto_profesor(dni, codigo, apellidos, nombres)
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def nombre_completo(self):
+        ap = (self.apellidos or "").strip()
+        nom = (self.nombres or "").strip()
+        return f"{ap} {nom}".strip() or "Profesor(a)"
+
+    @property
+    def genero_voz(self):
+        return "F" if self.sexo == "F" else "M"
+
+    @property
+    def tratamiento_voz(self):
+        return "profesora" if self.sexo == "F" else "profesor"
+
+    def __str__(self):
+        estado = "" if self.activo else " [INACTIVO]"
+        return f"{self.apellidos} {self.nombres}{estado}"
+
+    def __repr__(self):
+        return f"<ProfesorRecord {self.id} {self.dni}>"
+
+
+class Roster:
+    __slots__ = ("version", "ordenados", "por_dni", "por_id")
+
+    def __init__(self, version, registros):
+        self.version = version
+        self.ordenados = tuple(registros)
+        self.por_dni = {p.dni: p for p in self.ordenados}
+        self.por_id = {p.id: p for p in self.ordenados}
+
+    def filtrar(self, q="", condicion="", condiciones=("N", "C")):
+        """
+        Equivalente en memoria de filtro_profesores():
+        q -> contiene, sin tildes ni mayúsculas, sobre dni/codigo/apellidos/nombres
+        condicion -> iexact (solo si está en `condiciones`)
+        Mantiene el orden apellidos/nombres.
+        """
+        q = busqueda.normalizar(q)
+        condicion = (condicion or "").strip().upper()
+        if condicion not in condiciones:
+            condicion = ""
+
+        if not q and not condicion:
+            return list(self.ordenados)
+
+        return [
+            p for p in self.ordenados
+            if (not q or q in p.busqueda)
+            and (not condicion or (p.condicion or "").upper() == condicion)
+        ]
+
+
+_lock = threading.Lock()
+_roster = None
+
+
+def _construir(version):
+    filas = (
+        Profesor.objects
+        .order_by("apellidos", "nombres", "id")
+        .values_list(*_CAMPOS)
+    )
+    return Roster(version, (ProfesorRecord(*fila) for fila in filas))
+
+
+def get_roster() -> Roster:
+    global _roster
+
+    version = get_version(VERSION_KEY)
+    actual = _roster
+    if actual is not None and actual.version == version:
+        return actual
+
+    with _lock:
+        if _roster is None or _roster.version != version:
+            _roster = _construir(version)
+        return _roster
+
+
+async def aget_roster() -> Roster:
+    """
+    Versión async: si el padrón vigente ya está en memoria no sale del event loop;
+    solo la reconstrucción (consulta a BD) pasa a un hilo.
+    """
+    version = await aget_version(VERSION_KEY)
+    actual = _roster
+    if actual is not None and actual.version == version:
+        return actual
+    return await sync_to_async(get_roster)()
+
+
+def invalidar_roster():
+    global _roster
+    _roster = None
+    bump_version(VERSION_KEY)
+
+
+def profesor_por_dni(dni):
+    return get_roster().por_dni.get(dni)
+
+
+def profesor_por_id(profesor_id):
+    try:
+        return get_roster().por_id.get(int(profesor_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def filtrar_profesores(q="", condicion="", condiciones=("N", "C")):
+    return get_roster().filtrar(q=q, condicion=condicion, condiciones=condiciones)
+
+
+def filtro_profesores(q="", condicion="", condiciones=("N", "C")):
+    """Q equivalente a Roster.filtrar, para las consultas que paginan en SQL (busqueda.py)."""
+    condicion = (condicion or "").strip().upper()
+
+    filtro = busqueda.filtro(q)
+    if condicion in condiciones:
+        filtro &= Q(condicion__iexact=condicion)
+    return filtro
+
+
+async def aprofesor_por_dni(dni):
+    return (await aget_roster()).por_dni.get(dni)
@@ -1,9 +1,16 @@
 from decimal import Decimal, InvalidOperation
 
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import LoginEvidencia
+from . import busqueda, diaria, en_vivo, grupos, journal, registro_dia
+from .calendario import invalidar_calendario
+from .models import Asistencia, DiaEspecial, JustificacionAsistencia, LoginEvidencia, Profesor
+from .roster import invalidar_roster
 
 
 def _to_decimal(value):
@@ -78,4 +85,148 @@ def guardar_evidencia_login_fallido(sender, credentials, request, **kwargs):
             ip=_get_client_ip(request),
         )
     except Exception:
-        pass
\ No newline at end of file
+        pass
+
+
+@receiver(pre_save, sender=Profesor)
+def profesor_texto_busqueda(sender, instance, **kwargs):
+    """Mantiene Profesor.busqueda al día (también en loaddata, que no llama a save())."""
+    instance.busqueda = busqueda.texto_profesor(
+        instance.dni, instance.codigo, instance.apellidos, instance.nombres
+    )
+
+
+@receiver(post_save, sender=Profesor)
+@receiver(post_delete, sender=Profesor)
+def invalidar_roster_profesor(sender, **kwargs):
+    """
+    Invalida el padrón en memoria de todos los workers.
+    Se hace al confirmar la transacción para que nadie reconstruya con datos viejos.
+    """
+    transaction.on_commit(invalidar_roster)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidar_grupos_usuario(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Cambió la membresía de grupos: se borra ya y otra vez al confirmar
+    (otro request pudo volver a cachear el valor viejo mientras tanto).
+    """
+    if reverse and action == "pre_clear":
+        # group.user_set.clear(): después ya no se sabe a quiénes afectó
+        instance._asistencias_usuarios = list(instance.user_set.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        user_ids = [instance.pk]
+        instance.__dict__.pop(grupos._ATRIBUTO, None)
+    elif action == "post_clear":
+        user_ids = getattr(instance, "_asistencias_usuarios", [])
+    else:
+        user_ids = list(pk_set or ())
+
+    grupos.invalidar_usuarios(user_ids)
+    transaction.on_commit(lambda: grupos.invalidar_usuarios(user_ids))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidar_grupos_renombrado(sender, **kwargs):
+    transaction.on_commit(grupos.invalidar_grupos)
+
+
+@receiver(post_save, sender=DiaEspecial)
+@receiver(post_delete, sender=DiaEspecial)
+def invalidar_calendario_dia_especial(sender, **kwargs):
+    transaction.on_commit(invalidar_calendario)
+
+
+@receiver(post_save, sender=Asistencia)
+def registro_dia_entrada_guardada(sender, instance, created, **kwargs):
+    if instance.tipo != "E":
+        return
+    if created:
+        transaction.on_commit(lambda: registro_dia.anotar(instance))
+    else:
+        # Edición (admin): pudo cambiar fecha/profesor
+        transaction.on_commit(registro_dia.invalidar_registro_dia)
+
+
+@receiver(post_save, sender=Asistencia)
+def en_vivo_asistencia_creada(sender, instance, created, **kwargs):
+    """ENTRADA o justificación nueva: avisa a los historiales abiertos en este worker."""
+    if created:
+        transaction.on_commit(lambda: en_vivo.publicar(instance))
+
+
+@receiver(post_delete, sender=Asistencia)
+def registro_dia_entrada_borrada(sender, instance, **kwargs):
+    """Al borrar una ENTRADA el docente puede volver a registrarse ese día."""
+    if instance.tipo != "E":
+        return
+
+    def _invalidar():
+        if journal.activo():
+            journal.olvidar_entrada(instance.profesor_id, instance.fecha)
+        registro_dia.invalidar_registro_dia()
+
+    transaction.on_commit(_invalidar)
+
+
+# =========================================================
+# ASISTENCIA DIARIA (diaria.py)
+# =========================================================
+@receiver(pre_save, sender=Asistencia)
+@receiver(pre_save, sender=JustificacionAsistencia)
+@receiver(pre_save, sender=DiaEspecial)
+def diaria_valores_anteriores(sender, instance, **kwargs):
+    """Edición (admin): recuerda profesor/fecha previos para recalcular también ese día."""
+    if instance._state.adding or instance.pk is None:
+        instance._diaria_antes = None
+        return
+    campos = ("fecha",) if sender is DiaEspecial else ("profesor_id", "fecha")
+    instance._diaria_antes = sender.objects.filter(pk=instance.pk).values_list(*campos).first()
+
+
+def _recalcular_pares(instance):
+    pares = {(instance.profesor_id, instance.fecha)}
+    antes = getattr(instance, "_diaria_antes", None)
+    if antes:
+        pares.add(antes)
+
+    def _recalcular():
+        for profesor_id, fecha in pares:
+            diaria.recalcular_par(profesor_id, fecha)
+
+    transaction.on_commit(_recalcular)
+
+
+@receiver(post_save, sender=Asistencia)
+def diaria_asistencia_guardada(sender, instance, created, **kwargs):
+    if created and instance.tipo == "E":
+        transaction.on_commit(lambda: diaria.anotar_entradas([instance]))
+    else:
+        _recalcular_pares(instance)
+
+
+@receiver(post_delete, sender=Asistencia)
+@receiver(post_save, sender=JustificacionAsistencia)
+@receiver(post_delete, sender=JustificacionAsistencia)
+def diaria_registro_cambiado(sender, instance, **kwargs):
+    _recalcular_pares(instance)
+
+
+@receiver(post_save, sender=DiaEspecial)
+@receiver(post_delete, sender=DiaEspecial)
+def diaria_dia_especial(sender, instance, **kwargs):
+    especial = instance.activo and kwargs.get("signal") is post_save
+    antes = getattr(instance, "_diaria_antes", None)
+
+    def _reclasificar():
+        if antes and antes[0] != instance.fecha:
+            diaria.reclasificar_fecha(antes[0], especial=False)  # fecha es única en DiaEspecial
+        diaria.reclasificar_fecha(instance.fecha, especial=especial)
+
+    transaction.on_commit(_reclasificar)
@@ -1,17 +1,28 @@
 # asistencias/storage_backends.py
+from functools import lru_cache
+
 from cloudinary_storage.storage import MediaCloudinaryStorage
 from cloudinary.utils import cloudinary_url
 
 from whitenoise.storage import MissingFileError
 
+# Nombres distintos que se recuerdan por proceso (~300 B por URL)
+URL_MEMO_MAX = 4096
+
 
 class MediaCloudinaryStorageAuto(MediaCloudinaryStorage):
     """
     ✅ Sube con resource_type='auto'
     ✅ Entrega PDFs como IMAGE (image/upload) para evitar RAW
+    ✅ url() memoizada (LRU acotado): cloudinary_url y la corrección a raw/upload
+       corren una vez por nombre, no en cada fila de cada página
     """
     resource_type = "auto"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._url_memo = lru_cache(maxsize=URL_MEMO_MAX)(self._construir_url)
+
     def _looks_like_pdf(self, name: str) -> bool:
         n = (name or "").lower()
         if n.endswith(".pdf"):
@@ -20,10 +31,7 @@ class MediaCloudinaryStorageAuto(MediaCloudinaryStorage):
             return True
         return False
 
-    def url(self, name, *args, **kwargs):
-        if not name:
-            return ""
-
+    def _construir_url(self, name):
         # ✅ PDF -> forzamos image/upload y format=pdf
         if self._looks_like_pdf(name):
             url, _ = cloudinary_url(
@@ -32,6 +40,9 @@ class MediaCloudinaryStorageAuto(MediaCloudinaryStorage):
                 secure=True,
                 format="pdf",
             )
+            # Un public_id con extensión .pdf es un recurso RAW: se sirve por raw/upload
+            if name.lower().endswith(".pdf") and "/image/upload/" in url:
+                url = url.replace("/image/upload/", "/raw/upload/")
             return url
 
         # ✅ resto (imágenes) normal
@@ -42,3 +53,7 @@ class MediaCloudinaryStorageAuto(MediaCloudinaryStorage):
         )
         return url
 
+    def url(self, name, *args, **kwargs):
+        if not name:
+            return ""
+        return self._url_memo(name)
@@ -0,0 +1,147 @@
+"""
+Subida directa del PDF de justificación al storage (sin pasar por gunicorn).
+
+1. El panel pide un ticket (POST ticket_subida_justificacion). El servidor fija
+   el nombre final, `justificaciones/%Y/%m/<uuid>`, y lo firma junto al usuario.
+2. El navegador sube el archivo directo a la URL del ticket:
+   - Cloudinary: upload firmado (api_sign_request) con ese public_id y
+     allowed_formats=pdf; el navegador no puede cambiar el nombre, la carpeta
+     ni el formato sin romper la firma.
+   - Local / tests (sin CLOUDINARY_URL): `subida_local_justificacion`, que
+     valida el PDF y lo guarda con FileSystemStorage en el mismo nombre.
+3. set_justificacion recibe solo el ticket: verifica la firma, deriva el
+   nombre y comprueba en el storage que el archivo exista, sea PDF y no pase
+   de subidas.MAX_BYTES (si no, lo borra). No vuelve a leer el PDF.
+
+Sin JavaScript, o si la subida directa falla, el formulario sigue enviando el
+archivo como antes y va a la cola de subidas.py.
+"""
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+
+from . import subidas
+from .models import JustificacionAsistencia
+
+SALT = "asistencias.subida_directa"
+TTL = 60 * 60  # lo mismo que acepta Cloudinary para un timestamp firmado
+
+
+def _storage():
+    return JustificacionAsistencia._meta.get_field("archivo").storage
+
+
+def usa_cloudinary() -> bool:
+    return bool(getattr(settings, "CLOUDINARY_URL", ""))
+
+
+def emitir(user):
+    """{"ticket", "url", "campos", "local"}: a dónde y con qué campos subir el PDF."""
+    nombre = f"justificaciones/{timezone.localdate():%Y/%m}/{uuid.uuid4().hex}"
+    if not usa_cloudinary():
+        nombre += ".pdf"
+
+    ticket = signing.dumps({"n": nombre, "u": user.pk}, salt=SALT, compress=True)
+
+    if not usa_cloudinary():
+        return {
+            "ticket": ticket,
+            "url": reverse("subida_local_justificacion"),
+            "campos": {"ticket": ticket},
+            "local": True,
+        }
+
+    import cloudinary
+    from cloudinary.utils import api_sign_request
+
+    config = cloudinary.config()
+    params = {
+        "public_id": nombre,
+        "timestamp": int(time.time()),
+        "overwrite": "false",
+        "allowed_formats": "pdf",
+    }
+    params["signature"] = api_sign_request(params, config.api_secret)
+    params["api_key"] = config.api_key
+
+    return {
+        "ticket": ticket,
+        "url": f"https://api.cloudinary.com/v1_1/{config.cloud_name}/auto/upload",
+        "campos": params,
+        "local": False,
+    }
+
+
+def leer(ticket, user):
+    """Nombre firmado en el ticket. ValueError si es inválido, ajeno o vencido."""
+    try:
+        datos = signing.loads(ticket, salt=SALT, max_age=TTL)
+    except signing.BadSignature as ex:  # incluye SignatureExpired
+        raise ValueError("Ticket de subida inválido o vencido.") from ex
+
+    if datos.get("u") != user.pk:
+        raise ValueError("Ticket de subida de otro usuario.")
+    return datos["n"]
+
+
+def _recurso(nombre):
+    """(formato, bytes) de lo que llegó al storage con ese nombre, o None."""
+    if not usa_cloudinary():
+        storage = _storage()
+        if not storage.exists(nombre):
+            return None
+        return os.path.splitext(nombre)[1].lstrip(".").lower(), storage.size(nombre)
+
+    import cloudinary.api
+    from cloudinary.exceptions import NotFound
+
+    try:
+        recurso = cloudinary.api.resource(nombre, resource_type="image")  # upload "auto": un PDF es image
+    except NotFound:
+        return None
+    return (recurso.get("format") or "").lower(), int(recurso.get("bytes") or 0)
+
+
+def _descartar(nombre):
+    if not usa_cloudinary():
+        _storage().delete(nombre)
+        return
+
+    import cloudinary.uploader
+
+    cloudinary.uploader.destroy(nombre, resource_type="image", invalidate=True)
+
+
+def confirmar(ticket, user):
+    """
+    Nombre listo para JustificacionAsistencia.archivo. ValueError si el
+    archivo no llegó al storage, no es un PDF aceptable o ya está asignado a
+    otra justificación.
+    """
+    nombre = leer(ticket, user)
+    if JustificacionAsistencia.objects.filter(archivo=nombre).exists():
+        raise ValueError("Ese PDF ya está asociado a otra justificación.")
+
+    recurso = _recurso(nombre)
+    if recurso is None:
+        raise ValueError("El PDF no llegó al almacenamiento. Vuelve a adjuntarlo.")
+
+    formato, tamanio = recurso
+    if formato != "pdf" or tamanio > subidas.MAX_BYTES:
+        _descartar(nombre)
+        raise ValueError("El archivo subido debe ser un PDF de máx. 10 MB. Vuelve a adjuntarlo.")
+    return nombre
+
+
+def guardar_local(ticket, user, archivo):
+    """Stand-in de la subida directa: guarda `archivo` con el nombre del ticket."""
+    nombre = leer(ticket, user)
+    storage = _storage()
+    if storage.exists(nombre):
+        raise ValueError("El ticket ya se usó.")
+    return storage.save(nombre, archivo)
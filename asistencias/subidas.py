@@ -0,0 +1,149 @@
+"""
+Subida de PDFs de justificación en segundo plano.
+
+set_justificacion no sube nada mientras el usuario espera: crea la(s)
+justificación(es) con archivo_estado=PENDIENTE y deja el PDF en
+SubidaJustificacion (cola en BD, el contenido en la fila) en la misma
+transacción; un rango de fechas comparte una sola subida. El comando
+`subir_justificaciones` toma cada pendiente con SELECT ... FOR UPDATE SKIP
+LOCKED (varios workers no se pisan), la reserva por LEASE segundos moviendo
+`siguiente_intento` y confirma: la subida al storage (Cloudinary en
+producción, FileSystemStorage en local y tests) corre FUERA de la
+transacción. Si el worker cae a mitad, el lease vence y otro la retoma.
+
+Un fallo deja la fila en cola con el error y la pospone con backoff
+exponencial (ESPERA_BASE, 2x, 4x...; tope ESPERA_MAX): un corte breve del
+storage no quema los intentos de golpe ni bloquea al resto de la cola. Tras
+MAX_INTENTOS la justificación queda en ERROR y la fila se conserva para
+revisarla en el admin.
+"""
+import logging
+import os
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import JustificacionAsistencia, SubidaJustificacion
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 5
+MAX_BYTES = 10 * 1024 * 1024
+LEASE = 5 * 60
+ESPERA_BASE = 30
+ESPERA_MAX = 60 * 60
+
+
+def validar_pdf(archivo):
+    """Mensaje de error para el usuario, o None si `archivo` es un PDF aceptable."""
+    nombre = (archivo.name or "").strip().lower()
+    ctype = (getattr(archivo, "content_type", "") or "").lower()
+
+    if not nombre.endswith(".pdf"):
+        return "El archivo debe terminar en .pdf"
+    if ctype and ctype != "application/pdf":
+        return f"El archivo debe ser PDF (content_type recibido: {ctype})."
+    if (getattr(archivo, "size", 0) or 0) > MAX_BYTES:
+        return "El PDF es muy pesado (máx. 10 MB)."
+    return None
+
+
+def encolar(justificaciones, archivo):
+    """
+    Deja el PDF en cola para `justificaciones` (objetos o ids). Llamar dentro de
+    la transacción que las crea.
+    """
+    nombre = os.path.basename((archivo.name or "").strip())[:255] or "sustento.pdf"
+    subida = SubidaJustificacion.objects.create(nombre=nombre, contenido=b"".join(archivo.chunks()))
+    subida.justificaciones.add(*justificaciones)
+    return subida
+
+
+def _marcar(justificacion_ids, **campos):
+    # update(): sin signals (el estado diario no cambia) pero moviendo
+    # actualizado_en, que invalida las páginas de días cerrados (condicional.py)
+    JustificacionAsistencia.objects.filter(pk__in=justificacion_ids).update(
+        actualizado_en=timezone.now(), **campos
+    )
+
+
+def espera(intentos):
+    """Segundos hasta el próximo intento tras `intentos` fallos."""
+    return min(ESPERA_BASE * 2 ** max(intentos - 1, 0), ESPERA_MAX)
+
+
+def _tomar(excluir):
+    """Reserva (lease) la subida vencida más antigua y confirma; None si no hay."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        subida = (
+            SubidaJustificacion.objects
+            .select_for_update(skip_locked=True)
+            .filter(intentos__lt=MAX_INTENTOS, siguiente_intento__lte=ahora)
+            .exclude(pk__in=excluir)
+            .order_by("siguiente_intento", "id")
+            .first()
+        )
+        if subida is None:
+            return None
+        subida.siguiente_intento = ahora + timedelta(seconds=LEASE)
+        subida.save(update_fields=["siguiente_intento"])
+        return subida
+
+
+def procesar_una(excluir=()):
+    """
+    Sube el PDF vencido más antiguo (salvo los ids de `excluir`):
+    (resultado, id) con resultado "subida" o "error", o None si no hay cola.
+    """
+    subida = _tomar(excluir)
+    if subida is None:
+        return None
+
+    subida_id = subida.pk
+    ids = list(subida.justificaciones.values_list("id", flat=True))
+    campo = JustificacionAsistencia._meta.get_field("archivo")
+
+    # ✅ sin transacción abierta: la fila no queda bloqueada durante la subida
+    try:
+        nombre = campo.storage.save(
+            campo.generate_filename(None, subida.nombre),  # upload_to es un patrón strftime
+            ContentFile(bytes(subida.contenido)),
+            max_length=campo.max_length,
+        )
+    except Exception as ex:
+        subida.intentos += 1
+        subida.error = f"{type(ex).__name__}: {ex}"[:255]
+        subida.siguiente_intento = timezone.now() + timedelta(seconds=espera(subida.intentos))
+        with transaction.atomic():
+            subida.save(update_fields=["intentos", "error", "siguiente_intento"])
+            if subida.intentos >= MAX_INTENTOS:
+                _marcar(ids, archivo_estado=JustificacionAsistencia.ARCHIVO_ERROR)
+        logger.warning("Subida %s falló (intento %s): %s", subida.pk, subida.intentos, subida.error)
+        return "error", subida_id
+
+    with transaction.atomic():
+        _marcar(ids, archivo=nombre, archivo_estado=JustificacionAsistencia.ARCHIVO_LISTO)
+        subida.delete()
+    return "subida", subida_id
+
+
+def procesar(lote=20):
+    """
+    Hasta `lote` subidas, cada una a lo sumo una vez por pasada.
+    Devuelve {"subidas": n, "errores": n, "pendientes": n}.
+    """
+    resultado = {"subidas": 0, "errores": 0, "pendientes": 0}
+    intentadas = set()
+    for _ in range(lote):
+        r = procesar_una(excluir=intentadas)
+        if r is None:
+            break
+        estado, subida_id = r
+        intentadas.add(subida_id)
+        resultado["subidas" if estado == "subida" else "errores"] += 1
+
+    resultado["pendientes"] = SubidaJustificacion.objects.filter(intentos__lt=MAX_INTENTOS).count()
+    return resultado
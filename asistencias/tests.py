@@ -1,3 +1,1242 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from . import (
+    archivos, calendario, diaria, en_vivo, entradas, grupos, idempotencia, journal, justificaciones, matriz,
+    registro_dia, roster, subida_directa, subidas, views,
+)
+from .admin import ProfesorAdmin
+from .entradas import insertar_entrada
+from .models import (
+    Asistencia, AsistenciaDiaria, DiaEspecial, IdempotenciaEnCurso, JustificacionAsistencia, Profesor,
+    SubidaJustificacion,
+)
+
+
+class InsertarEntradaTests(TransactionTestCase):
+    def setUp(self):
+        self.profesor = Profesor.objects.create(
+            dni="12345678",
+            apellidos="PEREZ",
+            nombres="Ana",
+            condicion="N",
+        )
+        self.fecha = date(2026, 3, 2)
+
+    def test_duplicado_devuelve_fila_existente(self):
+        primera, creada = insertar_entrada(self.profesor.id, self.fecha, timezone.now())
+        segunda, creada_2 = insertar_entrada(self.profesor.id, self.fecha, timezone.now())
+
+        self.assertTrue(creada)
+        self.assertFalse(creada_2)
+        self.assertEqual(segunda.id, primera.id)
+        self.assertEqual(segunda.fecha_hora, primera.fecha_hora)
+
+    # En SQLite solo se ejercitaría _sqlite_lock: la sentencia ON CONFLICT ... RETURNING es de PostgreSQL
+    @skipUnless(connection.vendor == "postgresql", "INSERT ... ON CONFLICT RETURNING solo en PostgreSQL")
+    def test_concurrencia_mismo_dni_crea_una_sola_fila(self):
+        hilos = 12
+        barrera = threading.Barrier(hilos)
+        resultados = []
+        errores = []
+        lock = threading.Lock()
+
+        def escanear():
+            try:
+                barrera.wait()
+                asistencia, creada = insertar_entrada(
+                    self.profesor.id, self.fecha, timezone.now()
+                )
+                with lock:
+                    resultados.append((asistencia.id, creada))
+            except Exception as e:  # pragma: no cover - se reporta abajo
+                with lock:
+                    errores.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=escanear) for _ in range(hilos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(resultados), hilos)
+        self.assertEqual(sum(1 for _, creada in resultados if creada), 1)
+        self.assertEqual(len({asistencia_id for asistencia_id, _ in resultados}), 1)
+        self.assertEqual(
+            Asistencia.objects.filter(profesor=self.profesor, fecha=self.fecha, tipo="E").count(),
+            1,
+        )
+
+
+    @skipUnless(connection.vendor == "postgresql", "INSERT ... ON CONFLICT RETURNING solo en PostgreSQL")
+    def test_sentencia_postgres_lote_y_conflicto(self):
+        otro = Profesor.objects.create(dni="12345679", apellidos="ROJAS", nombres="Leo", condicion="N")
+        existente, _ = insertar_entrada(self.profesor.id, self.fecha, timezone.now())
+
+        resultado = entradas.insertar_entradas(
+            self.fecha, {self.profesor.id: timezone.now(), otro.id: timezone.now()}
+        )
+
+        asistencia, creada = resultado[self.profesor.id]
+        self.assertEqual((asistencia.id, creada), (existente.id, False))
+        self.assertTrue(resultado[otro.id][1])
+        self.assertEqual(Asistencia.objects.filter(fecha=self.fecha, tipo="E").count(), 2)
+
+
+class ScanAsyncTests(TestCase):
+    def setUp(self):
+        registro_dia.invalidar_registro_dia()
+        # on_commit invalida el padrón en memoria (roster.py)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profesor = Profesor.objects.create(
+                dni="87654321",
+                apellidos="QUISPE",
+                nombres="Luis",
+                condicion="N",
+            )
+        self.user = User.objects.create_user(username="scanner", password="x")
+        self.user.groups.add(Group.objects.create(name="SCANNER"))
+        self.async_client.force_login(self.user)
+        self.url = reverse("api_scan_asistencia_async")
+
+    async def _scan(self, dni):
+        return await self.async_client.post(
+            self.url,
+            data={"code": dni},
+            content_type="application/json",
+        )
+
+    @mock.patch.object(timezone, "localdate", return_value=date(2026, 3, 2))
+    async def test_registra_y_luego_duplicado(self, _):
+        primera = await self._scan(self.profesor.dni)
+        segunda = await self._scan(self.profesor.dni)
+
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual(primera.json()["estado"], "ASISTIO")
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.json()["estado"], "DUPLICADO")
+        self.assertEqual(
+            await Asistencia.objects.filter(profesor=self.profesor, tipo="E").acount(), 1
+        )
+
+    async def test_sin_grupo_redirige_a_login(self):
+        await self.async_client.alogout()
+        resp = await self._scan(self.profesor.dni)
+        self.assertEqual(resp.status_code, 302)
+
+
+class JournalScanTests(TestCase):
+    def setUp(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        ajustes = override_settings(
+            SCAN_JOURNAL=True, SCAN_JOURNAL_PATH=os.path.join(carpeta, "journal.sqlite3")
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        registro_dia.invalidar_registro_dia()
+        self.addCleanup(registro_dia.invalidar_registro_dia)
+
+        self.fecha = date(2026, 3, 2)
+        self.ana = Profesor.objects.create(dni="11111111", apellidos="A", nombres="Ana", condicion="N")
+        self.beto = Profesor.objects.create(dni="22222222", apellidos="B", nombres="Beto", condicion="N")
+
+    def test_registra_sin_tocar_bd_y_vuelca_una_vez(self):
+        primera, creada = journal.registrar(self.ana.id, self.fecha, timezone.now())
+        segunda, creada_2 = journal.registrar(self.ana.id, self.fecha, timezone.now())
+
+        self.assertTrue(creada)
+        self.assertFalse(creada_2)
+        self.assertEqual(segunda.fecha_hora, primera.fecha_hora)
+        self.assertFalse(Asistencia.objects.exists())
+
+        self.assertEqual(journal.vaciar()["volcadas"], 1)
+        asistencia = Asistencia.objects.get()
+        self.assertEqual(asistencia.fecha_hora, primera.fecha_hora)
+
+        # Replay tras una caída entre el INSERT y el UPDATE del journal: idempotente
+        journal._conexion().execute("UPDATE entradas SET estado = ?", (journal.PENDIENTE,))
+        self.assertEqual(journal.vaciar()["volcadas"], 1)
+        self.assertEqual(Asistencia.objects.count(), 1)
+
+    def test_siembra_incluye_pendientes_del_journal(self):
+        primera, _ = journal.registrar(self.ana.id, self.fecha, timezone.now())
+        registro_dia.invalidar_registro_dia()  # reinicio del worker: se vuelve a sembrar
+
+        entrada = registro_dia.entrada(self.ana.id, self.fecha)
+        self.assertEqual(entrada.fecha_hora, primera.fecha_hora)
+        self.assertIsNone(registro_dia.entrada(self.beto.id, self.fecha))
+        self.assertFalse(Asistencia.objects.exists())
+
+    @mock.patch.object(timezone, "localdate", return_value=date(2026, 3, 2))
+    def test_lote_tras_escaneo_en_journal_es_duplicado(self, _):
+        calendario.invalidar_calendario()
+        roster.invalidar_roster()
+        self.addCleanup(roster.invalidar_roster)
+        user = User.objects.create_user(username="kiosko", password="x")
+        user.groups.add(Group.objects.create(name="SCANNER"))
+        self.client.force_login(user)
+
+        primera = self.client.post(
+            reverse("api_scan_asistencia_sync"), data={"code": self.ana.dni}, content_type="application/json"
+        )
+        lote = self.client.post(
+            reverse("api_scan_asistencia_batch"),
+            data={"codes": [self.ana.dni, self.beto.dni]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual([r["estado"] for r in lote.json()["resultados"]], ["DUPLICADO", "ASISTIO"])
+        self.assertEqual(
+            lote.json()["resultados"][0]["asistencia"]["fecha_hora"], primera.json()["asistencia"]["fecha_hora"]
+        )
+        self.assertFalse(Asistencia.objects.exists())  # todo sigue en el journal
+
+        resultado = journal.vaciar()
+        self.assertEqual((resultado["volcadas"], resultado["conflictos"]), (2, 0))
+        self.assertEqual(
+            Asistencia.objects.get(profesor=self.ana).fecha_hora.isoformat(),
+            primera.json()["asistencia"]["fecha_hora"],
+        )
+
+    def test_concilia_conflicto_con_entrada_existente(self):
+        journal.registrar(self.ana.id, self.fecha, timezone.now())  # siembra el día
+        _, creada = journal.registrar(self.beto.id, self.fecha, timezone.now())
+        manual, _ = insertar_entrada(self.beto.id, self.fecha, timezone.now())
+
+        resultado = journal.vaciar()
+
+        self.assertTrue(creada)
+        self.assertEqual((resultado["volcadas"], resultado["conflictos"]), (1, 1))
+        self.assertEqual(
+            Asistencia.objects.get(profesor=self.beto, fecha=self.fecha).fecha_hora,
+            manual.fecha_hora,
+        )
+
+
+@mock.patch.object(timezone, "localdate", return_value=date(2026, 3, 2))
+class IdempotenciaScanTests(TestCase):
+    def setUp(self):
+        idempotencia._local.clear()
+        registro_dia.invalidar_registro_dia()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profesor = Profesor.objects.create(
+                dni="33333333", apellidos="ROJAS", nombres="Eva", condicion="N"
+            )
+        self.user = User.objects.create_user(username="scanner", password="x")
+        self.user.groups.add(Group.objects.create(name="SCANNER"))
+        self.client.force_login(self.user)
+
+    def _scan(self, clave):
+        return self.client.post(
+            reverse("api_scan_asistencia_sync"),
+            data={"code": self.profesor.dni},
+            content_type="application/json",
+            headers={"Idempotency-Key": clave},
+        )
+
+    def test_reintento_repite_primera_respuesta(self, _):
+        clave = uuid.uuid4().hex
+        primera = self._scan(clave)
+        reintento = self._scan(clave)
+
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual(reintento.status_code, 201)
+        self.assertEqual(reintento.json()["estado"], "ASISTIO")
+        self.assertEqual(reintento["Idempotent-Replayed"], "true")
+        self.assertEqual(reintento.content, primera.content)
+
+    def test_otra_clave_ejecuta_la_vista(self, _):
+        self._scan(uuid.uuid4().hex)
+        otra = self._scan(uuid.uuid4().hex)
+
+        self.assertEqual(otra.json()["estado"], "DUPLICADO")
+        self.assertFalse(otra.has_header("Idempotent-Replayed"))
+
+    def test_clave_en_curso_responde_409(self, _):
+        clave = uuid.uuid4().hex
+        path = reverse("api_scan_asistencia_sync")
+        # Otro worker tiene el lock (fila UNIQUE) y aún no guardó su respuesta
+        IdempotenciaEnCurso.objects.create(
+            clave=idempotencia._clave_cache(self.user.pk, path, clave),
+            vence=timezone.now() + timedelta(seconds=30),
+        )
+
+        with mock.patch.object(idempotencia, "ESPERA_EN_CURSO", 0):
+            resp = self._scan(clave)
+
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(Asistencia.objects.filter(profesor=self.profesor).exists())
+
+    def test_lock_vencido_no_bloquea(self, _):
+        clave = uuid.uuid4().hex
+        path = reverse("api_scan_asistencia_sync")
+        IdempotenciaEnCurso.objects.create(
+            clave=idempotencia._clave_cache(self.user.pk, path, clave),
+            vence=timezone.now() - timedelta(seconds=1),
+        )
+
+        self.assertEqual(self._scan(clave).status_code, 201)
+        self.assertFalse(IdempotenciaEnCurso.objects.exists())
+
+
+@mock.patch.object(timezone, "localdate", return_value=date(2026, 3, 2))
+class RegistroDiaScanTests(TestCase):
+    def setUp(self):
+        registro_dia.invalidar_registro_dia()
+        self.addCleanup(registro_dia.invalidar_registro_dia)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profesor = Profesor.objects.create(
+                dni="44444444", apellidos="SALAS", nombres="Rita", condicion="N"
+            )
+        self.user = User.objects.create_user(username="scanner", password="x")
+        self.user.groups.add(Group.objects.create(name="SCANNER"))
+        self.client.force_login(self.user)
+
+    def _scan(self):
+        return self.client.post(
+            reverse("api_scan_asistencia_sync"),
+            data={"code": self.profesor.dni},
+            content_type="application/json",
+        )
+
+    def test_duplicado_sale_de_memoria(self, _):
+        self.assertEqual(self._scan().status_code, 201)
+
+        # sesión + usuario; grupos y ENTRADA salen de memoria/cache
+        with self.assertNumQueries(2):
+            resp = self._scan()
+        self.assertEqual(resp.json()["estado"], "DUPLICADO")
+
+    def test_borrar_entrada_permite_registrar_de_nuevo(self, _):
+        self._scan()
+        with self.captureOnCommitCallbacks(execute=True):
+            Asistencia.objects.filter(profesor=self.profesor).delete()
+
+        resp = self._scan()
+        self.assertEqual(resp.status_code, 201)
+
+
+@mock.patch.object(timezone, "now", return_value=datetime(2026, 3, 2, 13, 0, tzinfo=dt_timezone.utc))  # 8:00 Lima
+@mock.patch.object(timezone, "localdate", return_value=date(2026, 3, 2))
+class ScanLoteTests(TestCase):
+    def setUp(self):
+        calendario.invalidar_calendario()
+        registro_dia.invalidar_registro_dia()
+        self.addCleanup(registro_dia.invalidar_registro_dia)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ana, self.beto, self.caro = [
+                Profesor.objects.create(dni=dni, apellidos=ap, nombres="X", condicion="N")
+                for dni, ap in (("61111111", "ARIAS"), ("62222222", "BRAVO"), ("63333333", "CRUZ"))
+            ]
+        self.user = User.objects.create_user(username="kiosko", password="x")
+        self.user.groups.add(Group.objects.create(name="SCANNER"))
+        self.client.force_login(self.user)
+
+    def _lote(self, items):
+        return self.client.post(
+            reverse("api_scan_asistencia_batch"), data={"codes": items}, content_type="application/json"
+        )
+
+    def test_lote_mixto(self, *_):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self._lote([
+                self.ana.dni,
+                "123",
+                "69999999",
+                self.ana.dni,
+                {"code": self.beto.dni, "fecha_hora": "2026-03-02T07:50:00"},
+                {"code": self.caro.dni, "fecha_hora": "2026-03-02T07:00:00"},
+                "",
+            ])
+
+        self.assertEqual(resp.status_code, 200)
+        resultados = resp.json()["resultados"]
+        self.assertEqual(
+            [(r["status"], r["estado"]) for r in resultados],
+            [(201, "ASISTIO"), (400, "ERROR"), (404, "ERROR"), (200, "DUPLICADO"),
+             (201, "ASISTIO"), (400, "ERROR"), (400, "ERROR")],
+        )
+        self.assertEqual(resultados[5]["tipo_evento"], "HORA_INVALIDA")
+
+        # La lectura encolada conserva su hora; una de hace más de 15 minutos se rechaza
+        beto = Asistencia.objects.get(profesor=self.beto)
+        self.assertEqual(timezone.localtime(beto.fecha_hora).time(), time(7, 50))
+        self.assertFalse(Asistencia.objects.filter(profesor=self.caro).exists())
+        self.assertEqual(AsistenciaDiaria.objects.filter(estado="ASISTIO").count(), 2)
+
+    def test_hora_futura_se_limita_a_ahora(self, *_):
+        self._lote([{"code": self.ana.dni, "fecha_hora": "2026-03-02T09:30:00-05:00"}])
+        self.assertEqual(Asistencia.objects.get().fecha_hora, timezone.now())
+
+    def test_asistio_para_la_lectura_mas_temprana(self, *_):
+        resp = self._lote([self.ana.dni, {"code": self.ana.dni, "fecha_hora": "2026-03-02T07:55:00"}])
+
+        self.assertEqual([r["estado"] for r in resp.json()["resultados"]], ["DUPLICADO", "ASISTIO"])
+        self.assertEqual(timezone.localtime(Asistencia.objects.get().fecha_hora).time(), time(7, 55))
+
+    def test_segundo_lote_con_la_misma_hora_es_duplicado(self, *_):
+        primero = self._lote([self.ana.dni, self.beto.dni])
+        registro_dia.invalidar_registro_dia()
+        segundo = self._lote([self.ana.dni, self.beto.dni])
+
+        self.assertEqual([r["status"] for r in primero.json()["resultados"]], [201, 201])
+        self.assertEqual([r["estado"] for r in segundo.json()["resultados"]], ["DUPLICADO", "DUPLICADO"])
+        self.assertEqual(Asistencia.objects.count(), 2)
+
+    def test_fin_de_semana(self, localdate, _):
+        localdate.return_value = date(2026, 3, 7)
+        resp = self._lote([self.ana.dni])
+
+        self.assertEqual(resp.json()["resumen"], {"FIN_DE_SEMANA": 1})
+        self.assertFalse(Asistencia.objects.exists())
+
+    def test_dia_especial(self, *_):
+        with self.captureOnCommitCallbacks(execute=True):
+            DiaEspecial.objects.create(fecha=date(2026, 3, 2), tipo="FERIADO")
+        resp = self._lote([self.ana.dni, "69999999"])
+
+        self.assertEqual([r["estado"] for r in resp.json()["resultados"]], ["DIA_ESPECIAL", "ERROR"])
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class HistorialEnVivoTests(TestCase):
+    def setUp(self):
+        self.fecha = date(2026, 3, 2)
+        self.profesor = Profesor.objects.create(
+            dni="55555555", apellidos="TORRES", nombres="Iris", condicion="C"
+        )
+
+    def _eventos(self, trozos):
+        return [
+            json.loads(linea[len("data: "):])
+            for trozo in trozos
+            for linea in trozo.splitlines()
+            if linea.startswith("data: ")
+        ]
+
+    def test_sondeo_bd_desde_cursor(self):
+        asistencia = Asistencia.objects.create(profesor=self.profesor, fecha=self.fecha, tipo="E")
+
+        trozos = list(en_vivo.stream(self.fecha, cursor=0, duracion=0))
+        eventos = self._eventos(trozos)
+
+        self.assertEqual(
+            [(e["profesor_id"], e["estado_key"]) for e in eventos],
+            [(self.profesor.id, "ASISTIO")],
+        )
+        self.assertIn(f"id: {asistencia.id}\n", "".join(trozos))
+        # Fuera de la ventana bajo el cursor: no se vuelve a enviar
+        lejos = asistencia.id + en_vivo.VENTANA_IDS
+        self.assertEqual(self._eventos(en_vivo.stream(self.fecha, cursor=lejos, duracion=0)), [])
+
+    def test_sondeo_recupera_commit_fuera_de_orden(self):
+        otro = Profesor.objects.create(dni="55555556", apellidos="URIBE", nombres="Noe", condicion="C")
+        tardia = Asistencia.objects.create(profesor=self.profesor, fecha=self.fecha, tipo="E")
+        vista = Asistencia.objects.create(profesor=otro, fecha=self.fecha, tipo="E")
+
+        # El cursor ya pasó `vista` cuando `tardia` (id menor) se hizo visible
+        trozos = list(en_vivo.stream(self.fecha, cursor=vista.id, duracion=0))
+
+        self.assertEqual(
+            sorted(e["profesor_id"] for e in self._eventos(trozos)), sorted([self.profesor.id, otro.id])
+        )
+        self.assertIn(f"id: {tardia.id}\n", "".join(trozos))
+
+    def test_canal_en_memoria_envia_una_vez(self):
+        stream = en_vivo.stream(self.fecha, duracion=0.3, poll=60)
+        next(stream)  # retry
+        self.assertEqual(next(stream), ": ping\n\n")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            justificacion = Asistencia.objects.create(
+                profesor=self.profesor, fecha=self.fecha, tipo="J", motivo="DM"
+            )
+        (evento,) = self._eventos([next(stream)])
+        self.assertEqual(evento["estado_key"], "JUSTIFICADO")
+        self.assertEqual(evento["estado"], "JUSTIFICADO (Descanso médico)")
+
+        en_vivo.publicar(justificacion)
+        self.assertEqual(self._eventos(stream), [])
+
+    @override_settings(HISTORIAL_EN_VIVO=True)
+    @mock.patch.object(timezone, "localdate", return_value=date(2026, 3, 2))
+    def test_pagina_solo_lleva_sus_estados(self, _):
+        calendario.invalidar_calendario()
+        grupos.invalidar_grupos()
+        Profesor.objects.bulk_create([
+            Profesor(dni=f"5600{i:04d}", apellidos=f"ZETA {i:02d}", nombres="X", condicion="C")
+            for i in range(30)
+        ])
+        Asistencia.objects.create(profesor=self.profesor, fecha=self.fecha, tipo="E")
+        user = User.objects.create_user(username="revisor", password="x")
+        user.groups.add(Group.objects.create(name="HISTORIAL"))
+        self.client.force_login(user)
+
+        resp = self.client.get(reverse("historial_asistencias"), {"ps": "25"})
+
+        # 31 docentes, 25 por página: solo las 24 faltas de esta página, no el padrón
+        self.assertEqual(len(resp.context["en_vivo_estados"]), 24)
+        self.assertNotIn(self.profesor.id, resp.context["en_vivo_estados"])
+
+        resumen = self.client.get(resp.context["en_vivo_resumen_url"])
+        self.assertEqual((resumen.context["total_asist"], resumen.context["total_falto"]), (1, 30))
+
+
+@mock.patch.object(timezone, "localdate", return_value=date(2026, 3, 2))
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        registro_dia.invalidar_registro_dia()
+        self.addCleanup(registro_dia.invalidar_registro_dia)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profesor = Profesor.objects.create(
+                dni="66666666", apellidos="VEGA", nombres="Olga", condicion="N"
+            )
+        self.user = User.objects.create_user(username="scanner", password="x")
+        self.user.groups.add(Group.objects.create(name="SCANNER"))
+
+    def _scan(self):
+        self.client.force_login(self.user)
+        return self.client.post(
+            reverse("api_scan_asistencia_sync"),
+            data={"code": self.profesor.dni},
+            content_type="application/json",
+        )
+
+    def test_cabecera_por_etapa(self, _):
+        with override_settings(SERVER_TIMING=True):
+            resp = self._scan()
+
+        etapas = [parte.split(";")[0] for parte in resp["Server-Timing"].split(", ")]
+        self.assertEqual(
+            etapas, ["parse", "dni", "profesor", "calendario", "escritura", "json", "total"]
+        )
+
+    def test_apagado_no_emite_cabecera(self, _):
+        with override_settings(SERVER_TIMING=False):
+            resp = self._scan()
+        self.assertFalse(resp.has_header("Server-Timing"))
+
+
+class GruposCacheTests(TestCase):
+    def setUp(self):
+        grupos.invalidar_grupos()  # el cache de archivo sobrevive entre tests
+        self.user = User.objects.create_user(username="operador", password="x")
+        self.historial = Group.objects.create(name="HISTORIAL")
+
+    def _fresco(self):
+        # request.user es un objeto nuevo en cada request
+        return User.objects.get(pk=self.user.pk)
+
+    def test_segunda_lectura_sin_consultas(self):
+        self.user.groups.add(self.historial)
+        self.assertTrue(grupos.en_grupo(self._fresco(), "HISTORIAL"))
+
+        user = self._fresco()
+        with self.assertNumQueries(0):
+            self.assertTrue(grupos.en_grupo(user, "HISTORIAL", "JUSTIFICACIONES"))
+            self.assertFalse(grupos.en_grupo(user, "SCANNER"))
+
+    def test_m2m_changed_invalida(self):
+        self.assertFalse(grupos.en_grupo(self._fresco(), "HISTORIAL"))
+
+        self.historial.user_set.add(self.user)
+        self.assertTrue(grupos.en_grupo(self._fresco(), "HISTORIAL"))
+
+        self.historial.user_set.clear()
+        self.assertFalse(grupos.en_grupo(self._fresco(), "HISTORIAL"))
+
+
+class HistorialPorDiaTests(TestCase):
+    def setUp(self):
+        calendario.invalidar_calendario()
+        self.fecha = date(2026, 3, 2)
+        self.asistio, self.just, self.asist_j, self.falto = [
+            Profesor.objects.create(dni=f"7000000{i}", apellidos=ap, nombres="X", condicion=c)
+            for i, (ap, c) in enumerate([("ALVA", "N"), ("BRAVO", "C"), ("CASAS", "N"), ("DIAZ", "N")])
+        ]
+        Asistencia.objects.create(profesor=self.asistio, fecha=self.fecha, tipo="E")
+        Asistencia.objects.create(profesor=self.asistio, fecha=self.fecha, tipo="J", motivo="DM")
+        JustificacionAsistencia.objects.create(profesor=self.just, fecha=self.fecha, tipo="P")
+        Asistencia.objects.create(profesor=self.asist_j, fecha=self.fecha, tipo="J", motivo="DM")
+
+    def test_estados_y_conteos_en_dos_consultas(self):
+        calendario.dia_especial(self.fecha)  # año ya cargado
+
+        with self.assertNumQueries(2):
+            data = views._build_historial_por_dia(self.fecha, ps=25)
+
+        self.assertEqual(
+            [(r["profesor"].id, r["estado_key"]) for r in data["items"]],
+            [
+                (self.asistio.id, "ASISTIO"),
+                (self.just.id, "JUSTIFICADO"),
+                (self.asist_j.id, "JUSTIFICADO"),
+                (self.falto.id, "FALTO"),
+            ],
+        )
+        self.assertEqual(data["items"][1]["estado"], "JUSTIFICADO (Permiso)")
+        self.assertTrue(data["items"][0]["justificacion_existente"])
+        self.assertEqual(
+            data["resumen"],
+            {
+                "total": 4, "asistio": 1, "justificado": 2, "falto": 1, "especial": 0,
+                "registros_n": 3, "registros_c": 1,
+            },
+        )
+
+    def test_pagina_y_filtros(self):
+        data = views._build_historial_por_dia(self.fecha, condicion="N", ps=2, page=2)
+
+        self.assertEqual(data["paginator"].num_pages, 2)
+        self.assertEqual([r["profesor"].id for r in data["items"]], [self.falto.id])
+        self.assertEqual(data["resumen"]["total"], 3)
+
+        data = views._build_historial_por_dia(self.fecha, q="bravo")
+        self.assertEqual([r["profesor"].id for r in data["items"]], [self.just.id])
+
+    def test_api_keyset(self):
+        grupos.invalidar_grupos()
+        user = User.objects.create_user(username="tablero", password="x")
+        user.groups.add(Group.objects.create(name="HISTORIAL"))
+        self.client.force_login(user)
+        url = reverse("api_historial")
+
+        primera = self.client.get(url, {"fecha": self.fecha.isoformat(), "limit": 3}).json()
+        self.assertEqual(primera["resumen"]["falto"], 1)
+        self.assertEqual(
+            [(r["id"], r["estado_key"], r["motivo"]) for r in primera["items"]],
+            [(self.asistio.id, "ASISTIO", None), (self.just.id, "JUSTIFICADO", "P"), (self.asist_j.id, "JUSTIFICADO", "DM")],
+        )
+        self.assertEqual(primera["items"][0]["dni"], self.asistio.dni)
+
+        segunda = self.client.get(
+            url, {"fecha": self.fecha.isoformat(), "limit": 3, "cursor": primera["siguiente"]}
+        ).json()
+        self.assertIsNone(segunda["resumen"])
+        self.assertIsNone(segunda["siguiente"])
+        self.assertEqual([r["id"] for r in segunda["items"]], [self.falto.id])
+
+        self.assertEqual(self.client.get(url, {"cursor": "basura"}).status_code, 400)
+
+
+class AsistenciaDiariaTests(TestCase):
+    def setUp(self):
+        calendario.invalidar_calendario()
+        self.addCleanup(calendario.invalidar_calendario)
+        self.fecha = date(2026, 3, 3)
+        self.ana, self.luis = [
+            Profesor.objects.create(dni=f"8800000{i}", apellidos=ap, nombres="X", condicion="N")
+            for i, ap in enumerate(["ARCE", "LUNA"])
+        ]
+
+    def _estados(self):
+        return dict(
+            AsistenciaDiaria.objects.filter(fecha=self.fecha).values_list("profesor_id", "estado")
+        )
+
+    def test_signals_mantienen_el_estado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            entrada = Asistencia.objects.create(profesor=self.ana, fecha=self.fecha, tipo="E")
+            JustificacionAsistencia.objects.create(profesor=self.luis, fecha=self.fecha, tipo="DM")
+        self.assertEqual(self._estados(), {self.ana.id: "ASISTIO", self.luis.id: "JUSTIFICADO"})
+        self.assertTrue(AsistenciaDiaria.objects.get(profesor=self.luis).justificacion_oficial)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dia = DiaEspecial.objects.create(fecha=self.fecha, tipo="FERIADO")
+        self.assertEqual(set(self._estados().values()), {"DIA_ESPECIAL"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dia.delete()
+            entrada.delete()
+        self.assertEqual(self._estados(), {self.luis.id: "JUSTIFICADO"})
+
+    def test_comando_reconstruye_el_rango(self):
+        # bulk_create no dispara signals: la tabla queda desactualizada
+        Asistencia.objects.bulk_create([
+            Asistencia(profesor=self.ana, fecha=self.fecha, tipo="E"),
+            Asistencia(profesor=self.luis, fecha=self.fecha, tipo="J", motivo="P"),
+        ])
+        AsistenciaDiaria.objects.create(profesor=self.ana, fecha=date(2026, 3, 2), estado="ASISTIO")
+
+        call_command(
+            "recalcular_asistencia_diaria", desde="2026-03-01", hasta="2026-03-31", stdout=StringIO()
+        )
+
+        self.assertEqual(self._estados(), {self.ana.id: "ASISTIO", self.luis.id: "JUSTIFICADO"})
+        self.assertFalse(AsistenciaDiaria.objects.filter(fecha=date(2026, 3, 2)).exists())
+        self.assertEqual(
+            diaria.etiqueta_justificacion("P"),
+            "JUSTIFICADO (Permiso)",
+        )
+
+
+class BusquedaProfesorTests(TestCase):
+    def setUp(self):
+        roster.invalidar_roster()
+        self.addCleanup(roster.invalidar_roster)
+        self.profesor = Profesor.objects.create(
+            dni="90000001", codigo="A-17", apellidos="Núñez Peña", nombres="José", condicion="N"
+        )
+
+    def test_columna_normalizada_al_guardar(self):
+        self.assertEqual(self.profesor.busqueda, "90000001 A-17 NUNEZ PENA JOSE")
+
+        self.profesor.apellidos = "Ñahui"
+        self.profesor.save()
+        self.profesor.refresh_from_db()
+        self.assertEqual(self.profesor.busqueda, "90000001 A-17 NAHUI JOSE")
+
+    def test_sql_y_memoria_encuentran_lo_mismo(self):
+        for q in ("nunez", "NÚÑEZ", "pena jose", "a-17"):
+            with self.subTest(q=q):
+                self.assertEqual(
+                    list(Profesor.objects.filter(roster.filtro_profesores(q=q)).values_list("id", flat=True)),
+                    [self.profesor.id],
+                )
+                self.assertEqual([p.id for p in roster.filtrar_profesores(q=q)], [self.profesor.id])
+
+        self.assertFalse(Profesor.objects.filter(roster.filtro_profesores(q="perez")).exists())
+
+    def test_admin_busca_cada_palabra(self):
+        otro = Profesor.objects.create(dni="90000002", apellidos="García López", nombres="Ana", condicion="N")
+        modelo = ProfesorAdmin(Profesor, site)
+        for q in ("garcia ana", "ANA  lopez", "90000002"):
+            with self.subTest(q=q):
+                encontrados, _ = modelo.get_search_results(None, Profesor.objects.all(), q)
+                self.assertEqual(list(encontrados.values_list("id", flat=True)), [otro.id])
+
+        encontrados, _ = modelo.get_search_results(None, Profesor.objects.all(), "garcia jose")
+        self.assertFalse(encontrados.exists())
+
+
+class CalendarioTests(TestCase):
+    def setUp(self):
+        calendario.invalidar_calendario()
+        self.addCleanup(calendario.invalidar_calendario)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.feriado = DiaEspecial.objects.create(
+                fecha=date(2026, 3, 4), tipo="FERIADO", descripcion="Aniversario"
+            )
+            self.paro = DiaEspecial.objects.create(fecha=date(2026, 3, 5), tipo="PARO", activo=False)
+            DiaEspecial.objects.create(fecha=date(2027, 1, 1), tipo="FERIADO")
+
+    def _habiles(self, desde=date(2026, 3, 2), hasta=date(2026, 3, 8)):
+        return [d.day for d in calendario.dias_habiles(desde, hasta, excluir_especiales=True)]
+
+    def test_dia_especial_y_rango(self):
+        info = calendario.dia_especial(date(2026, 3, 4))
+
+        self.assertEqual((info.tipo, info.label), ("FERIADO", "Feriado - Aniversario"))
+        self.assertIsNone(calendario.dia_especial(date(2026, 3, 5)))  # inactivo
+        self.assertFalse(calendario.es_dia_especial(date(2026, 3, 3)))
+        self.assertEqual(
+            sorted(calendario.especiales_en_rango(date(2026, 3, 1), date(2027, 1, 31))),
+            [date(2026, 3, 4), date(2027, 1, 1)],
+        )
+
+    def test_dias_habiles(self):
+        # lunes 2 a domingo 8 de marzo
+        self.assertEqual([d.day for d in calendario.dias_habiles(date(2026, 3, 2), date(2026, 3, 8))], [2, 3, 4, 5, 6])
+        self.assertEqual(self._habiles(), [2, 3, 5, 6])
+        self.assertEqual(
+            calendario.contar_dias_habiles(date(2026, 3, 2), date(2026, 3, 8), excluir_especiales=True), 4
+        )
+        # cruza de año: el feriado del 1 de enero sale del año siguiente
+        self.assertEqual(
+            calendario.dias_habiles(date(2026, 12, 31), date(2027, 1, 4), excluir_especiales=True),
+            [date(2026, 12, 31), date(2027, 1, 4)],
+        )
+
+    def test_invalidacion_al_guardar_y_borrar(self):
+        self.assertEqual(self._habiles(), [2, 3, 5, 6])  # año cargado en memoria
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DiaEspecial.objects.create(fecha=date(2026, 3, 3), tipo="HUELGA")
+        self.assertEqual(calendario.dia_especial(date(2026, 3, 3)).tipo, "HUELGA")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.feriado.delete()
+        self.assertIsNone(calendario.dia_especial(date(2026, 3, 4)))
+        self.assertEqual(self._habiles(), [2, 4, 5, 6])
+
+    def test_invalidacion_por_acciones_admin(self):
+        self.assertEqual(self._habiles(), [2, 3, 5, 6])
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "x"))
+        url = reverse("admin:asistencias_diaespecial_changelist")
+
+        self.client.post(url, {"action": "desactivar_dias", "_selected_action": [self.feriado.id]})
+        self.assertIsNone(calendario.dia_especial(date(2026, 3, 4)))
+
+        self.client.post(url, {"action": "activar_dias", "_selected_action": [self.paro.id]})
+        self.assertEqual(calendario.dia_especial(date(2026, 3, 5)).tipo, "PARO")
+        self.assertEqual(self._habiles(), [2, 3, 4, 6])
+
+
+class RosterTests(TestCase):
+    def setUp(self):
+        roster.invalidar_roster()
+        self.addCleanup(roster.invalidar_roster)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profesor = Profesor.objects.create(
+                dni="71111111", apellidos="GARCIA", nombres="Lia", condicion="N"
+            )
+        # deja el padrón construido en memoria
+        self.assertEqual(roster.profesor_por_dni("71111111").apellidos, "GARCIA")
+
+    def test_guardar_se_ve_al_confirmar(self):
+        self.profesor.apellidos = "GALVEZ"
+        self.profesor.condicion = "C"
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.profesor.save()
+
+        self.assertEqual(roster.profesor_por_dni("71111111").apellidos, "GARCIA")
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(roster.profesor_por_dni("71111111").apellidos, "GALVEZ")
+        self.assertEqual([p.id for p in roster.filtrar_profesores(q="galvez")], [self.profesor.id])
+        self.assertEqual([p.id for p in roster.filtrar_profesores(condicion="C")], [self.profesor.id])
+        self.assertEqual(roster.filtrar_profesores(q="garcia"), [])
+
+    def test_borrar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profesor.delete()
+
+        self.assertIsNone(roster.profesor_por_dni("71111111"))
+        self.assertEqual(roster.filtrar_profesores(), [])
+
+    def test_accion_admin_update(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "x"))
+        resp = self.client.post(
+            reverse("admin:asistencias_profesor_changelist"),
+            {"action": "desactivar_profesores", "_selected_action": [self.profesor.id]},
+        )
+
+        self.assertEqual(resp.status_code, 302)
+        self.assertFalse(roster.profesor_por_dni("71111111").activo)
+        self.assertFalse(roster.filtrar_profesores(q="garcia")[0].activo)
+
+
+class HtmxParcialesTests(TestCase):
+    def setUp(self):
+        calendario.invalidar_calendario()
+        roster.invalidar_roster()
+        grupos.invalidar_grupos()
+        self.addCleanup(roster.invalidar_roster)
+        self.fecha = date(2026, 3, 2)
+        self.falto, self.otro = [
+            Profesor.objects.create(dni=f"8100000{i}", apellidos=ap, nombres="X", condicion="N")
+            for i, ap in enumerate(["ARCE", "BENITES"])
+        ]
+        user = User.objects.create_user(username="just", password="x")
+        user.groups.add(
+            Group.objects.create(name="HISTORIAL"), Group.objects.create(name="JUSTIFICACIONES")
+        )
+        self.client.force_login(user)
+
+    def _historial(self, **headers):
+        return self.client.get(
+            reverse("historial_asistencias"), {"fecha": self.fecha.isoformat()}, **headers
+        )
+
+    def test_historial_fragmento_solo_con_htmx(self):
+        completa = self._historial()
+        fragmento = self._historial(HTTP_HX_REQUEST="true")
+
+        self.assertContains(completa, "<html")
+        self.assertNotContains(fragmento, "<html")
+        self.assertContains(fragmento, 'id="historialTabla"')
+        self.assertContains(fragmento, 'id="historialResumen" hx-swap-oob="true"')
+        self.assertIn("HX-Request", fragmento["Vary"])
+        self.assertLess(len(fragmento.content), len(completa.content))
+
+    def test_justificar_desde_historial_devuelve_la_fila(self):
+        resp = self.client.post(
+            reverse("justificar_falta_historial"),
+            {"profesor_id": self.falto.id, "fecha": self.fecha.isoformat(), "tipo": "P", "numero": "1"},
+            HTTP_HX_REQUEST="true",
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, f'data-profesor="{self.falto.id}" data-estado="JUSTIFICADO"')
+        self.assertNotContains(resp, f'data-profesor="{self.otro.id}"')
+        self.assertNotContains(resp, 'id="historialTabla"')
+        self.assertContains(resp, 'id="kpiJust">1<')
+        self.assertTrue(JustificacionAsistencia.objects.filter(profesor=self.falto, fecha=self.fecha).exists())
+
+    def test_sin_fila_no_reemplaza(self):
+        resp = self.client.post(
+            reverse("justificar_falta_historial"),
+            {"profesor_id": self.falto.id, "fecha": "no-es-fecha"},
+            HTTP_HX_REQUEST="true",
+        )
+        self.assertEqual(resp["HX-Reswap"], "none")
+        self.assertContains(resp, "Fecha inválida.")
+
+    def test_panel_justificaciones_fila(self):
+        url = reverse("panel_justificaciones")
+        fragmento = self.client.get(url, {"fecha": self.fecha.isoformat()}, HTTP_HX_REQUEST="true")
+        self.assertNotContains(fragmento, "<html")
+        self.assertContains(fragmento, 'id="justTabla"')
+
+        resp = self.client.post(
+            reverse("set_justificacion"),
+            {"accion": "set", "profesor_id": self.falto.id, "fecha": self.fecha.isoformat(), "tipo": "C"},
+            HTTP_HX_REQUEST="true",
+        )
+        self.assertContains(resp, f'data-profesor="{self.falto.id}"')
+        self.assertContains(resp, "Justificación registrada")
+        self.assertNotContains(resp, f'data-profesor="{self.otro.id}"')
+        self.assertContains(resp, 'id="justResumen" hx-swap-oob="true"')
+
+    def test_justificar_varios(self):
+        Asistencia.objects.create(profesor=self.otro, fecha=self.fecha, tipo="E")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                reverse("justificar_varios"),
+                {
+                    "fecha": self.fecha.isoformat(),
+                    "tipo": "C",
+                    "detalle": "Comisión UGEL",
+                    "profesor_ids": [self.falto.id, self.otro.id, 999999],
+                },
+                HTTP_HX_REQUEST="true",
+            )
+
+        self.assertContains(resp, 'id="justTabla"')
+        self.assertContains(resp, "1 docente(s) justificado(s)")
+        self.assertContains(resp, "Omitidos 2")
+        just = JustificacionAsistencia.objects.get(fecha=self.fecha)
+        self.assertEqual((just.profesor_id, just.tipo, just.detalle), (self.falto.id, "C", "Comisión UGEL"))
+        self.assertTrue(Asistencia.objects.filter(profesor=self.falto, fecha=self.fecha, tipo="J").exists())
+        self.assertEqual(AsistenciaDiaria.objects.get(profesor=self.falto).estado, "JUSTIFICADO")
+
+    def test_exportar_excel_en_streaming(self):
+        resp = self.client.get(reverse("exportar_reporte_excel"), {"fecha": self.fecha.isoformat()})
+
+        self.assertTrue(resp.streaming)
+        self.assertIn('filename="reporte_asistencias_2026-03-02.xlsx"', resp["Content-Disposition"])
+
+        ws = load_workbook(BytesIO(b"".join(resp.streaming_content))).active
+        self.assertEqual(ws.freeze_panes, "A5")
+        self.assertEqual([c.value for c in ws[4]], ["DNI", "Código", "Docente", "Condición", "02/03/2026"])
+        filas = {r[0].value: r for r in ws.iter_rows(min_row=5)}
+        celda = filas[self.falto.dni][4]
+        self.assertEqual((celda.value, celda.style), ("FALTÓ", "rep_falto"))
+        self.assertEqual(filas[self.falto.dni][2].style, "rep_docente")
+
+
+@mock.patch.object(timezone, "localdate", return_value=date(2026, 3, 10))
+class DiaCerradoTests(TestCase):
+    def setUp(self):
+        calendario.invalidar_calendario()
+        roster.invalidar_roster()
+        grupos.invalidar_grupos()
+        self.fecha = date(2026, 3, 2)
+        self.profesor = Profesor.objects.create(dni="82000001", apellidos="CORNEJO", nombres="Ana", condicion="N")
+        user = User.objects.create_user(username="revisor", password="x")
+        user.groups.add(Group.objects.create(name="HISTORIAL"))
+        self.client.force_login(user)
+        self.url = reverse("historial_asistencias")
+        self.client.get(self.url)  # fija la cookie CSRF
+
+    def _get(self, fecha, **headers):
+        return self.client.get(self.url, {"fecha": fecha.isoformat()}, **headers)
+
+    def test_etag_304_y_pagina_en_cache(self, _):
+        resp = self._get(self.fecha)
+        etag = resp["ETag"]
+        self.assertIn("private", resp["Cache-Control"])
+
+        self.assertEqual(self._get(self.fecha, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with mock.patch.object(views, "_build_historial_por_dia") as build:
+            otra = self._get(self.fecha)
+        build.assert_not_called()
+        self.assertEqual(otra.content, resp.content)
+
+        Asistencia.objects.create(profesor=self.profesor, fecha=self.fecha, tipo="E")
+        self.assertNotEqual(self._get(self.fecha)["ETag"], etag)
+
+    def test_hoy_no_se_cachea(self, _):
+        self.assertFalse(self._get(date(2026, 3, 10)).has_header("ETag"))
+
+
+class MatrizAsistenciaTests(TestCase):
+    def setUp(self):
+        calendario.invalidar_calendario()
+        self.addCleanup(calendario.invalidar_calendario)
+        self.lunes = date(2026, 3, 2)
+        self.ana, self.luis = [
+            Profesor.objects.create(dni=f"8300000{i}", apellidos=ap, nombres="X", condicion="N")
+            for i, ap in enumerate(["ARCE", "LUNA"])
+        ]
+        entrada = timezone.make_aware(datetime(2026, 3, 2, 7, 45))
+        AsistenciaDiaria.objects.bulk_create([
+            AsistenciaDiaria(profesor=self.ana, fecha=self.lunes, estado="ASISTIO", primera_entrada=entrada),
+            AsistenciaDiaria(
+                profesor=self.luis, fecha=self.lunes, estado="JUSTIFICADO",
+                motivo="DM", justificacion_oficial=True,
+            ),
+        ])
+        DiaEspecial.objects.create(fecha=date(2026, 3, 4), tipo="FERIADO")
+        calendario.invalidar_calendario()
+
+    def test_estados_y_reducciones(self):
+        m = matriz.construir([self.ana.id, self.luis.id], self.lunes, date(2026, 3, 6))
+
+        self.assertEqual(m.estado.shape, (2, 5))
+        self.assertEqual(m.estado[:, 0].tolist(), [matriz.ASISTIO, matriz.JUSTIFICADO])
+        self.assertEqual(m.estado[:, 2].tolist(), [matriz.ESPECIAL, matriz.ESPECIAL])
+        self.assertEqual(m.hora(0, 0), "07:45")
+        self.assertIsNone(m.hora(1, 0))
+        self.assertTrue(m.oficial[1, 0])
+        self.assertEqual(m.motivos[(1, 0)], ("DM", ""))
+
+        totales = m.totales()
+        self.assertEqual(totales["falto"].tolist(), [3, 3])
+        self.assertEqual(m.evaluables().tolist(), [4, 4])
+        self.assertEqual(m.por_dia(matriz.ASISTIO).tolist(), [1, 0, 0, 0, 0])
+        self.assertEqual(
+            matriz.Matriz.porcentaje(totales["asistio"], m.evaluables()).tolist(), [25.0, 0.0]
+        )
+
+    def test_solo_dias_pedidos(self):
+        m = matriz.construir([self.luis.id], self.lunes, date(2026, 3, 6), dias=[date(2026, 3, 3)])
+        self.assertEqual(m.estado.tolist(), [[matriz.FALTO]])
+        self.assertEqual(m.motivos, {})
+
+
+class SubidaJustificacionTests(TestCase):
+    def setUp(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        ajustes = override_settings(
+            MEDIA_ROOT=carpeta,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        calendario.invalidar_calendario()
+        roster.invalidar_roster()
+        grupos.invalidar_grupos()
+        self.addCleanup(roster.invalidar_roster)
+
+        self.fecha = date(2026, 3, 2)
+        self.profesor = Profesor.objects.create(dni="84000001", apellidos="ARCE", nombres="X", condicion="N")
+        user = User.objects.create_user(username="subidas", password="x")
+        user.groups.add(Group.objects.create(name="JUSTIFICACIONES"))
+        self.client.force_login(user)
+
+    def _justificar(self):
+        pdf = SimpleUploadedFile("certificado.pdf", b"%PDF-1.4 prueba", content_type="application/pdf")
+        return self.client.post(
+            reverse("set_justificacion"),
+            {
+                "accion": "set",
+                "profesor_id": self.profesor.id,
+                "fecha": self.fecha.isoformat(),
+                "tipo": "DM",
+                "archivo": pdf,
+            },
+            HTTP_HX_REQUEST="true",
+        )
+
+    def test_pdf_queda_pendiente_y_el_worker_lo_sube(self):
+        resp = self._justificar()
+        self.assertContains(resp, "PDF en proceso")
+
+        just = JustificacionAsistencia.objects.get(profesor=self.profesor, fecha=self.fecha)
+        self.assertFalse(just.archivo)
+        self.assertEqual(just.archivo_estado, JustificacionAsistencia.ARCHIVO_PENDIENTE)
+        self.assertEqual(SubidaJustificacion.objects.count(), 1)
+
+        call_command("subir_justificaciones", una_vez=True, stdout=StringIO())
+
+        just.refresh_from_db()
+        self.assertEqual(just.archivo_estado, JustificacionAsistencia.ARCHIVO_LISTO)
+        self.assertTrue(just.archivo.name.startswith("justificaciones/"))
+        with just.archivo.open("rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1.4 prueba")
+        self.assertFalse(SubidaJustificacion.objects.exists())
+
+    def test_fallo_pospone_con_backoff_y_marca_error(self):
+        self._justificar()
+        self.assertEqual([subidas.espera(n) for n in (1, 2, 3)], [30, 60, 120])
+
+        with mock.patch(
+            "django.core.files.storage.FileSystemStorage.save", side_effect=OSError("sin red")
+        ):
+            r = subidas.procesar()
+            self.assertEqual((r["errores"], r["pendientes"]), (1, 1))
+            self.assertGreater(SubidaJustificacion.objects.get().siguiente_intento, timezone.now())
+            # Pospuesta: la siguiente pasada no la toca
+            self.assertEqual(subidas.procesar()["errores"], 0)
+
+            for _ in range(subidas.MAX_INTENTOS - 1):
+                SubidaJustificacion.objects.update(siguiente_intento=timezone.now())
+                subidas.procesar()
+
+        self.assertEqual(subidas.procesar()["pendientes"], 0)
+        just = JustificacionAsistencia.objects.get(profesor=self.profesor, fecha=self.fecha)
+        self.assertEqual(just.archivo_estado, JustificacionAsistencia.ARCHIVO_ERROR)
+        self.assertIn("sin red", SubidaJustificacion.objects.get().error)
+
+    def test_fallo_no_bloquea_al_resto_de_la_cola(self):
+        self._justificar()
+        just = JustificacionAsistencia.objects.get(profesor=self.profesor, fecha=self.fecha)
+        subidas.encolar([just], SimpleUploadedFile("otro.pdf", b"%PDF-1.4 otro"))
+
+        with mock.patch(
+            "django.core.files.storage.FileSystemStorage.save",
+            side_effect=[OSError("sin red"), "justificaciones/otro.pdf"],
+        ) as save:
+            r = subidas.procesar()
+
+        self.assertEqual((r["subidas"], r["errores"], save.call_count), (1, 1, 2))
+        just.refresh_from_db()
+        self.assertEqual(just.archivo.name, "justificaciones/otro.pdf")
+
+    def test_subida_directa_local(self):
+        ticket = self.client.post(reverse("ticket_subida_justificacion")).json()
+        self.assertTrue(ticket["local"])
+
+        pdf = SimpleUploadedFile("certificado.pdf", b"%PDF-1.4 directo", content_type="application/pdf")
+        subida = self.client.post(ticket["url"], {**ticket["campos"], "file": pdf})
+        nombre = subida.json()["public_id"]
+        self.assertTrue(nombre.startswith("justificaciones/"))
+
+        self.client.post(
+            reverse("set_justificacion"),
+            {
+                "accion": "set",
+                "profesor_id": self.profesor.id,
+                "fecha": self.fecha.isoformat(),
+                "tipo": "DM",
+                "archivo_ticket": ticket["ticket"],
+            },
+        )
+        just = JustificacionAsistencia.objects.get(profesor=self.profesor, fecha=self.fecha)
+        self.assertEqual(just.archivo.name, nombre)
+        self.assertEqual(just.archivo_estado, JustificacionAsistencia.ARCHIVO_LISTO)
+        self.assertFalse(SubidaJustificacion.objects.exists())
+
+        # El ticket no sirve para otro usuario ni para otra justificación
+        otro = User.objects.create_user(username="otro", password="x")
+        with self.assertRaises(ValueError):
+            subida_directa.leer(ticket["ticket"], otro)
+        with self.assertRaises(ValueError):
+            subida_directa.confirmar(ticket["ticket"], just.creado_por)
+
+    def test_subida_directa_rechaza_pdf_muy_pesado(self):
+        ticket = self.client.post(reverse("ticket_subida_justificacion")).json()
+        pdf = SimpleUploadedFile("certificado.pdf", b"%PDF-1.4 directo", content_type="application/pdf")
+        nombre = self.client.post(ticket["url"], {**ticket["campos"], "file": pdf}).json()["public_id"]
+
+        with mock.patch.object(subidas, "MAX_BYTES", 4):
+            with self.assertRaises(ValueError):
+                subida_directa.confirmar(ticket["ticket"], User.objects.get(username="subidas"))
+
+        # Lo rechazado no queda huérfano en el storage
+        self.assertFalse(JustificacionAsistencia._meta.get_field("archivo").storage.exists(nombre))
+
+    def test_urls_de_pdf_una_vez_por_nombre(self):
+        otro = Profesor.objects.create(dni="84000002", apellidos="BRAVO", nombres="X", condicion="N")
+        for p in (self.profesor, otro):
+            JustificacionAsistencia.objects.create(
+                profesor=p, fecha=self.fecha, archivo="justificaciones/2026/03/comun.pdf"
+            )
+
+        with mock.patch(
+            "django.core.files.storage.FileSystemStorage.url", return_value="/media/x.pdf"
+        ) as url:
+            lista = archivos.precargar(JustificacionAsistencia.objects.filter(fecha=self.fecha))
+            self.assertEqual([j.archivo_url for j in lista], ["/media/x.pdf", "/media/x.pdf"])
+        self.assertEqual(url.call_count, 1)
+
+    def test_rango_comparte_un_pdf(self):
+        Asistencia.objects.create(profesor=self.profesor, fecha=date(2026, 3, 3), tipo="E")
+        DiaEspecial.objects.create(fecha=date(2026, 3, 4), tipo="FERIADO")
+        JustificacionAsistencia.objects.create(profesor=self.profesor, fecha=date(2026, 3, 5), tipo="P")
+        calendario.invalidar_calendario()
+
+        pdf = SimpleUploadedFile("certificado.pdf", b"%PDF-1.4 rango", content_type="application/pdf")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("set_justificacion"),
+                {
+                    "accion": "set",
+                    "profesor_id": self.profesor.id,
+                    "fecha": "2026-03-02",
+                    "hasta": "2026-03-13",
+                    "tipo": "DM",
+                    "archivo": pdf,
+                },
+            )
+
+        nuevas = JustificacionAsistencia.objects.filter(profesor=self.profesor, tipo="DM")
+        self.assertEqual(nuevas.count(), 7)
+        self.assertEqual(Asistencia.objects.filter(profesor=self.profesor, tipo="J").count(), 7)
+        self.assertEqual(
+            AsistenciaDiaria.objects.filter(profesor=self.profesor, estado="JUSTIFICADO").count(), 8
+        )
+        subida = SubidaJustificacion.objects.get()
+        self.assertEqual(subida.justificaciones.count(), 7)
+
+        call_command("subir_justificaciones", una_vez=True, stdout=StringIO())
+        self.assertEqual(len({j.archivo.name for j in nuevas}), 1)
+
+        # Repetir el rango no duplica: todo sale como ya justificado / omitido
+        reporte = dict(
+            justificaciones.justificar_rango(
+                self.profesor, date(2026, 3, 2), date(2026, 3, 6), tipo="DM", detalle="", usuario=None
+            )
+        )
+        self.assertEqual(reporte[date(2026, 3, 3)], justificaciones.ASISTIO)
+        self.assertEqual(reporte[date(2026, 3, 4)], justificaciones.DIA_ESPECIAL)
+        self.assertEqual(
+            {reporte[date(2026, 3, d)] for d in (2, 5, 6)}, {justificaciones.YA_JUSTIFICADA}
+        )
+
+    def test_doble_envio_no_se_atribuye_filas_ajenas(self):
+        # J antigua sin JustificacionAsistencia: toma el motivo nuevo
+        Asistencia.objects.create(
+            profesor=self.profesor, fecha=self.fecha, tipo="J", motivo="O", detalle="antiguo"
+        )
+        pares = [(self.profesor.id, self.fecha)]
+        pdf = SimpleUploadedFile("certificado.pdf", b"%PDF-1.4 doble", content_type="application/pdf")
+
+        primero = justificaciones._aplicar(pares, tipo="DM", detalle="reposo", usuario=None, archivo=pdf)
+        segundo = justificaciones._aplicar(pares, tipo="DM", detalle="reposo", usuario=None, archivo=pdf)
+
+        self.assertEqual(list(primero.values()), [justificaciones.CREADA])
+        self.assertEqual(list(segundo.values()), [justificaciones.CONFLICTO])
+        self.assertEqual(SubidaJustificacion.objects.count(), 1)
+        j = Asistencia.objects.get(profesor=self.profesor, fecha=self.fecha, tipo="J")
+        self.assertEqual((j.motivo, j.detalle), ("DM", "reposo"))
@@ -0,0 +1,123 @@
+"""
+Server-Timing por etapa en las vistas de asistencias (opcional: SERVER_TIMING=1).
+
+ServerTimingMiddleware cuelga un Cronometro en request.tiempos; las vistas
+miden sus etapas con `with tiempos.de(request).etapa("consultas"): ...` y el
+middleware emite la cabecera Server-Timing (visible en DevTools > Network >
+Timing) y una línea de log por request.
+
+Desactivado, el middleware se quita de la cadena (MiddlewareNotUsed) y
+tiempos.de() devuelve un cronómetro nulo: cada etapa es un nullcontext
+compartido, sin llamadas al reloj ni asignaciones.
+"""
+import logging
+import re
+import time
+from contextlib import contextmanager, nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+ATRIBUTO = "tiempos"
+
+_NOMBRE_RE = re.compile(r"[^A-Za-z0-9_\-]")
+
+
+def activo() -> bool:
+    return bool(getattr(settings, "SERVER_TIMING", False))
+
+
+class Cronometro:
+    """Acumula milisegundos por etapa (en orden de aparición)."""
+    __slots__ = ("inicio", "etapas")
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+
+    def sumar(self, nombre, ms):
+        self.etapas[nombre] = self.etapas.get(nombre, 0.0) + ms
+
+    @contextmanager
+    def etapa(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sumar(nombre, (time.perf_counter() - t0) * 1000)
+
+    def total_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def cabecera(self, total_ms):
+        partes = [f"{_NOMBRE_RE.sub('_', n)};dur={ms:.1f}" for n, ms in self.etapas.items()]
+        partes.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(partes)
+
+
+class _CronometroNulo:
+    __slots__ = ()
+
+    _nulo = nullcontext()
+
+    def etapa(self, nombre):
+        return self._nulo
+
+    def sumar(self, nombre, ms):
+        pass
+
+
+NULO = _CronometroNulo()
+
+
+def de(request):
+    """Cronómetro del request (o el nulo si SERVER_TIMING está apagado)."""
+    return getattr(request, ATRIBUTO, NULO)
+
+
+class ServerTimingMiddleware:
+    """
+    Ponerlo primero en MIDDLEWARE para que `total` incluya al resto de la cadena.
+    ✅ sync y async (igual que ClearAxesUnlockAtMiddleware).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not activo():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        crono = Cronometro()
+        setattr(request, ATRIBUTO, crono)
+        response = self.get_response(request)
+        return self._emitir(request, response, crono)
+
+    async def __acall__(self, request):
+        crono = Cronometro()
+        setattr(request, ATRIBUTO, crono)
+        response = await self.get_response(request)
+        return self._emitir(request, response, crono)
+
+    def _emitir(self, request, response, crono):
+        # En streaming (SSE, descargas grandes) `total` es hasta el primer byte
+        total = crono.total_ms()
+        response["Server-Timing"] = crono.cabecera(total)
+        logger.info(
+            "SERVER_TIMING | method=%s path=%s status=%s total_ms=%.1f %s",
+            request.method,
+            request.path,
+            response.status_code,
+            total,
+            " ".join(f"{n}_ms={ms:.1f}" for n, ms in crono.etapas.items()),
+        )
+        return response
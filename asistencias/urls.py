@@ -8,12 +8,26 @@ urlpatterns = [
     path("seleccionar-grupo/", views.seleccionar_grupo, name="seleccionar_grupo"),
 
     # ✅ SCAN (solo grupo SCANNER)
-    path("scan/", views.scan_page, name="scan_page"),
-    path("api/scan/", views.api_scan_asistencia, name="api_scan_asistencia"),
+    path("scan/", views._segun_modo_scan(views.scan_page, views.scan_page_async), name="scan_page"),
+    path(
+        "api/scan/",
+        views._segun_modo_scan(views.api_scan_asistencia, views.api_scan_asistencia_async),
+        name="api_scan_asistencia",
+    ),
+    path("api/scan/sync/", views.api_scan_asistencia, name="api_scan_asistencia_sync"),
+    path("api/scan/async/", views.api_scan_asistencia_async, name="api_scan_asistencia_async"),
+    path("api/scan/batch/", views.api_scan_asistencia_batch, name="api_scan_asistencia_batch"),
 
     # ✅ HISTORIAL (solo grupo HISTORIAL)
     path("historial/", views.historial_asistencias, name="historial_asistencias"),
+    path(
+        "historial/en-vivo/",
+        views._segun_servidor(views.historial_en_vivo, views.historial_en_vivo_async),
+        name="historial_en_vivo",
+    ),
+    path("historial/resumen/", views.historial_resumen, name="historial_resumen"),
     path("historial/justificar/", views.justificar_falta_historial, name="justificar_falta_historial"),
+    path("api/historial/", views.api_historial, name="api_historial"),
     path("excel/", views.exportar_reporte_excel, name="exportar_reporte_excel"),
 
     # ✅ Registro manual por DNI (solo HISTORIAL)
@@ -22,6 +36,9 @@ urlpatterns = [
     # ✅ Justificaciones (solo grupo JUSTIFICACIONES)
     path("justificaciones/", views.panel_justificaciones, name="panel_justificaciones"),
     path("justificaciones/set/", views.set_justificacion, name="set_justificacion"),
+    path("justificaciones/varios/", views.justificar_varios, name="justificar_varios"),
+    path("justificaciones/ticket/", views.ticket_subida_justificacion, name="ticket_subida_justificacion"),
+    path("justificaciones/subida-local/", views.subida_local_justificacion, name="subida_local_justificacion"),
 
     # ✅ Cron privado
     path("trigger-reporte/", views.trigger_reporte_asistencia, name="trigger_reporte_asistencia"),
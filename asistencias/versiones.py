@@ -0,0 +1,28 @@
+"""
+Claves de versión compartidas entre workers (gunicorn).
+
+Cada proceso guarda sus datos en memoria junto con la versión con la que
+los construyó; basta comparar contra la versión del cache compartido para
+saber si otro worker los invalidó.
+"""
+import uuid
+
+from django.core.cache import cache
+
+_PREFIJO = "asistencias:version:"
+
+
+def get_version(nombre: str) -> str:
+    # Si la clave no existe (cache vacío o expulsada) se crea una nueva:
+    # todos los workers reconstruyen en el siguiente acceso.
+    return cache.get_or_set(f"{_PREFIJO}{nombre}", uuid.uuid4().hex, timeout=None)
+
+
+async def aget_version(nombre: str) -> str:
+    return await cache.aget_or_set(f"{_PREFIJO}{nombre}", uuid.uuid4().hex, timeout=None)
+
+
+def bump_version(nombre: str) -> str:
+    nueva = uuid.uuid4().hex
+    cache.set(f"{_PREFIJO}{nombre}", nueva, timeout=None)
+    return nueva
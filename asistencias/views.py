@@ -1,11 +1,16 @@
+import base64
 import json
 import logging
 import math
 import re
+import tempfile
+import uuid
 from datetime import datetime, time, timedelta
 from io import BytesIO, StringIO
+from urllib.parse import urlencode
 
 from PIL import Image as PILImage
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login as auth_login, logout
@@ -15,48 +20,49 @@ from django.contrib.staticfiles import finders
 from django.core.management import call_command
 from django.core.paginator import Paginator
 from django.db import IntegrityError, transaction
-from django.db.models import Min, Q
-from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.db.models import Case, Count, Exists, Max, OuterRef, Q, Subquery, Value, When
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils import timezone
-from django.utils.dateparse import parse_date
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt, csrf_protect, ensure_csrf_cookie
 from django.views.decorators.http import require_GET, require_POST
+from django_htmx.http import reswap
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.drawing.image import Image as XLImage
-from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.table import Table, TableStyleInfo
-from openpyxl.worksheet.worksheet import Worksheet
 
-from .models import Asistencia, JustificacionAsistencia, Profesor, DiaEspecial
+from .entradas import ainsertar_entrada, insertar_entrada, insertar_entradas
+from .idempotencia import idempotente
+from . import (
+    archivos, calendario, condicional, diaria, en_vivo, journal, justificaciones, matriz, registro_dia,
+    subida_directa, subidas, tiempos,
+)
+from .grupos import aen_grupo, en_grupo, grupos_de
+from .models import Asistencia, JustificacionAsistencia, Profesor
+from .roster import aprofesor_por_dni, filtrar_profesores, filtro_profesores, profesor_por_dni
 
 logger = logging.getLogger(__name__)
 
-try:
-    import cloudinary.uploader
-    CLOUDINARY_AVAILABLE = True
-except Exception:
-    CLOUDINARY_AVAILABLE = False
-
 
 # =========================================================
 # HELPERS DE ROLES
 # =========================================================
+# Los grupos salen de grupos.py (request + cache compartido), no de una consulta por chequeo
 def _in_group(group_name: str):
     def check(user):
-        return user.is_authenticated and (
-            user.is_superuser or user.groups.filter(name=group_name).exists()
-        )
+        return en_grupo(user, group_name)
     return check
 
 
 def _in_any_group(*group_names: str):
     def check(user):
-        return user.is_authenticated and (
-            user.is_superuser or user.groups.filter(name__in=list(group_names)).exists()
-        )
+        return en_grupo(user, *group_names)
     return check
 
 
@@ -85,8 +91,8 @@ def get_user_allowed_groups(user):
     if user.is_superuser:
         return list(GROUP_DESTINATIONS.keys())
 
-    user_groups = list(user.groups.values_list("name", flat=True))
-    return [g for g in user_groups if g in GROUP_DESTINATIONS]
+    user_groups = grupos_de(user)
+    return [g for g in GROUP_DESTINATIONS if g in user_groups]
 
 
 def _get_client_ip(request):
@@ -124,63 +130,25 @@ def _read_code_from_request(request) -> str:
     return (request.POST.get("code") or request.POST.get("dni") or "").strip()
 
 
-def _safe_file_url(file_field):
-    try:
-        if file_field:
-            return file_field.url
-    except Exception:
-        return None
-    return None
-
-
 # =========================================================
-# HELPERS DÍAS ESPECIALES
+# HELPERS HTMX
 # =========================================================
-def _dias_especiales_dict(fecha_inicio, fecha_fin):
-    qs = (
-        DiaEspecial.objects
-        .filter(activo=True, fecha__range=(fecha_inicio, fecha_fin))
-        .only("fecha", "tipo", "descripcion", "activo")
-        .order_by("-fecha")
-    )
-
-    out = {}
-    for d in qs:
-        try:
-            tipo_display = d.get_tipo_display()
-        except Exception:
-            tipo_display = (d.tipo or "").replace("_", " ").title()
-
-        descripcion = (d.descripcion or "").strip()
-        label = tipo_display
-        if descripcion:
-            label = f"{tipo_display} - {descripcion}"
-
-        out[d.fecha] = {
-            "tipo": d.tipo,
-            "tipo_display": tipo_display,
-            "descripcion": descripcion,
-            "label": label,
-        }
-    return out
-
-
-def _es_dia_especial(fecha):
-    return (
-        DiaEspecial.objects
-        .filter(fecha=fecha, activo=True)
-        .exists()
-    )
+def _es_fragmento(request):
+    """Pedido HTMX que espera solo el fragmento (una restauración de historial pide la página)."""
+    return bool(request.htmx) and not request.htmx.history_restore_request
 
 
-def _obtener_dia_especial(fecha):
-    return (
-        DiaEspecial.objects
-        .filter(fecha=fecha, activo=True)
-        .first()
-    )
+def _render_htmx(request, plantilla, plantilla_fragmento, contexto):
+    """Página completa o fragmento según el pedido; ambos en la misma URL (Vary: HX-Request)."""
+    response = render(request, plantilla_fragmento if _es_fragmento(request) else plantilla, contexto)
+    patch_vary_headers(response, ("HX-Request",))
+    return response
 
 
+# =========================================================
+# HELPERS DÍAS ESPECIALES
+# (consultas vía calendario.py: 0 queries tras la primera carga del año)
+# =========================================================
 def _tipo_display_dia_especial(dia_especial):
     try:
         return dia_especial.get_tipo_display()
@@ -289,153 +257,176 @@ def _aware_end_of_day(d):
     return timezone.make_aware(dt, tz)
 
 
-def _build_historial_rows_por_dia(fecha, q="", condicion=""):
-    profesores_qs = (
-        Profesor.objects.only("id", "dni", "codigo", "apellidos", "nombres", "condicion")
-        .order_by("apellidos", "nombres")
-    )
+_MOTIVOS_JUST = dict(JustificacionAsistencia.TIPO_CHOICES)
+_MOTIVOS_ASIST = dict(Asistencia.MOTIVOS)
 
-    if q:
-        profesores_qs = profesores_qs.filter(
-            Q(dni__icontains=q)
-            | Q(codigo__icontains=q)
-            | Q(apellidos__icontains=q)
-            | Q(nombres__icontains=q)
+
+def _historial_queryset(fecha, q="", condicion="", dia_especial=None):
+    """
+    Profesores filtrados con el estado del día (estado_key) resuelto en SQL:
+    ASISTIO > JUSTIFICADO > FALTO, o DIA_ESPECIAL para todos.
+    Mismo orden que el padrón, así el Paginator corta la página con LIMIT/OFFSET.
+    """
+    profesores = (
+        Profesor.objects
+        .filter(filtro_profesores(q=q, condicion=condicion))
+        .only("id", "dni", "codigo", "apellidos", "nombres", "condicion")
+        .order_by("apellidos", "nombres", "id")
+    )
+    if dia_especial:
+        return profesores.annotate(estado_key=Value("DIA_ESPECIAL"))
+
+    del_dia = {"profesor": OuterRef("pk"), "fecha": fecha}
+    return profesores.annotate(
+        estado_key=Case(
+            When(Exists(Asistencia.objects.filter(tipo="E", **del_dia)), then=Value("ASISTIO")),
+            When(
+                Exists(JustificacionAsistencia.objects.filter(**del_dia))
+                | Exists(Asistencia.objects.filter(tipo="J", **del_dia)),
+                then=Value("JUSTIFICADO"),
+            ),
+            default=Value("FALTO"),
         )
+    )
 
-    if condicion in ("N", "C"):
-        profesores_qs = profesores_qs.filter(condicion__iexact=condicion)
 
-    profesores = list(profesores_qs)
-    profesor_ids = [p.id for p in profesores]
+def _historial_con_detalle(profesores, fecha):
+    """Hora de ENTRADA y datos de la justificación; solo se evalúa para la página."""
+    del_dia = {"profesor": OuterRef("pk"), "fecha": fecha}
+    entrada = Asistencia.objects.filter(tipo="E", **del_dia).order_by("fecha_hora")
+    asist_j = Asistencia.objects.filter(tipo="J", **del_dia).order_by("fecha_hora")
+    just = JustificacionAsistencia.objects.filter(**del_dia)
+
+    return profesores.annotate(
+        entrada_hora=Subquery(entrada.values("fecha_hora")[:1]),
+        just_tipo=Subquery(just.values("tipo")[:1]),
+        just_detalle=Subquery(just.values("detalle")[:1]),
+        aj_hora=Subquery(asist_j.values("fecha_hora")[:1]),
+        aj_motivo=Subquery(asist_j.values("motivo")[:1]),
+        aj_detalle=Subquery(asist_j.values("detalle")[:1]),
+    )
 
-    dia_especial = _obtener_dia_especial(fecha)
 
-    asistencias = (
-        Asistencia.objects
-        .filter(profesor_id__in=profesor_ids, fecha=fecha, tipo="E")
-        .select_related("profesor")
-        .order_by("fecha_hora")
-    )
-    asistencia_map = {}
-    for a in asistencias:
-        if a.profesor_id not in asistencia_map:
-            asistencia_map[a.profesor_id] = a
-
-    justificaciones = (
-        JustificacionAsistencia.objects
-        .filter(profesor_id__in=profesor_ids, fecha=fecha)
-        .select_related("profesor")
+def _historial_resumen(profesores):
+    """Conteos por estado y por condición en un solo aggregate."""
+    return profesores.order_by().aggregate(
+        total=Count("pk"),
+        asistio=Count("pk", filter=Q(estado_key="ASISTIO")),
+        justificado=Count("pk", filter=Q(estado_key="JUSTIFICADO")),
+        falto=Count("pk", filter=Q(estado_key="FALTO")),
+        especial=Count("pk", filter=Q(estado_key="DIA_ESPECIAL")),
+        registros_n=Count("pk", filter=Q(condicion__iexact="N")),
+        registros_c=Count("pk", filter=Q(condicion__iexact="C")),
     )
-    just_map = {j.profesor_id: j for j in justificaciones}
 
-    asist_j = (
-        Asistencia.objects
-        .filter(profesor_id__in=profesor_ids, fecha=fecha, tipo="J")
-        .select_related("profesor")
-        .order_by("fecha_hora")
-    )
-    asist_j_map = {}
-    for j in asist_j:
-        if j.profesor_id not in asist_j_map:
-            asist_j_map[j.profesor_id] = j
 
-    rows = []
-    c_asistio = 0
-    c_just = 0
-    c_falto = 0
-    c_especial = 0
+def _fila_historial(profesor, fecha, dia_especial):
+    estado_key = profesor.estado_key
 
-    for profesor in profesores:
-        a = asistencia_map.get(profesor.id)
-        j = just_map.get(profesor.id)
-        aj = asist_j_map.get(profesor.id)
+    if estado_key == "DIA_ESPECIAL":
+        tipo_display = _tipo_display_dia_especial(dia_especial)
+        descripcion = (dia_especial.descripcion or "").strip()
 
-        if dia_especial:
-            tipo_display = _tipo_display_dia_especial(dia_especial)
-            descripcion = (dia_especial.descripcion or "").strip()
+        return {
+            "profesor": profesor,
+            "estado_key": "DIA_ESPECIAL",
+            "estado": tipo_display.upper(),
+            "detalle": descripcion or "Día especial institucional",
+            "fecha_hora": _aware_end_of_day(fecha),
+            "puede_justificar": False,
+            "justificacion_existente": False,
+            "es_dia_especial": True,
+        }
 
-            row = {
-                "profesor": profesor,
-                "estado_key": "DIA_ESPECIAL",
-                "estado": tipo_display.upper(),
-                "detalle": descripcion or "Día especial institucional",
-                "fecha_hora": _aware_end_of_day(fecha),
-                "puede_justificar": False,
-                "justificacion_existente": False,
-                "es_dia_especial": True,
-            }
-            c_especial += 1
+    tiene_just = profesor.just_tipo is not None
+    tiene_aj = profesor.aj_hora is not None
+
+    if estado_key == "ASISTIO":
+        return {
+            "profesor": profesor,
+            "estado_key": "ASISTIO",
+            "estado": "ASISTIÓ",
+            "detalle": "Asistencia registrada",
+            "fecha_hora": profesor.entrada_hora,
+            "puede_justificar": False,
+            "justificacion_existente": tiene_just or tiene_aj,
+            "es_dia_especial": False,
+        }
 
-        elif a:
-            row = {
-                "profesor": profesor,
-                "estado_key": "ASISTIO",
-                "estado": "ASISTIÓ",
-                "detalle": "Asistencia registrada",
-                "fecha_hora": a.fecha_hora,
-                "puede_justificar": False,
-                "justificacion_existente": bool(j or aj),
-                "es_dia_especial": False,
-            }
-            c_asistio += 1
+    if estado_key == "JUSTIFICADO":
+        if tiene_just:
+            motivo_label = _MOTIVOS_JUST.get(profesor.just_tipo) or (profesor.just_tipo or "").strip()
+            detalle = (profesor.just_detalle or "").strip()
+            fecha_hora = _aware_midnight(fecha)
+        else:
+            motivo_label = _MOTIVOS_ASIST.get(profesor.aj_motivo) or (profesor.aj_motivo or "").strip()
+            detalle = (profesor.aj_detalle or "").strip()
+            fecha_hora = profesor.aj_hora
+
+        return {
+            "profesor": profesor,
+            "estado_key": "JUSTIFICADO",
+            "estado": f"JUSTIFICADO ({motivo_label or 'Justificación'})",
+            "detalle": detalle or "Inasistencia justificada",
+            "fecha_hora": fecha_hora,
+            "puede_justificar": False,
+            "justificacion_existente": True,
+            "es_dia_especial": False,
+        }
 
-        elif j or aj:
-            motivo_label = "Justificación"
-            detalle = ""
+    return {
+        "profesor": profesor,
+        "estado_key": "FALTO",
+        "estado": "FALTÓ",
+        "detalle": "Sin asistencia ni justificación",
+        "fecha_hora": _aware_end_of_day(fecha),
+        "puede_justificar": True,
+        "justificacion_existente": False,
+        "es_dia_especial": False,
+    }
 
-            if j:
-                try:
-                    motivo_label = j.get_tipo_display()
-                except Exception:
-                    motivo_label = (j.tipo or "").strip() or "Justificación"
-                detalle = (j.detalle or "").strip()
-                fecha_hora = _aware_midnight(j.fecha)
-            else:
-                try:
-                    motivo_label = aj.get_motivo_display()
-                except Exception:
-                    motivo_label = (getattr(aj, "motivo", "") or "").strip() or "Justificación"
-                detalle = (getattr(aj, "detalle", "") or "").strip()
-                fecha_hora = aj.fecha_hora
-
-            row = {
-                "profesor": profesor,
-                "estado_key": "JUSTIFICADO",
-                "estado": f"JUSTIFICADO ({motivo_label})",
-                "detalle": detalle or "Inasistencia justificada",
-                "fecha_hora": fecha_hora,
-                "puede_justificar": False,
-                "justificacion_existente": True,
-                "es_dia_especial": False,
-            }
-            c_just += 1
 
-        else:
-            row = {
-                "profesor": profesor,
-                "estado_key": "FALTO",
-                "estado": "FALTÓ",
-                "detalle": "Sin asistencia ni justificación",
-                "fecha_hora": _aware_end_of_day(fecha),
-                "puede_justificar": True,
-                "justificacion_existente": False,
-                "es_dia_especial": False,
-            }
-            c_falto += 1
+def _contexto_resumen_historial(resumen):
+    return {
+        "total_registros": resumen["total"],
+        "total_asist": resumen["asistio"],
+        "total_just": resumen["justificado"],
+        "total_falto": resumen["falto"],
+        "total_especiales": resumen["especial"],
+        "docentes_unicos": resumen["total"],
+        "registros_n": resumen["registros_n"],
+        "registros_c": resumen["registros_c"],
+        "con_resumen": True,
+    }
+
+
+def _build_historial_por_dia(fecha, q="", condicion="", ps=25, page=1, crono=tiempos.NULO):
+    """
+    Conteos (1 aggregate) + página (1 SELECT con LIMIT/OFFSET): el costo de una
+    página de `ps` filas no depende del tamaño del padrón.
+    """
+    dia_especial = calendario.dia_especial(fecha)
+    profesores = _historial_queryset(fecha, q=q, condicion=condicion, dia_especial=dia_especial)
 
-        rows.append(row)
+    with crono.etapa("consultas"):
+        resumen = _historial_resumen(profesores)
+
+        pagina_qs = profesores if dia_especial else _historial_con_detalle(profesores, fecha)
+        paginator = Paginator(pagina_qs, ps)
+        paginator.count = resumen["total"]  # ya contado en el aggregate: sin SELECT COUNT(*)
+        page_obj = paginator.get_page(page)
+        profesores_pagina = list(page_obj.object_list)
+
+    with crono.etapa("clasificacion"):
+        items = [_fila_historial(p, fecha, dia_especial) for p in profesores_pagina]
+        page_obj.object_list = items
 
     return {
-        "rows": rows,
+        "items": items,
+        "page_obj": page_obj,
+        "paginator": paginator,
         "dia_especial": dia_especial,
-        "resumen": {
-            "asistio": c_asistio,
-            "justificado": c_just,
-            "falto": c_falto,
-            "especial": c_especial,
-            "total": len(rows),
-        },
+        "resumen": resumen,
     }
 
 
@@ -531,11 +522,7 @@ def historial_asistencias(request):
         fecha_just = (timezone.localdate() - timedelta(days=1)).strftime("%Y-%m-%d")
 
     puede_volver_just = (
-        request.user.is_authenticated
-        and (
-            request.user.is_superuser
-            or request.user.groups.filter(name="JUSTIFICACIONES").exists()
-        )
+        en_grupo(request.user, "JUSTIFICACIONES")
         and historial_origen == "justificaciones"
     )
 
@@ -546,59 +533,192 @@ def historial_asistencias(request):
 
     url_volver_just = f"{reverse('panel_justificaciones')}?fecha={fecha_just}"
 
-    data = _build_historial_rows_por_dia(
-        fecha=fecha,
-        q=q,
-        condicion=condicion,
-    )
+    def _construir():
+        crono = tiempos.de(request)
 
-    rows = data["rows"]
-    dia_especial = data["dia_especial"]
-    resumen = data["resumen"]
+        # ✅ Feed en vivo: solo para hoy (los días pasados ya no cambian por escaneo)
+        en_vivo_activo = (
+            en_vivo.activo()
+            and fecha == timezone.localdate()
+            and not calendario.es_dia_especial(fecha)
+        )
+        en_vivo_cursor = 0
+        if en_vivo_activo:
+            # Antes de contar: lo que se registre mientras tanto llega por el feed
+            with crono.etapa("consultas"):
+                en_vivo_cursor = Asistencia.objects.filter(fecha=fecha).aggregate(m=Max("id"))["m"] or 0
+
+        data = _build_historial_por_dia(
+            fecha=fecha,
+            q=q,
+            condicion=condicion,
+            ps=ps,
+            page=request.GET.get("page", "1"),
+            crono=crono,
+        )
+
+        items = data["items"]
+        page_obj = data["page_obj"]
+        paginator = data["paginator"]
+        dia_especial = data["dia_especial"]
+        resumen = data["resumen"]
+
+        can_justify_from_historial = en_grupo(request.user, "HISTORIAL", "JUSTIFICACIONES")
 
-    paginator = Paginator(rows, ps)
-    page_number = request.GET.get("page", "1")
-    page_obj = paginator.get_page(page_number)
-    items = list(page_obj.object_list)
+        en_vivo_estados = None
+        if en_vivo_activo:
+            # Solo las filas de esta página que aún pueden cambiar (ASISTIÓ ya es final);
+            # los contadores los recalcula el servidor (historial_resumen)
+            en_vivo_estados = {
+                a["profesor"].id: a["estado_key"] for a in items if a["estado_key"] != "ASISTIO"
+            }
+
+        # ✅ HTMX (filtros / página): solo tabla + contadores, sin cabecera ni estilos
+        with crono.etapa("render"):
+            return _render_htmx(
+                request,
+                "asistencias/historial.html",
+                "asistencias/partials/historial_htmx.html",
+                {
+                    "items": items,
+                    "page_obj": page_obj,
+                    "paginator": paginator,
+                    "pagina": page_obj.number,
+                    "q": q,
+                    "fecha": fecha,
+                    "condicion": condicion,
+                    "ps": ps,
+                    **_contexto_resumen_historial(resumen),
+                    "puede_volver_just": puede_volver_just,
+                    "fecha_just": fecha_just,
+                    "url_registro_manual": url_registro_manual,
+                    "url_volver_just": url_volver_just,
+                    "dia_especial": dia_especial,
+                    "can_justify_from_historial": can_justify_from_historial,
+                    "en_vivo": en_vivo_activo,
+                    "en_vivo_url": f"{reverse('historial_en_vivo')}?desde={en_vivo_cursor}",
+                    "en_vivo_estados": en_vivo_estados,
+                    "en_vivo_resumen_url": (
+                        f"{reverse('historial_resumen')}?"
+                        f"{urlencode({'q': q, 'condicion': condicion, 'ps': ps})}"
+                    ),
+                },
+            )
 
-    can_justify_from_historial = (
-        request.user.is_superuser
-        or request.user.groups.filter(name="HISTORIAL").exists()
-        or request.user.groups.filter(name="JUSTIFICACIONES").exists()
+    # ✅ Días cerrados: ETag (304) y página ya renderizada desde el cache
+    return condicional.responder(
+        request,
+        fecha,
+        (
+            "historial",
+            q,
+            condicion,
+            ps,
+            request.GET.get("page", "1"),
+            request.GET.get("fecha_desde", ""),
+            request.GET.get("fecha_hasta", ""),
+            historial_origen,
+            fecha_just,
+            _es_fragmento(request),
+        ),
+        _construir,
     )
 
+
+# =========================================================
+# HISTORIAL EN VIVO (Server-Sent Events)
+# =========================================================
+def _en_vivo_cursor(request):
+    """Last-Event-ID (reconexión de EventSource) o ?desde= del primer render."""
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("desde") or "0"
+    try:
+        return max(0, int(raw))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _en_vivo_response(contenido):
+    response = StreamingHttpResponse(contenido, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # sin buffer en el proxy
+    return response
+
+
+@require_GET
+@user_passes_test(_in_any_group("HISTORIAL", "JUSTIFICACIONES"), login_url="login")
+def historial_resumen(request):
+    """
+    HTMX: solo los contadores de hoy para los filtros de la vista (1 aggregate).
+    El feed en vivo los pide tras cada tanda de eventos en lugar de llevar el
+    estado de todo el padrón en la página.
+    """
+    q = (request.GET.get("q") or "").strip()
+    condicion = (request.GET.get("condicion") or "").strip().upper()
+    ps = (request.GET.get("ps") or "25").strip()
+    fecha = timezone.localdate()
+
+    dia_especial = calendario.dia_especial(fecha)
+    profesores = _historial_queryset(fecha, q=q, condicion=condicion, dia_especial=dia_especial)
     return render(
         request,
-        "asistencias/historial.html",
+        "asistencias/partials/historial_resumen.html",
         {
-            "items": items,
-            "page_obj": page_obj,
-            "paginator": paginator,
-            "q": q,
+            **_contexto_resumen_historial(_historial_resumen(profesores)),
             "fecha": fecha,
+            "q": q,
             "condicion": condicion,
-            "ps": ps,
-            "total_registros": resumen["total"],
-            "total_asist": resumen["asistio"],
-            "total_just": resumen["justificado"],
-            "total_falto": resumen["falto"],
-            "total_especiales": resumen["especial"],
-            "docentes_unicos": resumen["total"],
-            "registros_n": len([x for x in rows if (x["profesor"].condicion or "").upper() == "N"]),
-            "registros_c": len([x for x in rows if (x["profesor"].condicion or "").upper() == "C"]),
-            "puede_volver_just": puede_volver_just,
-            "fecha_just": fecha_just,
-            "url_registro_manual": url_registro_manual,
-            "url_volver_just": url_volver_just,
+            "ps": ps if ps in ("25", "50", "100") else "25",
             "dia_especial": dia_especial,
-            "can_justify_from_historial": can_justify_from_historial,
         },
     )
 
 
+@require_GET
+@user_passes_test(_in_any_group("HISTORIAL", "JUSTIFICACIONES"), login_url="login")
+def historial_en_vivo(request):
+    if not en_vivo.activo():
+        return HttpResponse(status=204)  # EventSource no reintenta con 204
+    return _en_vivo_response(en_vivo.stream(timezone.localdate(), _en_vivo_cursor(request)))
+
+
 # =========================================================
 # JUSTIFICAR FALTA DESDE HISTORIAL
 # =========================================================
+def _respuesta_fila_historial(request, profesor_id, fecha, q, condicion, ps, page, numero):
+    """
+    HTMX: solo la fila del docente, con los contadores y los mensajes fuera de
+    banda (1 aggregate + 1 SELECT de una fila). Sin fila que mostrar, no se
+    reemplaza nada y solo salen los mensajes.
+    """
+    contexto = {
+        "q": q,
+        "fecha": fecha,
+        "condicion": condicion,
+        "ps": ps,
+        "pagina": page,
+        "numero": numero,
+        "solo_fila": True,
+        "can_justify_from_historial": en_grupo(request.user, "HISTORIAL", "JUSTIFICACIONES"),
+    }
+
+    if fecha:
+        dia_especial = calendario.dia_especial(fecha)
+        profesores = _historial_queryset(fecha, q=q, condicion=condicion, dia_especial=dia_especial)
+        contexto.update(_contexto_resumen_historial(_historial_resumen(profesores)))
+        contexto["dia_especial"] = dia_especial
+
+        if str(profesor_id).isdigit():
+            qs = profesores if dia_especial else _historial_con_detalle(profesores, fecha)
+            profesor = qs.filter(pk=profesor_id).first()
+            if profesor is not None:
+                contexto["fila"] = _fila_historial(profesor, fecha, dia_especial)
+
+    response = render(request, "asistencias/partials/historial_htmx.html", contexto)
+    if "fila" not in contexto:
+        reswap(response, "none")
+    return response
+
+
 @require_POST
 @user_passes_test(_in_any_group("HISTORIAL", "JUSTIFICACIONES"), login_url="login")
 def justificar_falta_historial(request):
@@ -618,19 +738,35 @@ def justificar_falta_historial(request):
     )
 
     fecha = parse_date(fecha_str)
+
+    def _volver():
+        # ✅ HTMX: se reemplaza solo la fila; sin HTMX, redirect como siempre
+        if _es_fragmento(request):
+            return _respuesta_fila_historial(
+                request,
+                profesor_id,
+                fecha,
+                q,
+                condicion,
+                ps,
+                page,
+                (request.POST.get("numero") or "").strip(),
+            )
+        return redirect(redirect_url)
+
     if not fecha:
         messages.error(request, "Fecha inválida.")
-        return redirect(redirect_url)
+        return _volver()
 
-    if _es_dia_especial(fecha):
+    if calendario.es_dia_especial(fecha):
         messages.warning(request, "Ese día está marcado como día especial. No se requiere justificación.")
-        return redirect(redirect_url)
+        return _volver()
 
     try:
         profesor = Profesor.objects.get(id=profesor_id)
     except Profesor.DoesNotExist:
         messages.error(request, "Profesor no encontrado.")
-        return redirect(redirect_url)
+        return _volver()
 
     tipo_ok = tipo if tipo in ("DM", "C", "P", "O") else "DM"
     ip = _get_client_ip(request)
@@ -638,11 +774,11 @@ def justificar_falta_historial(request):
 
     if Asistencia.objects.filter(profesor=profesor, fecha=fecha, tipo="E").exists():
         messages.warning(request, "Ese docente ya tiene asistencia registrada en esa fecha.")
-        return redirect(redirect_url)
+        return _volver()
 
     if JustificacionAsistencia.objects.filter(profesor=profesor, fecha=fecha).exists():
         messages.warning(request, "Ese docente ya tiene justificación registrada en esa fecha.")
-        return redirect(redirect_url)
+        return _volver()
 
     try:
         with transaction.atomic():
@@ -670,20 +806,150 @@ def justificar_falta_historial(request):
             )
 
         messages.success(request, f"✅ Falta justificada correctamente para {profesor.apellidos}, {profesor.nombres}.")
-        return redirect(redirect_url)
+        return _volver()
 
     except IntegrityError:
         messages.warning(request, "Ya existía una justificación para ese docente en esa fecha.")
-        return redirect(redirect_url)
+        return _volver()
 
     except Exception as e:
         messages.error(request, f"Error guardando la justificación: {type(e).__name__} - {str(e)[:220]}")
-        return redirect(redirect_url)
+        return _volver()
+
+
+# =========================================================
+# API HISTORIAL (JSON, paginación keyset)
+# =========================================================
+API_HISTORIAL_LIMIT = 100
+API_HISTORIAL_LIMIT_MAX = 500
+
+
+def _cursor_historial(profesor):
+    """Cursor opaco: la última (apellidos, nombres, id) entregada."""
+    crudo = json.dumps([profesor.apellidos, profesor.nombres, profesor.id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _leer_cursor_historial(cursor):
+    """(apellidos, nombres, id) o ValueError si el cursor no es nuestro."""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        apellidos, nombres, pk = json.loads(crudo.decode("utf-8"))
+    except Exception as e:
+        raise ValueError("cursor inválido") from e
+    if not isinstance(apellidos, str) or not isinstance(nombres, str) or not isinstance(pk, int):
+        raise ValueError("cursor inválido")
+    return apellidos, nombres, pk
+
+
+def _despues_de(apellidos, nombres, pk):
+    """(apellidos, nombres, id) > cursor, en el mismo orden que _historial_queryset."""
+    return (
+        Q(apellidos__gt=apellidos)
+        | Q(apellidos=apellidos, nombres__gt=nombres)
+        | Q(apellidos=apellidos, nombres=nombres, id__gt=pk)
+    )
+
+
+def _hora_local(valor):
+    return timezone.localtime(valor).strftime("%H:%M") if valor else None
+
+
+def _fila_api_historial(profesor):
+    estado_key = profesor.estado_key
+    hora = None
+    motivo = None
+
+    if estado_key == "ASISTIO":
+        hora = _hora_local(profesor.entrada_hora)
+    elif estado_key == "JUSTIFICADO":
+        if profesor.just_tipo is not None:
+            motivo = profesor.just_tipo
+        else:
+            motivo = profesor.aj_motivo or None
+            hora = _hora_local(profesor.aj_hora)
+
+    return {
+        "id": profesor.id,
+        "dni": profesor.dni,
+        "nombre": f"{profesor.apellidos}, {profesor.nombres}",
+        "condicion": profesor.condicion,
+        "estado_key": estado_key,
+        "hora": hora,
+        "motivo": motivo,
+    }
+
+
+@require_GET
+@user_passes_test(_in_any_group("HISTORIAL", "JUSTIFICACIONES"), login_url="login")
+def api_historial(request):
+    """
+    Historial del día en JSON para tableros y clientes móviles.
+
+    Mismos filtros que historial_asistencias (fecha, q, condicion). Pagina por
+    keyset sobre (apellidos, nombres, id): `?cursor=` con el `siguiente` de la
+    respuesta anterior; cada página es un SELECT con WHERE + LIMIT que usa el
+    índice del orden, sin OFFSET ni COUNT(*). El `resumen` (1 aggregate) va
+    solo en la primera página.
+    """
+    q = (request.GET.get("q") or "").strip()
+    condicion = (request.GET.get("condicion") or "").strip().upper()
+    fecha_str = (request.GET.get("fecha") or "").strip()
+    cursor = (request.GET.get("cursor") or "").strip()
+
+    fecha = parse_date(fecha_str) if fecha_str else timezone.localdate()
+    if not fecha:
+        return JsonResponse({"ok": False, "msg": "Fecha inválida (usa YYYY-MM-DD)."}, status=400)
+
+    try:
+        limit = int(request.GET.get("limit") or API_HISTORIAL_LIMIT)
+    except ValueError:
+        limit = API_HISTORIAL_LIMIT
+    limit = max(1, min(limit, API_HISTORIAL_LIMIT_MAX))
+
+    crono = tiempos.de(request)
+    dia_especial = calendario.dia_especial(fecha)
+    profesores = _historial_queryset(fecha, q=q, condicion=condicion, dia_especial=dia_especial)
+
+    with crono.etapa("consultas"):
+        resumen = None
+        if cursor:
+            try:
+                pagina_qs = profesores.filter(_despues_de(*_leer_cursor_historial(cursor)))
+            except ValueError:
+                return JsonResponse({"ok": False, "msg": "Cursor inválido."}, status=400)
+        else:
+            pagina_qs = profesores
+            resumen = _historial_resumen(profesores)
+
+        if not dia_especial:
+            pagina_qs = _historial_con_detalle(pagina_qs, fecha)
+        pagina = list(pagina_qs[:limit + 1])
+
+    hay_mas = len(pagina) > limit
+    pagina = pagina[:limit]
+
+    body = {
+        "ok": True,
+        "fecha": fecha.isoformat(),
+        "dia_especial": (
+            {"tipo": dia_especial.tipo, "descripcion": (dia_especial.descripcion or "").strip()}
+            if dia_especial else None
+        ),
+        "resumen": resumen,
+        "siguiente": _cursor_historial(pagina[-1]) if hay_mas else None,
+        "items": [_fila_api_historial(p) for p in pagina],
+    }
+    with crono.etapa("json"):
+        return JsonResponse(body, json_dumps_params={"ensure_ascii": False})
 
 
 # =========================================================
 # EXCEL REPORTE GENERAL
 # =========================================================
+EXCEL_SPOOL_MAX = 8 * 1024 * 1024
+
+
 @user_passes_test(_in_any_group("HISTORIAL", "JUSTIFICACIONES"), login_url="login")
 def exportar_reporte_excel(request):
     q = (request.GET.get("q") or "").strip()
@@ -712,84 +978,23 @@ def exportar_reporte_excel(request):
     if desde > hasta:
         desde, hasta = hasta, desde
 
-    dias_rango = []
-    cur = desde
-    while cur <= hasta:
-        dias_rango.append(cur)
-        cur += timedelta(days=1)
-
-    dias_especiales = _dias_especiales_dict(desde, hasta)
-
-    profesores_qs = Profesor.objects.all().order_by("apellidos", "nombres")
-
-    if q:
-        profesores_qs = profesores_qs.filter(
-            Q(dni__icontains=q)
-            | Q(codigo__icontains=q)
-            | Q(apellidos__icontains=q)
-            | Q(nombres__icontains=q)
-        )
-
-    if condicion in ("N", "C"):
-        profesores_qs = profesores_qs.filter(condicion__iexact=condicion)
-
-    profesores = list(profesores_qs)
-    prof_ids = [p.id for p in profesores]
+    crono = tiempos.de(request)
 
-    entradas = (
-        Asistencia.objects.filter(
-            profesor_id__in=prof_ids,
-            fecha__range=(desde, hasta),
-            tipo="E",
-        )
-        .values("profesor_id", "fecha")
-        .annotate(primera_hora=Min("fecha_hora"))
-    )
-    entrada_map = {(x["profesor_id"], x["fecha"]): x["primera_hora"] for x in entradas}
-
-    justificados = (
-        JustificacionAsistencia.objects.filter(
-            profesor_id__in=prof_ids,
-            fecha__range=(desde, hasta),
-        )
-        .values("profesor_id", "fecha", "tipo", "detalle")
-    )
+    dias_rango = calendario.dias_rango(desde, hasta)
+    dias_especiales = calendario.especiales_en_rango(desde, hasta)
 
-    motivos_label = {
-        "DM": "Descanso médico",
-        "C": "Comisión / Encargo",
-        "P": "Permiso",
-        "O": "Otro",
-    }
+    profesores = filtrar_profesores(q=q, condicion=condicion)
 
-    just_map = {}
-    for j in justificados:
-        key = (j["profesor_id"], j["fecha"])
-        t = (j.get("tipo") or "").strip()
-        det = (j.get("detalle") or "").strip()
-        label = motivos_label.get(t, t or "Justificación")
-        just_map[key] = f"JUSTIFICADO ({label})" + (f" - {det}" if det else "")
-
-    asist_j = (
-        Asistencia.objects.filter(
-            profesor_id__in=prof_ids,
-            fecha__range=(desde, hasta),
-            tipo="J",
+    with crono.etapa("consultas"):
+        # ✅ 1 consulta: matriz profesor x día sobre el estado diario (matriz.py)
+        estados = matriz.construir(
+            [p.id for p in profesores], desde, hasta, dias=dias_rango, todos=not (q or condicion)
         )
-        .values("profesor_id", "fecha", "motivo", "detalle")
-    )
-
-    asist_j_map = {}
-    for a in asist_j:
-        key = (a["profesor_id"], a["fecha"])
-        mot = (a.get("motivo") or "").strip()
-        det = (a.get("detalle") or "").strip()
-        label = motivos_label.get(mot, mot or "Justificación")
-        asist_j_map[key] = f"JUSTIFICADO ({label})" + (f" - {det}" if det else "")
 
-    wb = Workbook()
-    ws: Worksheet = wb.active
-    ws.title = "Reporte Asistencias"
+    # ✅ write-only: cada fila se escribe al XML apenas se arma (no queda en memoria)
+    # y todas las celdas comparten estilos con nombre registrados una vez
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte Asistencias")
 
     navy = "7F1D1D"
     red = "B91C1C"
@@ -802,13 +1007,62 @@ def exportar_reporte_excel(request):
 
     thin = Side(style="thin", color="CBD5E1")
     border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
+    centrado = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    banda = PatternFill("solid", fgColor=gray_bg)
+
+    def estilo(nombre, **kwargs):
+        wb.add_named_style(NamedStyle(name=nombre, **kwargs))
+        return nombre
+
+    st_banda = estilo("rep_banda", fill=banda)
+    st_titulo = estilo(
+        "rep_titulo", font=Font(bold=True, size=16, color=navy), fill=banda, alignment=Alignment(vertical="center")
+    )
+    st_filtros = estilo(
+        "rep_filtros", font=Font(size=11, color="334155"), fill=banda, alignment=Alignment(vertical="center")
+    )
+    st_encabezado = estilo(
+        "rep_encabezado",
+        font=Font(bold=True, color=white),
+        fill=PatternFill("solid", fgColor=red),
+        border=border_all,
+        alignment=centrado,
+    )
+    st_celda = estilo("rep_celda", border=border_all, alignment=centrado)
+    st_docente = estilo(
+        "rep_docente", border=border_all, alignment=Alignment(horizontal="left", vertical="center", wrap_text=True)
+    )
+    # Color de cada celda de día según su código en la matriz
+    st_estado = {
+        codigo: estilo(f"rep_{nombre}", border=border_all, alignment=centrado, fill=PatternFill("solid", fgColor=color))
+        for codigo, nombre, color in (
+            (matriz.ASISTIO, "asistio", green_soft),
+            (matriz.JUSTIFICADO, "justificado", blue_soft),
+            (matriz.FALTO, "falto", red_soft),
+            (matriz.ESPECIAL, "especial", amber_soft),
+        )
+    }
+
+    def celda(valor, nombre_estilo):
+        c = WriteOnlyCell(ws, value=valor)
+        c.style = nombre_estilo
+        return c
 
     total_columns = 4 + len(dias_rango)
     last_col_letter = get_column_letter(total_columns)
 
-    for r in (1, 2):
-        for c in range(1, total_columns + 1):
-            ws.cell(row=r, column=c).fill = PatternFill("solid", fgColor=gray_bg)
+    # Dimensiones, paneles, merges e imagen van antes de la primera fila
+    ws.column_dimensions["A"].width = 14
+    ws.column_dimensions["B"].width = 14
+    ws.column_dimensions["C"].width = 38
+    ws.column_dimensions["D"].width = 14
+
+    for i in range(5, total_columns + 1):
+        ws.column_dimensions[get_column_letter(i)].width = 18
+
+    ws.freeze_panes = "A5"
+    ws.merged_cells.add(f"B1:{last_col_letter}1")
+    ws.merged_cells.add(f"B2:{last_col_letter}2")
 
     logo_path = finders.find("asistencias/img/uni_logo.png")
     if logo_path:
@@ -826,18 +1080,12 @@ def exportar_reporte_excel(request):
         ws.row_dimensions[1].height = 44
         ws.row_dimensions[2].height = 20
         ws.row_dimensions[3].height = 10
-        ws.column_dimensions["A"].width = 16
 
     if desde == hasta:
         titulo = f"REPORTE DE ASISTENCIAS — {desde.strftime('%d/%m/%Y')}"
     else:
         titulo = f"REPORTE DE ASISTENCIAS — {desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')}"
 
-    ws["B1"] = titulo
-    ws.merge_cells(f"B1:{last_col_letter}1")
-    ws["B1"].font = Font(bold=True, size=16, color=navy)
-    ws["B1"].alignment = Alignment(vertical="center")
-
     filtros_txt = []
     if q:
         filtros_txt.append(f"Búsqueda: {q}")
@@ -846,146 +1094,269 @@ def exportar_reporte_excel(request):
     filtros_txt.append(f"Rango: {desde.strftime('%Y-%m-%d')} a {hasta.strftime('%Y-%m-%d')}")
     filtros_txt.append(f"Docentes: {len(profesores)}")
 
-    ws["B2"] = " | ".join(filtros_txt)
-    ws.merge_cells(f"B2:{last_col_letter}2")
-    ws["B2"].font = Font(size=11, color="334155")
-    ws["B2"].alignment = Alignment(vertical="center")
-
+    relleno_banda = [celda(None, st_banda) for _ in range(total_columns - 2)]
+    ws.append([celda(None, st_banda), celda(titulo, st_titulo)] + relleno_banda)
+    ws.append([celda(None, st_banda), celda(" | ".join(filtros_txt), st_filtros)] + relleno_banda)
     ws.append([])
 
     headers = ["DNI", "Código", "Docente", "Condición"] + [d.strftime("%d/%m/%Y") for d in dias_rango]
-    ws.append(headers)
-    header_row = ws.max_row
-
-    header_fill = PatternFill("solid", fgColor=red)
-    header_font = Font(bold=True, color=white)
-
-    for col_idx in range(1, len(headers) + 1):
-        cell = ws.cell(row=header_row, column=col_idx)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = border_all
+    ws.append([celda(h, st_encabezado) for h in headers])
 
-    especiales_upper = {x["tipo_display"].upper() for x in dias_especiales.values()}
-
-    for p in profesores:
-        docente = f"{(p.apellidos or '').strip()}, {(p.nombres or '').strip()}".strip().strip(",")
-
-        fila = [
-            str(p.dni),
-            str(p.codigo or ""),
-            docente,
-            str((p.condicion or "").upper()),
-        ]
-
-        for dia in dias_rango:
-            key = (p.id, dia)
-            dt = entrada_map.get(key)
-            dia_especial = dias_especiales.get(dia)
-
-            if dia_especial:
-                valor = dia_especial["tipo_display"].upper()
-                if dia_especial.get("descripcion"):
-                    valor += f" - {dia_especial['descripcion']}"
-            elif dt:
-                valor = timezone.localtime(dt).strftime("%H:%M")
-            else:
-                jtxt = just_map.get(key) or asist_j_map.get(key)
-                if jtxt:
-                    valor = jtxt
-                else:
+    # Texto de cada columna especial (uno por día, no uno por celda)
+    texto_especial = []
+    for dia in dias_rango:
+        dia_especial = dias_especiales.get(dia)
+        valor = ""
+        if dia_especial:
+            valor = dia_especial.tipo_display.upper()
+            if dia_especial.descripcion:
+                valor += f" - {dia_especial.descripcion}"
+        texto_especial.append(valor)
+
+    with crono.etapa("clasificacion"):
+        for i, p in enumerate(profesores):
+            docente = f"{(p.apellidos or '').strip()}, {(p.nombres or '').strip()}".strip().strip(",")
+
+            fila = [
+                celda(str(p.dni), st_celda),
+                celda(str(p.codigo or ""), st_celda),
+                celda(docente, st_docente),
+                celda(str((p.condicion or "").upper()), st_celda),
+            ]
+
+            codigos = estados.estado[i].tolist()
+            minutos = estados.entrada[i].tolist()
+
+            for j, codigo in enumerate(codigos):
+                if codigo == matriz.ESPECIAL:
+                    valor = texto_especial[j]
+                elif codigo == matriz.FALTO:
                     valor = "FALTÓ"
+                elif codigo == matriz.ASISTIO:
+                    valor = matriz.HORAS[minutos[j]] if minutos[j] != matriz.SIN_ENTRADA else ""
+                else:
+                    valor = diaria.etiqueta_justificacion(*estados.motivos.get((i, j), ("", "")))
 
-            fila.append(valor)
-
-        ws.append(fila)
-
-        current_row = ws.max_row
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(row=current_row, column=col)
-            cell.border = border_all
-            cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-        ws.cell(row=current_row, column=3).alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
-
-        for idx in range(5, total_columns + 1):
-            val = str(ws.cell(row=current_row, column=idx).value or "").upper()
-
-            if val.startswith("JUSTIFICADO"):
-                ws.cell(row=current_row, column=idx).fill = PatternFill("solid", fgColor=blue_soft)
-            elif val == "FALTÓ":
-                ws.cell(row=current_row, column=idx).fill = PatternFill("solid", fgColor=red_soft)
-            elif any(val.startswith(es) for es in especiales_upper):
-                ws.cell(row=current_row, column=idx).fill = PatternFill("solid", fgColor=amber_soft)
-            elif val:
-                ws.cell(row=current_row, column=idx).fill = PatternFill("solid", fgColor=green_soft)
-
-    ws.freeze_panes = "A5"
-
-    ws.column_dimensions["A"].width = 14
-    ws.column_dimensions["B"].width = 14
-    ws.column_dimensions["C"].width = 38
-    ws.column_dimensions["D"].width = 14
+                fila.append(celda(valor, st_estado[codigo]))
 
-    for i in range(5, total_columns + 1):
-        ws.column_dimensions[get_column_letter(i)].width = 18
+            ws.append(fila)
 
     if desde == hasta:
         filename = f"reporte_asistencias_{desde.strftime('%Y-%m-%d')}.xlsx"
     else:
         filename = f"reporte_asistencias_{desde.strftime('%Y-%m-%d')}_a_{hasta.strftime('%Y-%m-%d')}.xlsx"
 
-    bio = BytesIO()
-    wb.save(bio)
-    bio.seek(0)
+    with crono.etapa("xlsx"):
+        # ✅ en memoria solo hasta EXCEL_SPOOL_MAX; más grande pasa a disco y se envía por chunks
+        salida = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX)
+        wb.save(salida)
+        salida.seek(0)
 
-    response = HttpResponse(
-        bio.getvalue(),
+    return FileResponse(
+        salida,
+        as_attachment=True,
+        filename=filename,
         content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return response
 
 
 # =========================================================
 # SCAN
 # =========================================================
-@ensure_csrf_cookie
-@user_passes_test(_in_group("SCANNER"), login_url="login")
-def scan_page(request):
-    return render(request, "asistencias/scan.html")
+def _payload_profesor(profesor):
+    return {
+        "dni": profesor.dni,
+        "codigo": profesor.codigo,
+        "apellidos": profesor.apellidos,
+        "nombres": profesor.nombres,
+        "condicion": profesor.condicion,
+        "nombre_completo": profesor.nombre_completo,
+        "genero": profesor.genero_voz,
+        "tratamiento": profesor.tratamiento_voz,
+    }
 
 
-@csrf_protect
-@require_POST
-@user_passes_test(_in_group("SCANNER"), login_url="login")
-def api_scan_asistencia(request):
-    try:
-        raw = _read_code_from_request(request)
-    except UnicodeDecodeError:
-        return JsonResponse(
-            {
-                "ok": False,
-                "estado": "ERROR",
-                "tipo_evento": "ENCODING_INVALIDO",
-                "msg": "Encoding inválido (UTF-8).",
-            },
-            status=400,
+def _payload_asistencia(asistencia):
+    return {
+        "id": asistencia.id,
+        "tipo": asistencia.tipo,
+        "fecha": str(asistencia.fecha),
+        "fecha_hora": asistencia.fecha_hora.isoformat() if asistencia.fecha_hora else "",
+    }
+
+
+def _scan_resultado_no_encontrado(dni):
+    return (
+        {
+            "ok": False,
+            "estado": "ERROR",
+            "tipo_evento": "PROFESOR_NO_ENCONTRADO",
+            "msg": "Profesor no encontrado.",
+            "dni": dni,
+            "profesor": {
+                "dni": dni,
+                "codigo": "",
+                "apellidos": "",
+                "nombres": "",
+                "condicion": "",
+                "nombre_completo": "",
+                "genero": "M",
+                "tratamiento": "profesor",
+            },
+        },
+        404,
+    )
+
+
+def _scan_resultado_fin_de_semana(payload_prof):
+    return (
+        {
+            "ok": False,
+            "estado": "FIN_DE_SEMANA",
+            "tipo_evento": "FIN_DE_SEMANA",
+            "accion": "ninguna",
+            "duplicado": False,
+            "msg": "No se registra asistencia sábados ni domingos.",
+            "detalle": "El escáner solo registra asistencias de lunes a viernes.",
+            "profesor": payload_prof,
+        },
+        400,
+    )
+
+
+def _scan_resultado_dia_especial(hoy, dia_especial, payload_prof):
+    tipo_display = _tipo_display_dia_especial(dia_especial)
+    descripcion = (dia_especial.descripcion or "").strip()
+
+    return (
+        {
+            "ok": False,
+            "estado": "DIA_ESPECIAL",
+            "tipo_evento": "DIA_ESPECIAL",
+            "accion": "ninguna",
+            "duplicado": False,
+            "msg": f"Hoy no se registra asistencia por día especial: {tipo_display}.",
+            "detalle": descripcion or "Día especial institucional.",
+            "profesor": payload_prof,
+            "dia_especial": {
+                "fecha": str(hoy),
+                "tipo": getattr(dia_especial, "tipo", ""),
+                "tipo_display": tipo_display,
+                "descripcion": descripcion,
+            },
+        },
+        400,
+    )
+
+
+def _scan_resultado_duplicado(profesor, payload_prof, asistencia_existente):
+    return (
+        {
+            "ok": True,
+            "estado": "DUPLICADO",
+            "tipo_evento": "ASISTENCIA_DUPLICADA",
+            "accion": "ninguna",
+            "duplicado": True,
+            "msg": f"Ya registró asistencia hoy: {profesor.apellidos} {profesor.nombres}.",
+            "detalle": "El docente ya cuenta con una entrada registrada en la fecha actual.",
+            "profesor": payload_prof,
+            "asistencia": _payload_asistencia(asistencia_existente),
+        },
+        200,
+    )
+
+
+def _scan_resultado_registrado(profesor, payload_prof, asistencia):
+    return (
+        {
+            "ok": True,
+            "estado": "ASISTIO",
+            "tipo_evento": "ASISTENCIA_REGISTRADA",
+            "accion": "asistencia",
+            "duplicado": False,
+            "msg": f"Asistencia registrada correctamente: {profesor.apellidos} {profesor.nombres}.",
+            "detalle": "Entrada registrada con éxito.",
+            "profesor": payload_prof,
+            "asistencia": _payload_asistencia(asistencia),
+        },
+        201,
+    )
+
+
+def _registrar_entrada_scan(**kwargs):
+    """
+    ✅ Si ya registró hoy (registro_dia en memoria): DUPLICADO sin transacción.
+    SCAN_JOURNAL=1: journal local + volcado en segundo plano (no espera a la BD).
+    Si no: ✅ 1 sola sentencia (INSERT ... ON CONFLICT DO NOTHING RETURNING).
+    """
+    existente = registro_dia.entrada(kwargs["profesor_id"], kwargs["fecha"])
+    if existente is not None:
+        return existente, False
+
+    if journal.activo():
+        return journal.registrar(**kwargs)
+
+    asistencia, creada = insertar_entrada(**kwargs)
+    registro_dia.anotar(asistencia)
+    return asistencia, creada
+
+
+async def _aregistrar_entrada_scan(**kwargs):
+    existente = await registro_dia.aentrada(kwargs["profesor_id"], kwargs["fecha"])
+    if existente is not None:
+        return existente, False
+
+    if journal.activo():
+        return await sync_to_async(journal.registrar)(**kwargs)
+
+    asistencia, creada = await ainsertar_entrada(**kwargs)
+    registro_dia.anotar(asistencia)
+    return asistencia, creada
+
+
+def _scan_json(crono, body, status):
+    with crono.etapa("json"):
+        return JsonResponse(body, status=status)
+
+
+@ensure_csrf_cookie
+@user_passes_test(_in_group("SCANNER"), login_url="login")
+def scan_page(request):
+    return render(request, "asistencias/scan.html")
+
+
+def _scan_leer_dni(request):
+    """
+    Lee y valida el DNI del request del escáner.
+    Devuelve (dni, None) o (None, (body, status)) con el error listo para responder.
+    """
+    crono = tiempos.de(request)
+    try:
+        with crono.etapa("parse"):
+            raw = _read_code_from_request(request)
+    except UnicodeDecodeError:
+        return None, (
+            {
+                "ok": False,
+                "estado": "ERROR",
+                "tipo_evento": "ENCODING_INVALIDO",
+                "msg": "Encoding inválido (UTF-8).",
+            },
+            400,
         )
     except json.JSONDecodeError:
-        return JsonResponse(
+        return None, (
             {
                 "ok": False,
                 "estado": "ERROR",
                 "tipo_evento": "JSON_INVALIDO",
                 "msg": "JSON inválido.",
             },
-            status=400,
+            400,
         )
     except Exception as e:
         logger.exception("Error leyendo request en api_scan_asistencia")
-        return JsonResponse(
+        return None, (
             {
                 "ok": False,
                 "estado": "ERROR",
@@ -993,23 +1364,24 @@ def api_scan_asistencia(request):
                 "msg": "Error leyendo el request.",
                 "detalle": str(e)[:180],
             },
-            status=400,
+            400,
         )
 
     if not raw:
-        return JsonResponse(
+        return None, (
             {
                 "ok": False,
                 "estado": "ERROR",
                 "tipo_evento": "CODIGO_VACIO",
                 "msg": "No llegó ningún código o DNI.",
             },
-            status=400,
+            400,
         )
 
-    dni = _extract_dni(raw)
+    with crono.etapa("dni"):
+        dni = _extract_dni(raw)
     if not (dni.isdigit() and len(dni) == 8):
-        return JsonResponse(
+        return None, (
             {
                 "ok": False,
                 "estado": "ERROR",
@@ -1017,49 +1389,37 @@ def api_scan_asistencia(request):
                 "msg": "DNI inválido (debe ser de 8 dígitos).",
                 "dni": dni or "",
             },
-            status=400,
+            400,
         )
 
-    try:
-        profesor = Profesor.objects.get(dni=dni)
-    except Profesor.DoesNotExist:
+    return dni, None
+
+
+@csrf_protect
+@require_POST
+@user_passes_test(_in_group("SCANNER"), login_url="login")
+@idempotente()
+def api_scan_asistencia(request):
+    crono = tiempos.de(request)
+
+    dni, error = _scan_leer_dni(request)
+    if error:
+        body, status = error
+        return _scan_json(crono, body, status)
+
+    with crono.etapa("profesor"):
+        profesor = profesor_por_dni(dni)
+    if profesor is None:
         logger.warning("Profesor no encontrado en escáner | dni=%s", dni)
-        return JsonResponse(
-            {
-                "ok": False,
-                "estado": "ERROR",
-                "tipo_evento": "PROFESOR_NO_ENCONTRADO",
-                "msg": "Profesor no encontrado.",
-                "dni": dni,
-                "profesor": {
-                    "dni": dni,
-                    "codigo": "",
-                    "apellidos": "",
-                    "nombres": "",
-                    "condicion": "",
-                    "nombre_completo": "",
-                    "genero": "M",
-                    "tratamiento": "profesor",
-                },
-            },
-            status=404,
-        )
+        body, status = _scan_resultado_no_encontrado(dni)
+        return _scan_json(crono, body, status)
 
     hoy = timezone.localdate()
     now = timezone.now()
     ip = _get_client_ip(request)
     ua = (request.META.get("HTTP_USER_AGENT") or "")[:255]
 
-    payload_prof = {
-        "dni": profesor.dni,
-        "codigo": profesor.codigo,
-        "apellidos": profesor.apellidos,
-        "nombres": profesor.nombres,
-        "condicion": profesor.condicion,
-        "nombre_completo": profesor.nombre_completo,
-        "genero": profesor.genero_voz,
-        "tratamiento": profesor.tratamiento_voz,
-    }
+    payload_prof = _payload_profesor(profesor)
 
     if hoy.weekday() in (5, 6):
         logger.info(
@@ -1069,25 +1429,12 @@ def api_scan_asistencia(request):
             request.user.username,
             ip,
         )
-        return JsonResponse(
-            {
-                "ok": False,
-                "estado": "FIN_DE_SEMANA",
-                "tipo_evento": "FIN_DE_SEMANA",
-                "accion": "ninguna",
-                "duplicado": False,
-                "msg": "No se registra asistencia sábados ni domingos.",
-                "detalle": "El escáner solo registra asistencias de lunes a viernes.",
-                "profesor": payload_prof,
-            },
-            status=400,
-        )
+        body, status = _scan_resultado_fin_de_semana(payload_prof)
+        return _scan_json(crono, body, status)
 
-    dia_especial = _obtener_dia_especial(hoy)
+    with crono.etapa("calendario"):
+        dia_especial = calendario.dia_especial(hoy)
     if dia_especial:
-        tipo_display = _tipo_display_dia_especial(dia_especial)
-        descripcion = (dia_especial.descripcion or "").strip()
-
         logger.info(
             "DIA_ESPECIAL escaner bloqueado | dni=%s fecha=%s tipo=%s user=%s ip=%s",
             dni,
@@ -1096,79 +1443,420 @@ def api_scan_asistencia(request):
             request.user.username,
             ip,
         )
+        body, status = _scan_resultado_dia_especial(hoy, dia_especial, payload_prof)
+        return _scan_json(crono, body, status)
 
+    with crono.etapa("escritura"):
+        asistencia, creada = _registrar_entrada_scan(
+            profesor_id=profesor.id,
+            fecha=hoy,
+            fecha_hora=now,
+            registrado_por_id=request.user.id,
+            ip=ip,
+            user_agent=ua,
+        )
+
+    if not creada:
+        logger.info(
+            "DUPLICADO asistencia | dni=%s fecha=%s user=%s ip=%s",
+            dni,
+            hoy,
+            request.user.username,
+            ip,
+        )
+
+        body, status = _scan_resultado_duplicado(profesor, payload_prof, asistencia)
+        return _scan_json(crono, body, status)
+
+    logger.info(
+        "OK asistencia registrada | dni=%s fecha=%s user=%s ip=%s",
+        dni,
+        hoy,
+        request.user.username,
+        ip,
+    )
+
+    body, status = _scan_resultado_registrado(profesor, payload_prof, asistencia)
+    return _scan_json(crono, body, status)
+
+
+# =========================================================
+# SCAN ASYNC (ASGI)
+# =========================================================
+def _ain_group(group_name: str):
+    """Versión async de _in_group (user_passes_test la awaitea)."""
+    async def check(user):
+        return await aen_grupo(user, group_name)
+    return check
+
+
+def _ain_any_group(*group_names: str):
+    async def check(user):
+        return await aen_grupo(user, *group_names)
+    return check
+
+
+@ensure_csrf_cookie
+@user_passes_test(_ain_group("SCANNER"), login_url="login")
+async def scan_page_async(request):
+    # El template usa request.user (carga perezosa, síncrona): render en un hilo
+    return await sync_to_async(render)(request, "asistencias/scan.html")
+
+
+@csrf_protect
+@require_POST
+@user_passes_test(_ain_group("SCANNER"), login_url="login")
+@idempotente()
+async def api_scan_asistencia_async(request):
+    """
+    Misma respuesta que api_scan_asistencia, sin bloquear el worker:
+    padrón y calendario salen de memoria y solo el INSERT toca la BD.
+    """
+    crono = tiempos.de(request)
+
+    dni, error = _scan_leer_dni(request)
+    if error:
+        body, status = error
+        return _scan_json(crono, body, status)
+
+    user = await request.auser()
+
+    with crono.etapa("profesor"):
+        profesor = await aprofesor_por_dni(dni)
+    if profesor is None:
+        logger.warning("Profesor no encontrado en escáner | dni=%s", dni)
+        body, status = _scan_resultado_no_encontrado(dni)
+        return _scan_json(crono, body, status)
+
+    hoy = timezone.localdate()
+    now = timezone.now()
+    ip = _get_client_ip(request)
+    ua = (request.META.get("HTTP_USER_AGENT") or "")[:255]
+
+    payload_prof = _payload_profesor(profesor)
+
+    if hoy.weekday() in (5, 6):
+        logger.info(
+            "FIN_DE_SEMANA escaner bloqueado | dni=%s fecha=%s user=%s ip=%s",
+            dni,
+            hoy,
+            user.username,
+            ip,
+        )
+        body, status = _scan_resultado_fin_de_semana(payload_prof)
+        return _scan_json(crono, body, status)
+
+    with crono.etapa("calendario"):
+        dia_especial = await calendario.adia_especial(hoy)
+    if dia_especial:
+        logger.info(
+            "DIA_ESPECIAL escaner bloqueado | dni=%s fecha=%s tipo=%s user=%s ip=%s",
+            dni,
+            hoy,
+            getattr(dia_especial, "tipo", ""),
+            user.username,
+            ip,
+        )
+        body, status = _scan_resultado_dia_especial(hoy, dia_especial, payload_prof)
+        return _scan_json(crono, body, status)
+
+    with crono.etapa("escritura"):
+        asistencia, creada = await _aregistrar_entrada_scan(
+            profesor_id=profesor.id,
+            fecha=hoy,
+            fecha_hora=now,
+            registrado_por_id=user.id,
+            ip=ip,
+            user_agent=ua,
+        )
+
+    if not creada:
+        logger.info(
+            "DUPLICADO asistencia | dni=%s fecha=%s user=%s ip=%s",
+            dni,
+            hoy,
+            user.username,
+            ip,
+        )
+        body, status = _scan_resultado_duplicado(profesor, payload_prof, asistencia)
+        return _scan_json(crono, body, status)
+
+    logger.info(
+        "OK asistencia registrada | dni=%s fecha=%s user=%s ip=%s",
+        dni,
+        hoy,
+        user.username,
+        ip,
+    )
+
+    body, status = _scan_resultado_registrado(profesor, payload_prof, asistencia)
+    return _scan_json(crono, body, status)
+
+
+def _segun_modo_scan(vista_sync, vista_async):
+    """Elige la vista de /scan/ y /api/scan/ según settings.SCAN_ASYNC."""
+    return vista_async if getattr(settings, "SCAN_ASYNC", False) else vista_sync
+
+
+@require_GET
+@user_passes_test(_ain_any_group("HISTORIAL", "JUSTIFICACIONES"), login_url="login")
+async def historial_en_vivo_async(request):
+    """Mismo feed que historial_en_vivo; la conexión abierta no ocupa un hilo."""
+    if not en_vivo.activo():
+        return HttpResponse(status=204)
+    return _en_vivo_response(en_vivo.astream(timezone.localdate(), _en_vivo_cursor(request)))
+
+
+def _segun_servidor(vista_sync, vista_async):
+    """Vista async solo bajo ASGI (settings.SERVER_MODE); en WSGI se usaría un event loop por request."""
+    return vista_async if getattr(settings, "SERVER_MODE", "wsgi") == "asgi" else vista_sync
+
+
+# =========================================================
+# SCAN POR LOTES (cola del kiosko)
+# =========================================================
+SCAN_BATCH_MAX_ITEMS = 200
+SCAN_BATCH_MAX_RETRASO = timedelta(minutes=15)  # cota de la hora de lectura enviada por el kiosko
+
+
+def _read_codes_from_request(request) -> list:
+    """
+    Acepta {"codes": [...]} o directamente [...].
+    Cada item puede ser un string o un objeto {"code": ...} / {"dni": ...},
+    opcionalmente con "fecha_hora" (ISO 8601) de cuando el kiosko leyó el código.
+    Devuelve [(code, fecha_hora_raw)].
+    """
+    body = (request.body or b"").decode("utf-8").strip()
+    if not body:
+        return []
+
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get("codes") or data.get("items") or []
+
+    if not isinstance(data, list):
+        raise ValueError("Se esperaba una lista de códigos.")
+
+    items = []
+    for item in data:
+        hora = ""
+        if isinstance(item, dict):
+            hora = str(item.get("fecha_hora") or "").strip()
+            item = item.get("code") or item.get("dni") or ""
+        items.append((str(item or "").strip(), hora))
+    return items
+
+
+def _hora_escaneo(valor, hoy, now):
+    """
+    Hora de la lectura (las encoladas por un corte breve se reenvían más tarde).
+    Sin valor: `now`. Solo se acepta hasta SCAN_BATCH_MAX_RETRASO antes de
+    recibir el lote y nunca después de `now`; None si es inválida.
+    """
+    if not valor:
+        return now
+    try:
+        fecha_hora = parse_datetime(valor)
+    except ValueError:
+        return None
+    if fecha_hora is None:
+        return None
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    fecha_hora = min(fecha_hora, now)
+    if timezone.localtime(fecha_hora).date() != hoy or now - fecha_hora > SCAN_BATCH_MAX_RETRASO:
+        return None
+    return fecha_hora
+
+
+@csrf_protect
+@require_POST
+@user_passes_test(_in_group("SCANNER"), login_url="login")
+def api_scan_asistencia_batch(request):
+    try:
+        items = _read_codes_from_request(request)
+    except UnicodeDecodeError:
         return JsonResponse(
             {
                 "ok": False,
-                "estado": "DIA_ESPECIAL",
-                "tipo_evento": "DIA_ESPECIAL",
-                "accion": "ninguna",
-                "duplicado": False,
-                "msg": f"Hoy no se registra asistencia por día especial: {tipo_display}.",
-                "detalle": descripcion or "Día especial institucional.",
-                "profesor": payload_prof,
-                "dia_especial": {
-                    "fecha": str(hoy),
-                    "tipo": getattr(dia_especial, "tipo", ""),
-                    "tipo_display": tipo_display,
-                    "descripcion": descripcion,
-                },
+                "estado": "ERROR",
+                "tipo_evento": "ENCODING_INVALIDO",
+                "msg": "Encoding inválido (UTF-8).",
+            },
+            status=400,
+        )
+    except json.JSONDecodeError:
+        return JsonResponse(
+            {
+                "ok": False,
+                "estado": "ERROR",
+                "tipo_evento": "JSON_INVALIDO",
+                "msg": "JSON inválido.",
+            },
+            status=400,
+        )
+    except ValueError as e:
+        return JsonResponse(
+            {
+                "ok": False,
+                "estado": "ERROR",
+                "tipo_evento": "REQUEST_INVALIDO",
+                "msg": "Error leyendo el request.",
+                "detalle": str(e)[:180],
             },
             status=400,
         )
 
-    with transaction.atomic():
-        qs = (
-            Asistencia.objects.select_for_update()
-            .filter(profesor=profesor, fecha=hoy, tipo="E")
-            .order_by("fecha_hora")
+    if not items:
+        return JsonResponse(
+            {
+                "ok": False,
+                "estado": "ERROR",
+                "tipo_evento": "CODIGO_VACIO",
+                "msg": "No llegó ningún código o DNI.",
+            },
+            status=400,
         )
 
-        if qs.exists():
-            asistencia_existente = qs.first()
+    if len(items) > SCAN_BATCH_MAX_ITEMS:
+        return JsonResponse(
+            {
+                "ok": False,
+                "estado": "ERROR",
+                "tipo_evento": "LOTE_DEMASIADO_GRANDE",
+                "msg": f"Máximo {SCAN_BATCH_MAX_ITEMS} códigos por lote.",
+            },
+            status=400,
+        )
 
-            logger.info(
-                "DUPLICADO asistencia | dni=%s fecha=%s user=%s ip=%s",
-                dni,
-                hoy,
-                request.user.username,
-                ip,
-            )
+    hoy = timezone.localdate()
+    now = timezone.now()
+    ip = _get_client_ip(request)
+    ua = (request.META.get("HTTP_USER_AGENT") or "")[:255]
+
+    dnis = [_extract_dni(raw) if raw else "" for raw, _ in items]
+    dnis_validos = {dni for dni in dnis if dni.isdigit() and len(dni) == 8}
+    horas = [_hora_escaneo(hora, hoy, now) for _, hora in items]
+
+    # ✅ padrón en memoria: 0 consultas para resolver el lote
+    profesores = {}
+    for dni in dnis_validos:
+        profesor = profesor_por_dni(dni)
+        if profesor is not None:
+            profesores[dni] = profesor
+
+    # ✅ chequeos del día: una vez por lote
+    es_fin_de_semana = hoy.weekday() in (5, 6)
+    dia_especial = None if es_fin_de_semana else calendario.dia_especial(hoy)
+    registrar = not es_fin_de_semana and not dia_especial
+
+    entradas_hoy = {}
+    creadas = set()
+    ganadoras = {}
+    if registrar and profesores:
+        # La lectura más temprana del lote es la que vale (y la que responde ASISTIO)
+        pedidas = {}
+        for idx, (dni, hora) in enumerate(zip(dnis, horas)):
+            profesor = profesores.get(dni)
+            if profesor is None or hora is None:
+                continue
+            if profesor.id not in pedidas or hora < pedidas[profesor.id]:
+                pedidas[profesor.id] = hora
+                ganadoras[profesor.id] = idx
+            if hora != now:
+                logger.info(
+                    "LOTE lectura diferida | dni=%s retraso=%ss user=%s ip=%s",
+                    dni,
+                    int((now - hora).total_seconds()),
+                    request.user.username,
+                    ip,
+                )
 
-            return JsonResponse(
+        registro = dict(registrado_por_id=request.user.id, ip=ip, user_agent=ua)
+        if journal.activo():
+            # SCAN_JOURNAL=1: mismo camino que el escaneo individual; la ENTRADA
+            # que aún está solo en el journal cuenta como DUPLICADO
+            escritas = journal.registrar_lote(hoy, pedidas, **registro)
+        else:
+            # ✅ ya registrados hoy (registro_dia en memoria) no van al INSERT
+            escritas = {}
+            for profesor_id in list(pedidas):
+                existente = registro_dia.entrada(profesor_id, hoy)
+                if existente is not None:
+                    escritas[profesor_id] = (existente, False)
+                    del pedidas[profesor_id]
+
+            # ✅ 1 INSERT ... RETURNING: "creada" sale de la sentencia, no de comparar horas
+            escritas.update(insertar_entradas(hoy, pedidas, **registro))
+
+        for profesor_id, (asistencia, creada) in escritas.items():
+            entradas_hoy[profesor_id] = registro_dia.anotar(asistencia)
+            if creada:
+                creadas.add(profesor_id)
+
+    resultados = []
+    resumen = {}
+
+    for idx, ((raw, _), dni) in enumerate(zip(items, dnis)):
+        if not raw:
+            body, status = (
+                {
+                    "ok": False,
+                    "estado": "ERROR",
+                    "tipo_evento": "CODIGO_VACIO",
+                    "msg": "No llegó ningún código o DNI.",
+                },
+                400,
+            )
+        elif dni not in dnis_validos:
+            body, status = (
                 {
-                    "ok": True,
-                    "estado": "DUPLICADO",
-                    "tipo_evento": "ASISTENCIA_DUPLICADA",
-                    "accion": "ninguna",
-                    "duplicado": True,
-                    "msg": f"Ya registró asistencia hoy: {profesor.apellidos} {profesor.nombres}.",
-                    "detalle": "El docente ya cuenta con una entrada registrada en la fecha actual.",
-                    "profesor": payload_prof,
-                    "asistencia": {
-                        "id": asistencia_existente.id,
-                        "tipo": asistencia_existente.tipo,
-                        "fecha": str(asistencia_existente.fecha),
-                        "fecha_hora": asistencia_existente.fecha_hora.isoformat() if asistencia_existente.fecha_hora else "",
-                    },
+                    "ok": False,
+                    "estado": "ERROR",
+                    "tipo_evento": "DNI_INVALIDO",
+                    "msg": "DNI inválido (debe ser de 8 dígitos).",
+                    "dni": dni or "",
+                },
+                400,
+            )
+        elif horas[idx] is None:
+            body, status = (
+                {
+                    "ok": False,
+                    "estado": "ERROR",
+                    "tipo_evento": "HORA_INVALIDA",
+                    "msg": "Hora de lectura inválida (de hoy y de los últimos 15 minutos).",
+                    "dni": dni,
                 },
-                status=200,
+                400,
             )
+        elif dni not in profesores:
+            body, status = _scan_resultado_no_encontrado(dni)
+        else:
+            profesor = profesores[dni]
+            payload_prof = _payload_profesor(profesor)
 
-        asistencia = Asistencia.objects.create(
-            profesor=profesor,
-            fecha=hoy,
-            fecha_hora=now,
-            tipo="E",
-            registrado_por=request.user,
-            ip=ip,
-            user_agent=ua,
-        )
+            if es_fin_de_semana:
+                body, status = _scan_resultado_fin_de_semana(payload_prof)
+            elif dia_especial:
+                body, status = _scan_resultado_dia_especial(hoy, dia_especial, payload_prof)
+            else:
+                asistencia = entradas_hoy[profesor.id]
+                creada = profesor.id in creadas and ganadoras.get(profesor.id) == idx
+
+                if creada:
+                    body, status = _scan_resultado_registrado(profesor, payload_prof, asistencia)
+                else:
+                    body, status = _scan_resultado_duplicado(profesor, payload_prof, asistencia)
+
+        resumen[body["estado"]] = resumen.get(body["estado"], 0) + 1
+        resultados.append({"index": idx, "code": raw, "status": status, **body})
 
     logger.info(
-        "OK asistencia registrada | dni=%s fecha=%s user=%s ip=%s",
-        dni,
+        "LOTE escaner procesado | items=%s fecha=%s resumen=%s user=%s ip=%s",
+        len(items),
         hoy,
+        resumen,
         request.user.username,
         ip,
     )
@@ -1176,21 +1864,12 @@ def api_scan_asistencia(request):
     return JsonResponse(
         {
             "ok": True,
-            "estado": "ASISTIO",
-            "tipo_evento": "ASISTENCIA_REGISTRADA",
-            "accion": "asistencia",
-            "duplicado": False,
-            "msg": f"Asistencia registrada correctamente: {profesor.apellidos} {profesor.nombres}.",
-            "detalle": "Entrada registrada con éxito.",
-            "profesor": payload_prof,
-            "asistencia": {
-                "id": asistencia.id,
-                "tipo": asistencia.tipo,
-                "fecha": str(asistencia.fecha),
-                "fecha_hora": asistencia.fecha_hora.isoformat(),
-            },
+            "fecha": str(hoy),
+            "total": len(resultados),
+            "resumen": resumen,
+            "resultados": resultados,
         },
-        status=201,
+        status=200,
     )
 
 # =========================================================
@@ -1215,7 +1894,12 @@ def trigger_reporte_asistencia(request):
 # =========================================================
 # REGISTRO MANUAL
 # =========================================================
+def _es_aceptar(request):
+    return (request.POST.get("accion") or "").strip().lower() == "aceptar"
+
+
 @user_passes_test(_in_any_group("HISTORIAL", "JUSTIFICACIONES"), login_url="login")
+@idempotente(solo_si=_es_aceptar)
 def registro_manual(request):
     origen = (
         request.GET.get("from")
@@ -1256,7 +1940,7 @@ def registro_manual(request):
             messages.error(request, "DNI inválido (debe tener 8 dígitos).")
             return _render()
 
-        profesor = Profesor.objects.filter(dni=dni).first()
+        profesor = profesor_por_dni(dni)
         if not profesor:
             messages.error(request, "No se encontró un docente con ese DNI.")
             return _render()
@@ -1266,6 +1950,8 @@ def registro_manual(request):
             {
                 "profesor": profesor,
                 "fecha_hora_str": ahora_local.strftime("%d/%m/%Y %H:%M:%S"),
+                # ✅ Un doble envío / reintento de "aceptar" repite la misma respuesta
+                "idempotency_key": uuid.uuid4().hex,
             }
         )
 
@@ -1276,26 +1962,26 @@ def registro_manual(request):
             messages.error(request, "DNI inválido.")
             return _volver_historial()
 
-        profesor = Profesor.objects.filter(dni=dni).first()
+        profesor = profesor_por_dni(dni)
         if not profesor:
             messages.error(request, "El docente no existe o no fue encontrado.")
             return _volver_historial()
 
         fecha = timezone.localdate()
 
-        if _es_dia_especial(fecha):
+        if calendario.es_dia_especial(fecha):
             messages.warning(request, "Hoy es un día especial institucional. No se registra asistencia.")
             return _volver_historial()
 
         ahora = timezone.now()
 
-        if Asistencia.objects.filter(profesor=profesor, fecha=fecha, tipo="E").exists():
+        if Asistencia.objects.filter(profesor_id=profesor.id, fecha=fecha, tipo="E").exists():
             messages.warning(request, "Ese docente ya tiene asistencia registrada hoy.")
             return _volver_historial()
 
         try:
             Asistencia.objects.create(
-                profesor=profesor,
+                profesor_id=profesor.id,
                 fecha=fecha,
                 fecha_hora=ahora,
                 tipo="E",
@@ -1317,41 +2003,14 @@ def registro_manual(request):
 # =========================================================
 # PANEL JUSTIFICACIONES
 # =========================================================
-@user_passes_test(_in_group("JUSTIFICACIONES"), login_url="login")
-@require_GET
-def panel_justificaciones(request):
-    hoy = timezone.localdate()
-
-    fecha_str = (request.GET.get("fecha") or "").strip()
-    q = (request.GET.get("q") or "").strip()
-
-    if not fecha_str:
-        fecha = hoy - timedelta(days=1)
-    else:
-        fecha = parse_date(fecha_str) or hoy
-
-    request.session["just_fecha"] = fecha.strftime("%Y-%m-%d")
-
-    dia_especial = (
-        DiaEspecial.objects
-        .filter(fecha=fecha, activo=True)
-        .first()
-    )
-
-    profesores_qs = (
-        Profesor.objects.only("id", "dni", "codigo", "apellidos", "nombres", "condicion")
-        .order_by("apellidos", "nombres")
-    )
-
-    if q:
-        profesores_qs = profesores_qs.filter(
-            Q(dni__icontains=q)
-            | Q(codigo__icontains=q)
-            | Q(apellidos__icontains=q)
-            | Q(nombres__icontains=q)
-        )
+def _build_panel_justificaciones(fecha, q="", profesor_id=None):
+    """
+    Filas y conteos del panel. Con `profesor_id` solo se arma esa fila (HTMX
+    tras justificar); los conteos siempre cubren todo el filtro.
+    """
+    dia_especial = calendario.dia_especial(fecha)
 
-    profesores = list(profesores_qs)
+    profesores = filtrar_profesores(q=q)
 
     asist_ids = set(
         Asistencia.objects.filter(fecha=fecha, tipo="E").values_list("profesor_id", flat=True)
@@ -1365,6 +2024,7 @@ def panel_justificaciones(request):
             "tipo",
             "detalle",
             "archivo",
+            "archivo_estado",
         )
         .filter(fecha=fecha)
     )
@@ -1372,21 +2032,29 @@ def panel_justificaciones(request):
     just_map = {j.profesor_id: j for j in just_qs}
 
     rows = []
+    mostradas = []
     c_asistio = 0
     c_just = 0
     c_falto = 0
     c_especial = 0
 
     for profesor in profesores:
+        armar = profesor_id is None or profesor.id == profesor_id
+
         if profesor.id in asist_ids:
+            c_asistio += 1
+            if not armar:
+                continue
             estado_key = "ASISTIO"
             estado = "ASISTIÓ"
             estado_detalle = "Asistencia registrada"
             justificacion_info = None
-            c_asistio += 1
         else:
             j = just_map.get(profesor.id)
             if j:
+                c_just += 1
+                if not armar:
+                    continue
                 tipo_label = j.get_tipo_display() if hasattr(j, "get_tipo_display") else (j.tipo or "")
                 estado_key = "JUSTIFICADO"
                 estado = f"JUSTIFICADO ({tipo_label})"
@@ -1396,10 +2064,14 @@ def panel_justificaciones(request):
                     "tipo": j.tipo,
                     "tipo_label": tipo_label,
                     "detalle": j.detalle or "",
-                    "archivo_url": _safe_file_url(j.archivo),
+                    "archivo_url": "",
+                    "archivo_estado": j.archivo_estado,
                 }
-                c_just += 1
+                mostradas.append((j, justificacion_info))
             elif dia_especial:
+                c_especial += 1
+                if not armar:
+                    continue
                 tipo_display = _tipo_display_dia_especial(dia_especial)
                 descripcion = (dia_especial.descripcion or "").strip()
 
@@ -1407,13 +2079,14 @@ def panel_justificaciones(request):
                 estado = tipo_display.upper()
                 estado_detalle = descripcion or "Día especial institucional"
                 justificacion_info = None
-                c_especial += 1
             else:
+                c_falto += 1
+                if not armar:
+                    continue
                 estado_key = "FALTO"
                 estado = "FALTÓ"
                 estado_detalle = "Sin asistencia ni justificación"
                 justificacion_info = None
-                c_falto += 1
 
         rows.append(
             {
@@ -1426,35 +2099,126 @@ def panel_justificaciones(request):
             }
         )
 
-    can_historial = (
-        request.user.is_superuser
-        or request.user.groups.filter(name="HISTORIAL").exists()
-        or request.user.groups.filter(name="JUSTIFICACIONES").exists()
-    )
+    # ✅ URLs de los PDF: una por nombre distinto, solo para las filas armadas
+    archivos.precargar(j for j, _ in mostradas)
+    for j, info in mostradas:
+        info["archivo_url"] = j.archivo_url
+
+    resumen = {
+        "asistio": c_asistio,
+        "justificado": c_just,
+        "falto": c_falto,
+        "especial": c_especial,
+        "total": c_asistio + c_just + c_falto + c_especial,
+    }
+    return rows, resumen, dia_especial
 
-    return render(
-        request,
-        "asistencias/justificaciones.html",
-        {
-            "fecha": fecha,
-            "q": q,
-            "rows": rows,
-            "can_historial": can_historial,
-            "dia_especial": dia_especial,
-            "resumen": {
-                "asistio": c_asistio,
-                "justificado": c_just,
-                "falto": c_falto,
-                "especial": c_especial,
-                "total": c_asistio + c_just + c_falto + c_especial,
+
+@user_passes_test(_in_group("JUSTIFICACIONES"), login_url="login")
+@require_GET
+def panel_justificaciones(request):
+    hoy = timezone.localdate()
+
+    fecha_str = (request.GET.get("fecha") or "").strip()
+    q = (request.GET.get("q") or "").strip()
+
+    if not fecha_str:
+        fecha = hoy - timedelta(days=1)
+    else:
+        fecha = parse_date(fecha_str) or hoy
+
+    request.session["just_fecha"] = fecha.strftime("%Y-%m-%d")
+
+    def _construir():
+        rows, resumen, dia_especial = _build_panel_justificaciones(fecha, q=q)
+
+        can_historial = en_grupo(request.user, "HISTORIAL", "JUSTIFICACIONES")
+
+        # ✅ HTMX (filtro): solo tabla + contadores
+        return _render_htmx(
+            request,
+            "asistencias/justificaciones.html",
+            "asistencias/partials/justificaciones_htmx.html",
+            {
+                "fecha": fecha,
+                "q": q,
+                "rows": rows,
+                "can_historial": can_historial,
+                "dia_especial": dia_especial,
+                "resumen": resumen,
             },
-        },
+        )
+
+    # ✅ Días cerrados (el panel abre en "ayer"): ETag (304) y página desde el cache
+    return condicional.responder(
+        request, fecha, ("justificaciones", q, _es_fragmento(request)), _construir
     )
 
 
+def _respuesta_fila_justificacion(request, profesor_id, fecha, q):
+    """
+    HTMX: solo la fila del docente, con los contadores y los mensajes fuera de
+    banda. Sin fila que mostrar, no se reemplaza nada y solo salen los mensajes.
+    """
+    contexto = {"fecha": fecha, "q": q, "solo_fila": True}
+
+    if fecha:
+        pid = int(profesor_id) if str(profesor_id).isdigit() else 0  # 0: ninguna fila, solo conteos
+        rows, resumen, dia_especial = _build_panel_justificaciones(fecha, q=q, profesor_id=pid)
+        contexto.update(resumen=resumen, dia_especial=dia_especial)
+        if rows:
+            contexto["fila"] = rows[0]
+
+    response = render(request, "asistencias/partials/justificaciones_htmx.html", contexto)
+    if "fila" not in contexto:
+        reswap(response, "none")
+    return response
+
+
 # =========================================================
 # SET JUSTIFICACIÓN
 # =========================================================
+def _pdf_del_formulario(request):
+    """
+    (archivo, archivo_nombre, error) del POST: con ticket, el PDF ya está en el
+    storage (subida_directa.py) y solo se anota el nombre; si no, el archivo
+    adjunto va a la cola (subidas.py).
+    """
+    archivo_ticket = (request.POST.get("archivo_ticket") or "").strip()
+    if archivo_ticket:
+        try:
+            return None, subida_directa.confirmar(archivo_ticket, request.user), None
+        except ValueError as ex:
+            return None, "", str(ex)
+
+    archivo = request.FILES.get("archivo")
+    if archivo:
+        error = subidas.validar_pdf(archivo)
+        if error:
+            return None, "", error
+    return archivo, "", None
+
+
+def _mensajes_reporte_rango(request, desde, hasta, reporte):
+    """Resumen por fecha de justificaciones.justificar_rango() como mensajes."""
+    creadas = sum(1 for _, r in reporte if r == justificaciones.CREADA)
+    omitidas = [(f, r) for f, r in reporte if r != justificaciones.CREADA]
+
+    if creadas:
+        messages.success(
+            request,
+            f"✅ {creadas} día(s) justificado(s) del {desde:%d/%m/%Y} al {hasta:%d/%m/%Y}.",
+        )
+    else:
+        messages.warning(request, "No se justificó ningún día del rango.")
+
+    if omitidas:
+        messages.info(
+            request,
+            "Omitidos: " + ", ".join(f"{f:%d/%m} ({justificaciones.ETIQUETAS[r]})" for f, r in omitidas),
+        )
+
+
 @require_POST
 @user_passes_test(_in_group("JUSTIFICACIONES"), login_url="login")
 def set_justificacion(request):
@@ -1463,64 +2227,86 @@ def set_justificacion(request):
     fecha_str = (request.POST.get("fecha") or "").strip()
     tipo = (request.POST.get("tipo") or "DM").strip().upper()
     detalle = (request.POST.get("detalle") or "").strip()
-    archivo = request.FILES.get("archivo")
 
     redirect_url = (
         f"/asistencia/justificaciones/?fecha={fecha_str}"
         if fecha_str else "/asistencia/justificaciones/"
     )
 
+    fecha = parse_date(fecha_str)
+
+    def _volver():
+        # ✅ HTMX: se reemplaza solo la fila; sin HTMX, redirect como siempre
+        if _es_fragmento(request):
+            q = (request.POST.get("q") or "").strip()
+            return _respuesta_fila_justificacion(request, profesor_id, fecha, q)
+        return redirect(redirect_url)
+
     if accion != "set":
         messages.error(request, "Acción inválida.")
-        return redirect(redirect_url)
+        return _volver()
 
-    fecha = parse_date(fecha_str)
     if not fecha:
         messages.error(request, "Fecha inválida.")
-        return redirect(redirect_url)
+        return _volver()
+
+    # ✅ "hasta" opcional: justifica el rango fecha..hasta de una vez (justificaciones.py)
+    hasta = parse_date((request.POST.get("hasta") or "").strip())
+    rango = bool(hasta) and hasta != fecha
+
+    if rango and not (fecha < hasta <= fecha + timedelta(days=justificaciones.MAX_DIAS_RANGO)):
+        messages.error(
+            request,
+            f"Rango inválido: 'hasta' debe ser posterior a la fecha y a lo más "
+            f"{justificaciones.MAX_DIAS_RANGO} días después.",
+        )
+        return _volver()
 
-    if _es_dia_especial(fecha):
+    if not rango and calendario.es_dia_especial(fecha):
         messages.warning(request, "Ese día está marcado como día especial. No se requiere justificación.")
-        return redirect(redirect_url)
+        return _volver()
 
     try:
         profesor = Profesor.objects.get(id=profesor_id)
     except Profesor.DoesNotExist:
         messages.error(request, "Profesor no encontrado.")
-        return redirect(redirect_url)
+        return _volver()
 
     tipo_ok = tipo if tipo in ("DM", "C", "P", "O") else "DM"
     ip = _get_client_ip(request)
     ua = (request.META.get("HTTP_USER_AGENT") or "")[:255]
 
-    if Asistencia.objects.filter(profesor=profesor, fecha=fecha, tipo="E").exists():
+    if not rango and Asistencia.objects.filter(profesor=profesor, fecha=fecha, tipo="E").exists():
         messages.warning(request, "🛑 Ya tiene ASISTENCIA ese día. No se registró justificación.")
-        return redirect(redirect_url)
+        return _volver()
 
-    if JustificacionAsistencia.objects.filter(profesor=profesor, fecha=fecha).exists():
+    if not rango and JustificacionAsistencia.objects.filter(profesor=profesor, fecha=fecha).exists():
         messages.warning(
             request,
             "✅ Este docente ya fue justificado en esta fecha. (Solo se puede editar en el Admin).",
         )
-        return redirect(redirect_url)
-
-    if archivo:
-        nombre_original = (archivo.name or "").strip()
-        nombre_lower = nombre_original.lower()
-        ctype = (getattr(archivo, "content_type", "") or "").lower()
-        size = getattr(archivo, "size", 0) or 0
-
-        if not nombre_lower.endswith(".pdf"):
-            messages.error(request, "El archivo debe terminar en .pdf")
-            return redirect(redirect_url)
-
-        if ctype and ctype != "application/pdf":
-            messages.error(request, f"El archivo debe ser PDF (content_type recibido: {ctype}).")
-            return redirect(redirect_url)
-
-        if size > 10 * 1024 * 1024:
-            messages.error(request, "El PDF es muy pesado (máx. 10 MB).")
-            return redirect(redirect_url)
+        return _volver()
+
+    archivo, archivo_nombre, error = _pdf_del_formulario(request)
+    if error:
+        messages.error(request, error)
+        return _volver()
+
+    if rango:
+        reporte = justificaciones.justificar_rango(
+            profesor,
+            fecha,
+            hasta,
+            tipo=tipo_ok,
+            detalle=detalle,
+            usuario=request.user,
+            ip=ip,
+            user_agent=ua,
+            archivo=archivo,
+            archivo_nombre=archivo_nombre,
+        )
+        _mensajes_reporte_rango(request, fecha, hasta, reporte)
+        return _volver()
 
     try:
         with transaction.atomic():
@@ -1533,40 +2319,17 @@ def set_justificacion(request):
                 "actualizado_por": request.user,
             }
 
+            if archivo_nombre:
+                just_kwargs["archivo"] = archivo_nombre
+                just_kwargs["archivo_estado"] = JustificacionAsistencia.ARCHIVO_LISTO
+            elif archivo:
+                # ✅ El PDF se sube después (subidas.py): la fila queda PENDIENTE
+                just_kwargs["archivo_estado"] = JustificacionAsistencia.ARCHIVO_PENDIENTE
+
+            justificacion = JustificacionAsistencia.objects.create(**just_kwargs)
+
             if archivo:
-                cloudinary_error = None
-
-                if CLOUDINARY_AVAILABLE:
-                    try:
-                        folder = f"justificaciones/{fecha.year}/{fecha.month:02d}"
-                        cloudinary.uploader.upload(
-                            archivo,
-                            resource_type="raw",
-                            folder=folder,
-                            use_filename=True,
-                            unique_filename=True,
-                            overwrite=False,
-                        )
-                        try:
-                            archivo.seek(0)
-                        except Exception:
-                            pass
-                    except Exception as ex:
-                        cloudinary_error = str(ex)[:220]
-                        try:
-                            archivo.seek(0)
-                        except Exception:
-                            pass
-
-                just_kwargs["archivo"] = archivo
-
-                if cloudinary_error:
-                    messages.warning(
-                        request,
-                        f"⚠️ Cloudinary falló; se guardó el PDF en el almacenamiento del sistema. ({cloudinary_error})",
-                    )
-
-            JustificacionAsistencia.objects.create(**just_kwargs)
+                subidas.encolar([justificacion], archivo)
 
             Asistencia.objects.update_or_create(
                 profesor=profesor,
@@ -1582,130 +2345,181 @@ def set_justificacion(request):
                 },
             )
 
-        messages.success(request, "✅ Justificación guardada correctamente.")
-        return redirect(redirect_url)
+        if archivo:
+            messages.success(request, "✅ Justificación guardada. El PDF se está subiendo.")
+        else:
+            messages.success(request, "✅ Justificación guardada correctamente.")
+        return _volver()
 
     except IntegrityError:
         messages.warning(request, "✅ Ya existía una justificación para ese docente en esa fecha.")
-        return redirect(redirect_url)
+        return _volver()
 
     except Exception as e:
         messages.error(
             request,
             f"Error guardando justificación/PDF: {type(e).__name__} - {str(e)[:250]}",
         )
-        return redirect(redirect_url)
+        return _volver()
 
 
 # =========================================================
-# ESTADÍSTICAS PRIVADAS
+# JUSTIFICAR VARIOS DOCENTES (ver justificaciones.py)
 # =========================================================
-def _build_private_stats(fecha_inicio, fecha_fin, q="", condicion=""):
-    profesores_qs = Profesor.objects.all().order_by("apellidos", "nombres")
-
-    if q:
-        profesores_qs = profesores_qs.filter(
-            Q(dni__icontains=q)
-            | Q(codigo__icontains=q)
-            | Q(apellidos__icontains=q)
-            | Q(nombres__icontains=q)
-        )
+@require_POST
+@user_passes_test(_in_group("JUSTIFICACIONES"), login_url="login")
+def justificar_varios(request):
+    fecha_str = (request.POST.get("fecha") or "").strip()
+    q = (request.POST.get("q") or "").strip()
+    tipo = (request.POST.get("tipo") or "DM").strip().upper()
+    detalle = (request.POST.get("detalle") or "").strip()
+    profesor_ids = [int(x) for x in request.POST.getlist("profesor_ids") if x.strip().isdigit()]
 
-    if condicion in ("N", "C", "O/S"):
-        profesores_qs = profesores_qs.filter(condicion__iexact=condicion)
+    fecha = parse_date(fecha_str)
 
-    profesores = list(profesores_qs)
-    profesor_ids = [p.id for p in profesores]
+    def _volver():
+        # ✅ HTMX: tabla + contadores de nuevo (cambiaron varias filas)
+        if _es_fragmento(request) and fecha:
+            rows, resumen, dia_especial = _build_panel_justificaciones(fecha, q=q)
+            return render(
+                request,
+                "asistencias/partials/justificaciones_htmx.html",
+                {"fecha": fecha, "q": q, "rows": rows, "resumen": resumen, "dia_especial": dia_especial},
+            )
+        return redirect(f"/asistencia/justificaciones/?fecha={fecha_str}" if fecha else "/asistencia/justificaciones/")
 
-    # Días especiales del rango
-    dias_especiales = _dias_especiales_dict(fecha_inicio, fecha_fin)
-
-    # Solo lunes a viernes
-    dias_laborables = []
-    cur = fecha_inicio
-    while cur <= fecha_fin:
-        if cur.weekday() < 5:
-            dias_laborables.append(cur)
-        cur += timedelta(days=1)
-
-    # Asistencias del rango (E y J)
-    asistencias = (
-        Asistencia.objects.filter(
-            profesor_id__in=profesor_ids,
-            fecha__range=(fecha_inicio, fecha_fin),
-            tipo__in=["E", "J"],
-        )
-        .values("profesor_id", "fecha", "tipo")
+    if not fecha:
+        messages.error(request, "Fecha inválida.")
+        return _volver()
+
+    if not profesor_ids:
+        messages.warning(request, "Selecciona al menos un docente.")
+        return _volver()
+
+    if len(profesor_ids) > justificaciones.MAX_DOCENTES:
+        messages.error(request, f"Máximo {justificaciones.MAX_DOCENTES} docentes por envío.")
+        return _volver()
+
+    archivo, archivo_nombre, error = _pdf_del_formulario(request)
+    if error:
+        messages.error(request, error)
+        return _volver()
+
+    reporte = justificaciones.justificar_varios(
+        profesor_ids,
+        fecha,
+        tipo=tipo if tipo in ("DM", "C", "P", "O") else "DM",
+        detalle=detalle,
+        usuario=request.user,
+        ip=_get_client_ip(request),
+        user_agent=(request.META.get("HTTP_USER_AGENT") or "")[:255],
+        archivo=archivo,
+        archivo_nombre=archivo_nombre,
     )
 
-    asist_map = {}
-    for a in asistencias:
-        key = (a["profesor_id"], a["fecha"])
-        asist_map.setdefault(key, set()).add((a.get("tipo") or "").strip().upper())
+    resultados = list(reporte.values())
+    creadas = resultados.count(justificaciones.CREADA)
+    conflictos = resultados.count(justificaciones.CONFLICTO)
+    omitidas = len(resultados) - creadas - conflictos
 
-    # Justificaciones del rango
-    justificaciones = (
-        JustificacionAsistencia.objects.filter(
-            profesor_id__in=profesor_ids,
-            fecha__range=(fecha_inicio, fecha_fin),
+    if creadas:
+        messages.success(request, f"✅ {creadas} docente(s) justificado(s) el {fecha:%d/%m/%Y}.")
+    else:
+        messages.warning(request, "No se justificó ningún docente.")
+    if omitidas:
+        detalle_omitidas = {}
+        for r in resultados:
+            if r not in (justificaciones.CREADA, justificaciones.CONFLICTO):
+                detalle_omitidas[r] = detalle_omitidas.get(r, 0) + 1
+        messages.info(
+            request,
+            f"Omitidos {omitidas}: "
+            + ", ".join(f"{n} {justificaciones.ETIQUETAS[r]}" for r, n in detalle_omitidas.items()),
         )
-        .values("profesor_id", "fecha")
-    )
+    if conflictos:
+        messages.warning(request, f"⚠️ {conflictos} docente(s) ya fueron justificados por otro usuario.")
 
-    just_set = {(j["profesor_id"], j["fecha"]) for j in justificaciones}
+    return _volver()
 
-    rows = []
-    total_asistio = 0
-    total_justifico = 0
-    total_falto = 0
 
-    for profesor in profesores:
-        asistio = 0
-        justifico = 0
-        falto = 0
-        total_dias = 0
-
-        for dia in dias_laborables:
-            # Si es día especial, no se evalúa
-            if dia in dias_especiales:
-                continue
+# =========================================================
+# SUBIDA DIRECTA DEL PDF (ver subida_directa.py)
+# =========================================================
+@require_POST
+@user_passes_test(_in_group("JUSTIFICACIONES"), login_url="login")
+def ticket_subida_justificacion(request):
+    return JsonResponse({"ok": True, **subida_directa.emitir(request.user)})
 
-            total_dias += 1
-            key = (profesor.id, dia)
-            tipos = asist_map.get(key, set())
 
-            tiene_e = "E" in tipos
-            tiene_j = "J" in tipos
-            tiene_justificacion = key in just_set
+@require_POST
+@user_passes_test(_in_group("JUSTIFICACIONES"), login_url="login")
+def subida_local_justificacion(request):
+    """Stand-in local de la subida firmada (sin CLOUDINARY_URL)."""
+    if subida_directa.usa_cloudinary():
+        return JsonResponse({"ok": False, "msg": "Subida local desactivada."}, status=404)
 
-            # Prioridad igual que el comando del correo
-            if tiene_e:
-                asistio += 1
-            elif tiene_j or tiene_justificacion:
-                justifico += 1
-            else:
-                falto += 1
+    archivo = request.FILES.get("file")
+    if not archivo:
+        return JsonResponse({"ok": False, "msg": "Falta el archivo."}, status=400)
 
-        porcentaje = round((asistio / total_dias) * 100, 2) if total_dias else 0
+    error = subidas.validar_pdf(archivo)
+    if error:
+        return JsonResponse({"ok": False, "msg": error}, status=400)
 
-        rows.append(
-            {
-                "profesor": profesor,
-                "asistio": asistio,
-                "justifico": justifico,
-                "falto": falto,
-                "total_dias": total_dias,
-                "porcentaje": porcentaje,
-            }
-        )
+    try:
+        nombre = subida_directa.guardar_local(request.POST.get("ticket") or "", request.user, archivo)
+    except ValueError as ex:
+        return JsonResponse({"ok": False, "msg": str(ex)}, status=403)
+
+    return JsonResponse({"ok": True, "public_id": nombre})
+
+
+# =========================================================
+# ESTADÍSTICAS PRIVADAS
+# =========================================================
+def _build_private_stats(fecha_inicio, fecha_fin, q="", condicion=""):
+    profesores = filtrar_profesores(q=q, condicion=condicion, condiciones=("N", "C", "O/S"))
+    profesor_ids = [p.id for p in profesores]
+
+    # Días especiales del rango
+    dias_especiales = calendario.especiales_en_rango(fecha_inicio, fecha_fin)
+
+    # Solo lunes a viernes (con y sin días especiales)
+    dias_laborables = calendario.dias_habiles(fecha_inicio, fecha_fin)
+    dias_evaluables = calendario.dias_habiles(fecha_inicio, fecha_fin, excluir_especiales=True)
 
-        total_asistio += asistio
-        total_justifico += justifico
-        total_falto += falto
+    # ✅ Matriz profesor x día evaluable (matriz.py): conteos con reducciones numpy
+    estados = matriz.construir(
+        profesor_ids, fecha_inicio, fecha_fin, dias=dias_evaluables, todos=not (q or condicion)
+    )
+
+    # Los días especiales no se evalúan
+    total_dias = len(dias_evaluables)
+
+    asistio = estados.por_profesor(matriz.ASISTIO)
+    justifico = estados.por_profesor(matriz.JUSTIFICADO)
+    falto = total_dias - asistio - justifico
+    porcentajes = matriz.Matriz.porcentaje(asistio, total_dias)
+
+    rows = [
+        {
+            "profesor": profesor,
+            "asistio": int(asistio[i]),
+            "justifico": int(justifico[i]),
+            "falto": int(falto[i]),
+            "total_dias": total_dias,
+            "porcentaje": float(porcentajes[i]),
+        }
+        for i, profesor in enumerate(profesores)
+    ]
+
+    total_asistio = int(asistio.sum())
+    total_justifico = int(justifico.sum())
+    total_falto = int(falto.sum())
 
     docentes_total = len(rows)
     base_total = total_asistio + total_justifico + total_falto
-    porcentaje_general = round((total_asistio / base_total) * 100, 2) if base_total else 0
+    porcentaje_general = float(matriz.Matriz.porcentaje(total_asistio, base_total))
 
     return {
         "rows": rows,
@@ -1781,12 +2595,15 @@ def exportar_estadisticas_privadas_excel(request):
     if fecha_inicio > fecha_fin:
         fecha_inicio, fecha_fin = fecha_fin, fecha_inicio
 
-    stats = _build_private_stats(
-        fecha_inicio=fecha_inicio,
-        fecha_fin=fecha_fin,
-        q=q,
-        condicion=condicion,
-    )
+    crono = tiempos.de(request)
+
+    with crono.etapa("consultas"):
+        stats = _build_private_stats(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            q=q,
+            condicion=condicion,
+        )
 
     wb = Workbook()
     ws = wb.active
@@ -1865,9 +2682,10 @@ def exportar_estadisticas_privadas_excel(request):
 
     filename = f"estadisticas_privadas_{fecha_inicio.strftime('%Y-%m-%d')}_a_{fecha_fin.strftime('%Y-%m-%d')}.xlsx"
 
-    bio = BytesIO()
-    wb.save(bio)
-    bio.seek(0)
+    with crono.etapa("xlsx"):
+        bio = BytesIO()
+        wb.save(bio)
+        bio.seek(0)
 
     response = HttpResponse(
         bio.getvalue(),
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from datetime import timedelta
 import dj_database_url
 
@@ -58,6 +59,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # ✅ Primero: su `total` cubre al resto de la cadena (se desactiva sola si SERVER_TIMING=0)
+    "asistencias.tiempos.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django_htmx.middleware.HtmxMiddleware",
@@ -97,14 +100,81 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not defined. Define DATABASE_URL de PostgreSQL.")
 
+# ✅ Modo de servidor: "wsgi" (gunicorn sync) o "asgi" (gunicorn + UvicornWorker)
+SERVER_MODE = (os.environ.get("SERVER_MODE") or "wsgi").strip().lower()
+
+# Si está activo, /scan/ y /api/scan/ apuntan a las vistas async.
+# Por defecto solo bajo ASGI: en WSGI una vista async se ejecuta en un
+# event loop por request y no gana nada.
+SCAN_ASYNC = os.environ.get("SCAN_ASYNC", "1" if SERVER_MODE == "asgi" else "0") == "1"
+
+# ✅ Cabecera Server-Timing + log por etapa en las vistas (ver asistencias/tiempos.py)
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+# ✅ Historial en vivo (SSE, ver asistencias/en_vivo.py)
+# Por defecto solo bajo ASGI: con workers sync cada pestaña abierta ocupa un worker.
+HISTORIAL_EN_VIVO = os.environ.get("HISTORIAL_EN_VIVO", "1" if SERVER_MODE == "asgi" else "0") == "1"
+# Segundos que dura cada conexión antes de que el navegador reconecte
+HISTORIAL_EN_VIVO_DURACION = float(
+    os.environ.get("HISTORIAL_EN_VIVO_DURACION", "300" if SERVER_MODE == "asgi" else "25")
+)
+# Cada cuánto se consulta la BD (eventos de otros workers)
+HISTORIAL_EN_VIVO_POLL = float(os.environ.get("HISTORIAL_EN_VIVO_POLL", "3"))
+
+# ✅ Journal write-behind del escáner (ver asistencias/journal.py)
+# El archivo debe estar en un disco persistente para sobrevivir a un reinicio.
+SCAN_JOURNAL = os.environ.get("SCAN_JOURNAL", "0") == "1"
+SCAN_JOURNAL_PATH = os.environ.get("SCAN_JOURNAL_PATH") or str(BASE_DIR / "scan_journal.sqlite3")
+# "thread": cada worker web vuelca en un hilo; "comando": solo `manage.py vaciar_journal_scan`
+SCAN_JOURNAL_FLUSHER = (os.environ.get("SCAN_JOURNAL_FLUSHER") or "thread").strip().lower()
+SCAN_JOURNAL_INTERVALO = float(os.environ.get("SCAN_JOURNAL_INTERVALO", "2"))
+SCAN_JOURNAL_LOTE = int(os.environ.get("SCAN_JOURNAL_LOTE", "500"))
+
+# ✅ PDFs de justificación: los sube `manage.py subir_justificaciones` (ver asistencias/subidas.py)
+SUBIDAS_INTERVALO = float(os.environ.get("SUBIDAS_INTERVALO", "3"))
+SUBIDAS_LOTE = int(os.environ.get("SUBIDAS_LOTE", "20"))
+
 DATABASES = {
     "default": dj_database_url.parse(
         DATABASE_URL,
-        conn_max_age=600,
+        # Bajo ASGI las conexiones persistentes no se reutilizan entre
+        # requests (cada uno corre en otro hilo): se cierran al terminar.
+        conn_max_age=0 if SERVER_MODE == "asgi" else 600,
         ssl_require=not DEBUG,
     )
 }
 
+# =========================
+# ✅ CACHE COMPARTIDO ENTRE WORKERS
+# (versiones del padrón/calendario, respuestas de Idempotency-Key, etc.)
+# Redis recomendado en producción; con FileBasedCache el lock de
+# idempotencia va a la BD (ver asistencias/idempotencia.py)
+# =========================
+REDIS_URL = (os.environ.get("REDIS_URL") or "").strip()
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get(
+                "CACHE_DIR",
+                os.path.join(tempfile.gettempdir(), "proyecto_manhattan_cache"),
+            ),
+            # El default (300) culleaba las claves asistencias:version:* durante
+            # la hora pico (una respuesta de idempotencia por escaneo, TTL 120 s)
+            "OPTIONS": {
+                "MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", "50000")),
+            },
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator", "OPTIONS": {"min_length": 10}},
@@ -224,8 +294,18 @@ if not DEBUG:
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "handlers": {"null": {"class": "logging.NullHandler"}},
+    "handlers": {
+        "null": {"class": "logging.NullHandler"},
+        # ✅ No bloquea el event loop (ASGI): encola y escribe en otro hilo
+        "cola": {"class": "asistencias.logcola.ColaHandler"},
+    },
     "loggers": {
+        "asistencias": {
+            "handlers": ["cola"],
+            "level": os.environ.get("LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+        "asistencias.tiempos": {"handlers": ["cola"], "level": "INFO", "propagate": False},
         "axes": {"handlers": ["null"], "level": "CRITICAL", "propagate": False},
         "axes.handlers.database": {"handlers": ["null"], "level": "CRITICAL", "propagate": False},
         "axes.middleware": {"handlers": ["null"], "level": "CRITICAL", "propagate": False},
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proyecto_manhattan.settings')
 
 application = get_wsgi_application()
+
+# ✅ Journal del escáner: vuelca en segundo plano y reprocesa lo pendiente al arrancar
+from asistencias.journal import iniciar_flusher  # noqa: E402
+
+iniciar_flusher()
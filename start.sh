@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+set -o errexit
+
+# SERVER_MODE=wsgi (por defecto): workers sync de gunicorn.
+# SERVER_MODE=asgi: gunicorn con UvicornWorker; /api/scan/ usa la vista async.
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+  exec gunicorn proyecto_manhattan.asgi:application -k uvicorn_worker.UvicornWorker
+fi
+
+exec gunicorn proyecto_manhattan.wsgi:application